@@ -0,0 +1,157 @@
+"""Admin authentication.
+
+Admins log in once with their password (bcrypt) via ``/api/admin/login`` and get back a
+signed, expiring bearer token. Basic auth keeps working for scripts and older clients;
+successfully verified credentials are kept in a small LRU cache with a TTL so repeated
+requests do not pay for a bcrypt verify each time.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request
+from fastapi.security import HTTPBasic
+from fastapi.security.utils import get_authorization_scheme_param
+
+from . import models, hashing
+from .db import SessionLocal, CFG
+
+TOKEN_TTL = CFG['admin_token_ttl']
+_SECRET = (CFG.get('admin_token_secret') or secrets.token_hex(32)).encode('utf-8')
+
+
+class AdminToken:
+    """Bearer token credentials passed to endpoints instead of HTTPBasicCredentials."""
+
+    def __init__(self, token):
+        self.token = token
+        self.username = None
+
+
+class AdminAuth(HTTPBasic):
+    """Accept either ``Authorization: Bearer <token>`` or regular basic auth."""
+
+    async def __call__(self, request: Request):
+        scheme, param = get_authorization_scheme_param(request.headers.get('Authorization'))
+        if scheme.lower() == 'bearer' and param:
+            return AdminToken(param)
+        return await super().__call__(request)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_verified = TTLCache(CFG['admin_auth_cache_size'], CFG['admin_auth_cache_ttl'])
+# bumped whenever admin passwords change so previously issued tokens stop validating
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _cache_key(username, password):
+    # never keep plaintext passwords in memory longer than the request
+    msg = f'{username}\x00{password}'.encode('utf-8')
+    return hmac.new(_SECRET, msg, hashlib.sha256).hexdigest()
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(payload):
+    return _b64encode(hmac.new(_SECRET, payload.encode('utf-8'), hashlib.sha256).digest())
+
+
+def issue_token(username):
+    """Return a signed token for ``username`` valid for TOKEN_TTL seconds."""
+    body = json.dumps({'sub': username, 'exp': int(time.time()) + TOKEN_TTL, 'gen': _generation}, separators=(',', ':'))
+    payload = _b64encode(body.encode('utf-8'))
+    return f'{payload}.{_sign(payload)}'
+
+
+def verify_token(token):
+    """Return the admin username for a valid token, otherwise None."""
+    try:
+        payload, sig = token.split('.', 1)
+    except (AttributeError, ValueError):
+        return None
+    # as bytes: compare_digest refuses str with non-ASCII characters, and tokens come from headers
+    if not hmac.compare_digest(sig.encode('utf-8'), _sign(payload).encode('utf-8')):
+        return None
+    try:
+        data = json.loads(_b64decode(payload))
+    except Exception:
+        return None
+    if data.get('gen') != _generation or int(data.get('exp', 0)) < time.time():
+        return None
+    return data.get('sub')
+
+
+def check_admin(creds):
+    """Verify admin credentials (basic auth or bearer token)."""
+    if creds is None:
+        return False
+    if isinstance(creds, AdminToken):
+        creds.username = verify_token(creds.token)
+        return creds.username is not None
+    key = _cache_key(creds.username, creds.password)
+    if _verified.get(key):
+        return True
+    dbs = SessionLocal()
+    try:
+        user = dbs.query(models.AdminUser).filter_by(username=creds.username).first()
+        if not user:
+            return False
+        password_hash = user.password_hash
+    finally:
+        dbs.close()
+    ok = hashing.verify_password(creds.password, password_hash)
+    if ok:
+        _verified.set(key, True)
+    return ok
+
+
+def invalidate():
+    """Drop cached credentials and revoke issued tokens (e.g. after a password change)."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+    _verified.clear()
@@ -0,0 +1,85 @@
+"""In-memory set of scannable codes used to reject junk scans before any database work.
+
+People photograph all kinds of QR codes, so many /api/scan payloads match neither a code
+word nor a QR code. The set holds the normalized hashes of all code words (the same
+``word_hash`` the ``code_words`` table is indexed by) and all numeric QR codes; the literal
+``random`` trigger is always accepted. A payload that isn't in the set can't be valid, so
+the scan is rejected without a query. A payload that is in the set still goes through the
+full check in scans.py (used words, prior scans, ...).
+
+Admin endpoints keep the set in sync: single creates and deletes update it in place, bulk
+changes (imports, delete all) call ``invalidate()`` so it is reloaded on the next scan.
+Like the question decks this lives in process memory and assumes a single backend process.
+"""
+import threading
+
+from . import models
+from .db import SessionLocal
+
+RANDOM = 'random'
+
+_lock = threading.Lock()
+_words = None
+_qrcodes = None
+
+
+def _as_qrcode(code):
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def load():
+    """Rebuild the set from the database."""
+    global _words, _qrcodes
+    dbs = SessionLocal()
+    try:
+        with _lock:
+            _words = {h for (h,) in dbs.query(models.CodeWord.word_hash).yield_per(5000) if h}
+            _qrcodes = {c for (c,) in dbs.query(models.QRCode.code).yield_per(5000) if c is not None}
+    finally:
+        dbs.close()
+
+
+def is_known(code):
+    """True if ``code`` may be a code word, a QR code or the random trigger."""
+    if code.lower() == RANDOM:
+        return True
+    if _words is None:
+        load()
+    with _lock:
+        words, qrcodes = _words, _qrcodes
+    if words is None:
+        # invalidated while loading; the next scan reloads
+        return True
+    qr = _as_qrcode(code)
+    if qr is not None and qr in qrcodes:
+        return True
+    return models.normalized_hash(code) in words
+
+
+def add_word(word_hash):
+    with _lock:
+        if _words is not None:
+            _words.add(word_hash)
+
+
+def remove_word(word_hash):
+    with _lock:
+        if _words is not None:
+            _words.discard(word_hash)
+
+
+def add_qrcode(code):
+    with _lock:
+        if _qrcodes is not None:
+            _qrcodes.add(code)
+
+
+def invalidate():
+    """Drop the set; it is reloaded from the database on the next scan."""
+    global _words, _qrcodes
+    with _lock:
+        _words = None
+        _qrcodes = None
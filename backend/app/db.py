@@ -5,7 +5,8 @@ import time
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from .models import Base, AdminUser, Question, GameState
+from .models import AdminUser, Question, GameState
+from . import migrations
 from passlib.context import CryptContext
 from urllib.parse import quote_plus
 
@@ -38,7 +39,30 @@ def load_config():
         db_url = f"postgresql+psycopg2://{user_q}:{pw_q}@{host}:{port}/{name}"
     return {
         'database_url': db_url,
-        'create_tables': bool(os.environ.get('CREATE_TABLES') or cfg.get('create_tables'))
+        'create_tables': bool(os.environ.get('CREATE_TABLES') or cfg.get('create_tables')),
+        # secret used to sign admin tokens; a random per-process secret is used when unset
+        'admin_token_secret': os.environ.get('ADMIN_TOKEN_SECRET') or cfg.get('admin_token_secret'),
+        'admin_token_ttl': int(os.environ.get('ADMIN_TOKEN_TTL') or cfg.get('admin_token_ttl') or 12 * 3600),
+        # verified admin credentials are cached for this many seconds
+        'admin_auth_cache_ttl': int(os.environ.get('ADMIN_AUTH_CACHE_TTL') or cfg.get('admin_auth_cache_ttl') or 300),
+        'admin_auth_cache_size': int(os.environ.get('ADMIN_AUTH_CACHE_SIZE') or cfg.get('admin_auth_cache_size') or 64),
+        # bcrypt runs in a dedicated process pool; requests beyond the queue limit get a 503
+        'hash_workers': int(os.environ.get('HASH_WORKERS') or cfg.get('hash_workers') or min(4, os.cpu_count() or 1)),
+        'hash_queue_limit': int(os.environ.get('HASH_QUEUE_LIMIT') or cfg.get('hash_queue_limit') or 256),
+        # number of background jobs (imports, mass deletes) that may run at the same time
+        'job_workers': int(os.environ.get('JOB_WORKERS') or cfg.get('job_workers') or 2),
+        # /api/stream: max concurrent subscribers and pending events per subscriber before it is resynced
+        'stream_max_subscribers': int(os.environ.get('STREAM_MAX_SUBSCRIBERS') or cfg.get('stream_max_subscribers') or 500),
+        'stream_queue_size': int(os.environ.get('STREAM_QUEUE_SIZE') or cfg.get('stream_queue_size') or 64),
+        # task submissions and box hints larger than this are rejected while being received
+        'max_upload_bytes': int(os.environ.get('MAX_UPLOAD_BYTES') or cfg.get('max_upload_bytes') or 8 * 1024 * 1024),
+        # resumable task uploads: chunk size, and seconds without activity before one is expired
+        'upload_chunk_size': int(os.environ.get('UPLOAD_CHUNK_SIZE') or cfg.get('upload_chunk_size') or 1024 * 1024),
+        'upload_ttl': int(os.environ.get('UPLOAD_TTL') or cfg.get('upload_ttl') or 3600),
+        # where uploaded files are stored (see storage.py); 'local' keeps them in backend/uploads
+        'upload_backend': os.environ.get('UPLOAD_BACKEND') or cfg.get('upload_backend') or 'local',
+        # processes generating thumbnails/WebP variants of uploaded images
+        'derivative_workers': int(os.environ.get('DERIVATIVE_WORKERS') or cfg.get('derivative_workers') or min(2, os.cpu_count() or 1)),
     }
 
 
@@ -47,7 +71,8 @@ CFG = load_config()
 if CFG['database_url']:
     # try to use Postgres; if driver missing or connection fails, fall back to sqlite
     try:
-        engine = create_engine(CFG['database_url'], pool_pre_ping=True)
+        connect_args = {"check_same_thread": False} if CFG['database_url'].startswith('sqlite') else {}
+        engine = create_engine(CFG['database_url'], pool_pre_ping=True, connect_args=connect_args)
     except Exception as e:
         print('Could not create Postgres engine:', e)
         print('Falling back to local SQLite database.')
@@ -72,70 +97,10 @@ def init_database():
     while attempts < max_attempts:
         try:
             if CFG.get('create_tables'):
-                print('Ensuring database tables exist...')
-                Base.metadata.create_all(engine)
-                # ensure migrations for simple additive schema changes (like new columns)
-                try:
-                    # add 'used' column to questions table if it doesn't exist (Postgres supports IF NOT EXISTS)
-                    from sqlalchemy import text
-                    with engine.begin() as conn:
-                        conn.execute(text("ALTER TABLE questions ADD COLUMN IF NOT EXISTS used boolean DEFAULT false"))
-                        # ensure column not null for consistency
-                        try:
-                            conn.execute(text("ALTER TABLE questions ALTER COLUMN used SET NOT NULL"))
-                        except Exception:
-                            # if setting NOT NULL fails (older versions), ignore — column will default to false
-                            pass
-                        # add 'used' column to code_words if missing
-                        try:
-                            conn.execute(text("ALTER TABLE code_words ADD COLUMN IF NOT EXISTS used boolean DEFAULT false"))
-                            try:
-                                conn.execute(text("ALTER TABLE code_words ALTER COLUMN used SET NOT NULL"))
-                            except Exception:
-                                pass
-                        except Exception:
-                            # ignore if code_words doesn't exist yet or other issues
-                            pass
-                        # add 'is_task' column to questions if missing
-                        try:
-                            conn.execute(text("ALTER TABLE questions ADD COLUMN IF NOT EXISTS is_task boolean DEFAULT false"))
-                            try:
-                                conn.execute(text("ALTER TABLE questions ALTER COLUMN is_task SET NOT NULL"))
-                            except Exception:
-                                pass
-                        except Exception:
-                            pass
-                        # add default_language to game_state if missing
-                        try:
-                            conn.execute(text("ALTER TABLE game_state ADD COLUMN IF NOT EXISTS default_language varchar(16) DEFAULT 'en'"))
-                        except Exception:
-                            pass
-                        # add question/task timeout columns to game_state if missing
-                        try:
-                            conn.execute(text("ALTER TABLE game_state ADD COLUMN IF NOT EXISTS question_timeout_seconds integer DEFAULT 10"))
-                        except Exception:
-                            pass
-                        try:
-                            conn.execute(text("ALTER TABLE game_state ADD COLUMN IF NOT EXISTS task_timeout_seconds integer DEFAULT 300"))
-                        except Exception:
-                            pass
-                        # add language to participants if missing
-                        try:
-                            conn.execute(text("ALTER TABLE participants ADD COLUMN IF NOT EXISTS language varchar(16) DEFAULT 'en'"))
-                        except Exception:
-                            pass
-                        # add correct_count to participants if missing (integer, default 0)
-                        try:
-                            conn.execute(text("ALTER TABLE participants ADD COLUMN IF NOT EXISTS correct_count integer DEFAULT 0"))
-                        except Exception:
-                            pass
-                        # add rating to task_submissions if missing (nullable integer)
-                        try:
-                            conn.execute(text("ALTER TABLE task_submissions ADD COLUMN IF NOT EXISTS rating integer"))
-                        except Exception:
-                            pass
-                except Exception as e:
-                    print('Warning: could not apply simple migrations:', e)
+                # create missing tables and apply pending schema migrations (no-op when current)
+                applied = migrations.migrate(engine)
+                if not applied:
+                    print('Database schema is up to date')
 
             # insert default admin and sample questions if needed
             db = SessionLocal()
@@ -0,0 +1,132 @@
+"""Per-session question decks used by /api/scan.
+
+Instead of loading every remaining question on each scan, a session gets a shuffled deck
+of candidate question ids per quest (``None`` = all quests, used by code words and the
+``random`` trigger) the first time it scans. A scan pops ids off the end of the deck and
+only loads the chosen question by primary key.
+
+Decks are kept in process memory and tagged with the version of the question bank they
+were built from. Creating a single question inserts it into existing decks; bulk changes
+(imports, reset of the ``used`` flags, mass deletes) bump the version so decks are rebuilt
+lazily on the next scan. Deleted questions and shared questions already used by someone
+else are simply skipped when popped.
+
+Regular (non-task) questions are served at most once overall. They are claimed with a
+single conditional ``UPDATE questions SET used = true WHERE id = :id AND used = false``:
+the database row lock makes concurrent claims of the same id serialize, and only the
+scan whose update matched a row gets the question; the others move on to their next id.
+"""
+import random
+import threading
+from array import array
+
+from sqlalchemy import or_, update
+
+from . import models
+
+_lock = threading.Lock()
+_version = 0
+# (session_id, quest_id or None) -> _Deck
+_decks = {}
+# session_id -> ids answered or served to that session (shared by all its decks)
+_seen = {}
+
+
+class _Deck:
+    __slots__ = ('ids', 'version')
+
+    def __init__(self, ids, version):
+        self.ids = ids
+        self.version = version
+
+
+def _build(db, session_id, quest_id, version):
+    seen = {qid for (qid,) in db.query(models.UserAnswer.question_id).filter_by(session_id=session_id)}
+    seen.update(qid for (qid,) in db.query(models.UserServedQuestion.question_id).filter_by(session_id=session_id))
+    # tasks can be served to every session; regular questions only while unused
+    q = db.query(models.Question.id).filter(or_(models.Question.is_task == True, models.Question.used == False))
+    if quest_id is not None:
+        q = q.filter(models.Question.quest_id == quest_id)
+    ids = [qid for (qid,) in q if qid not in seen]
+    random.shuffle(ids)
+    return _Deck(array('l', ids), version), seen
+
+
+def claim(db, question_id):
+    """Atomically mark a regular question as used. True if this caller got it."""
+    res = db.execute(
+        update(models.Question.__table__)
+        .where(models.Question.id == question_id, models.Question.used == False)
+        .values(used=True)
+    )
+    return res.rowcount == 1
+
+
+def next_question(db, session_id, quest_id=None):
+    """Return the next question to serve to ``session_id`` (or None when nothing is left).
+
+    Regular questions are claimed (marked used) in the caller's transaction. The returned
+    question is marked as seen for the session; the caller records it in UserServedQuestion
+    and commits.
+    """
+    key = (session_id, quest_id)
+    with _lock:
+        version = _version
+        deck = _decks.get(key)
+        seen = _seen.get(session_id)
+    if deck is None or deck.version != version or seen is None:
+        deck, seen = _build(db, session_id, quest_id, version)
+        with _lock:
+            _decks[key] = deck
+            _seen[session_id] = seen
+    while True:
+        with _lock:
+            if not deck.ids:
+                return None
+            qid = deck.ids.pop()
+            if qid in seen:
+                continue
+        chosen = db.query(models.Question).get(qid)
+        if chosen is None:
+            # deleted since the deck was built
+            continue
+        if not chosen.is_task and (chosen.used or not claim(db, qid)):
+            # shared question already served to another session
+            continue
+        with _lock:
+            seen.add(qid)
+        return chosen
+
+
+def mark_seen(session_id, question_id):
+    """Record that a session has answered a question outside of a scan."""
+    with _lock:
+        seen = _seen.get(session_id)
+        if seen is not None:
+            seen.add(question_id)
+
+
+def add_question(question_id, quest_id):
+    """Insert a newly created question at a random position of every matching deck."""
+    with _lock:
+        for (session_id, deck_quest), deck in _decks.items():
+            if deck_quest is None or deck_quest == quest_id:
+                deck.ids.insert(random.randint(0, len(deck.ids)), question_id)
+
+
+def forget_sessions(session_ids):
+    session_ids = set(session_ids)
+    with _lock:
+        for key in [k for k in _decks if k[0] in session_ids]:
+            del _decks[key]
+        for sid in session_ids:
+            _seen.pop(sid, None)
+
+
+def invalidate():
+    """Drop all decks; they are rebuilt from the database on the next scan."""
+    global _version
+    with _lock:
+        _version += 1
+        _decks.clear()
+        _seen.clear()
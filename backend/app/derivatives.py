@@ -0,0 +1,237 @@
+"""Resized WebP variants of uploaded images (task submissions and box hints).
+
+Phone photos are several megabytes; the admin review and the box hints only need a
+fraction of that. After an upload is stored, ``schedule`` queues it for a process pool
+(image decoding and resizing are CPU bound) which renders one WebP file per entry of
+``VARIANTS`` into ``uploads/.partial``; they are then put into the upload store as
+``<sha256>.<variant>-v<REVISION>.webp`` next to the original. JPEGs are decoded at reduced scale
+(``draft``) and EXIF rotation is applied. Variants are deleted with their original
+(``storage.register_derived``).
+
+``urls`` returns the URL of each variant if it exists and the original's URL otherwise,
+so responses are correct before, during and without processing (e.g. when Pillow isn't
+installed, or with a store backend that has no local files). Uploads that have no
+variants yet, e.g. from before this existed or dropped because the queue was full, are
+picked up by ``backfill`` at startup.
+"""
+import importlib.util
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import models, storage, uploads, versions
+from .db import SessionLocal, CFG
+
+# variant -> longest side in pixels
+VARIANTS = {'thumb': 320, 'preview': 1600}
+QUALITY = 80
+# part of the variant keys: variants are served as immutable, so bump this whenever
+# VARIANTS, QUALITY or _render change and the new renderings get new URLs
+REVISION = 1
+WORKERS = max(1, CFG['derivative_workers'])
+QUEUE_LIMIT = 1000
+AVAILABLE = importlib.util.find_spec('PIL') is not None
+
+
+def variant_key(key, variant):
+    # '<sha256>.jpg' -> '<sha256>.thumb-v1.webp'
+    return f'{key.split(".", 1)[0]}.{variant}-v{REVISION}.webp'
+
+
+def urls(key):
+    """``{'url', 'thumb_url', 'preview_url'}`` for an upload; variants fall back to the original."""
+    store = storage.backend()
+    original = f'/uploads/{key}'
+    out = {'url': original}
+    for variant in VARIANTS:
+        name = variant_key(key, variant)
+        out[f'{variant}_url'] = f'/uploads/{name}' if store.exists(name) else original
+    return out
+
+
+def _render(source, tmp_dir, variants, quality, submitted_at):
+    # runs in a pool process; returns the queue wait and {variant: rendered file}
+    import tempfile
+    from PIL import Image, ImageOps
+    wait = time.time() - submitted_at
+    out = {}
+    with Image.open(source) as im:
+        largest = max(variants.values())
+        im.draft('RGB', (largest, largest))
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'A' in im.getbands() or 'transparency' in im.info else 'RGB')
+        # largest first, each smaller variant is resized from the previous one
+        for variant, size in sorted(variants.items(), key=lambda item: -item[1]):
+            im.thumbnail((size, size))
+            fd, path = tempfile.mkstemp(dir=tmp_dir, suffix='.webp')
+            with os.fdopen(fd, 'wb') as f:
+                im.save(f, 'WEBP', quality=quality)
+            out[variant] = path
+    return wait, out
+
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> on_ready callbacks of everyone who scheduled it
+        self.pending = {}
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.wait_max = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'available': AVAILABLE,
+                'workers': WORKERS,
+                'pending': len(self.pending),
+                'completed': self.completed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'queue_wait_max_ms': round(self.wait_max * 1000, 2),
+            }
+
+
+_metrics = _Metrics()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: don't fork the server process (threads, open DB connections)
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _drop_pool(pool):
+    # a pool whose worker died refuses all work; the next _get_pool starts a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def stats():
+    return _metrics.snapshot()
+
+
+def schedule(key, on_ready=None):
+    """Queue the variants of the stored file ``key``; ``on_ready()`` runs once they exist.
+
+    Returns False (and the original keeps being served) when Pillow is missing, the
+    backend has no local files or the queue is full. A key that is queued already is
+    rendered once and ``on_ready`` of every caller runs; one whose variants exist is not
+    rendered again.
+    """
+    source = storage.backend().local_path(key) if AVAILABLE and key else None
+    if source is None:
+        return False
+    store = storage.backend()
+    if all(store.exists(variant_key(key, variant)) for variant in VARIANTS):
+        if on_ready is not None:
+            on_ready()
+        return True
+    with _metrics.lock:
+        callbacks = _metrics.pending.get(key)
+        if callbacks is not None:
+            if on_ready is not None:
+                callbacks.append(on_ready)
+            return True
+        if len(_metrics.pending) >= QUEUE_LIMIT:
+            _metrics.dropped += 1
+            return False
+        _metrics.pending[key] = [on_ready] if on_ready is not None else []
+    os.makedirs(uploads.PARTIAL_DIR, exist_ok=True)
+
+    def done(fut):
+        try:
+            wait, rendered = fut.result()
+            store = storage.backend()
+            for variant, path in rendered.items():
+                store.put(variant_key(key, variant), path)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                _drop_pool(pool)
+            with _metrics.lock:
+                _metrics.pending.pop(key, None)
+                _metrics.failed += 1
+            return
+        with _metrics.lock:
+            callbacks = _metrics.pending.pop(key, [])
+            _metrics.completed += 1
+            _metrics.wait_max = max(_metrics.wait_max, wait)
+        for callback in callbacks:
+            callback()
+
+    try:
+        pool = _get_pool()
+        try:
+            fut = pool.submit(_render, source, uploads.PARTIAL_DIR, VARIANTS, QUALITY, time.time())
+        except BrokenProcessPool:
+            _drop_pool(pool)
+            pool = _get_pool()
+            fut = pool.submit(_render, source, uploads.PARTIAL_DIR, VARIANTS, QUALITY, time.time())
+    except Exception:
+        with _metrics.lock:
+            _metrics.pending.pop(key, None)
+        raise
+    fut.add_done_callback(done)
+    return True
+
+
+def variant_keys(key):
+    # only originals ('<sha256>.<ext>') have variants; a variant key shares their hash
+    if key.count('.') != 1:
+        return []
+    return [variant_key(key, variant) for variant in VARIANTS]
+
+
+storage.register_derived(variant_keys)
+
+
+def hint_ready():
+    # /api/boxes returns the hint variants, so its ETag must change
+    versions.bump('boxes')
+
+
+def _missing(key):
+    store = storage.backend()
+    if not key or not store.exists(key):
+        return False
+    return not all(store.exists(variant_key(key, variant)) for variant in VARIANTS)
+
+
+def backfill():
+    """Schedule uploads without variants (box hints first). Blocking; returns the count."""
+    if not AVAILABLE:
+        return 0
+    dbs = SessionLocal()
+    try:
+        hints = [name for (name,) in dbs.query(models.Box.hint_filename).filter(models.Box.hint_filename != None)]
+        submissions = [name for (name,) in dbs.query(models.TaskSubmission.filename)]
+    finally:
+        dbs.close()
+    scheduled = 0
+    for names, on_ready in ((hints, hint_ready), (submissions, None)):
+        for name in names:
+            if _missing(name) and schedule(name, on_ready):
+                scheduled += 1
+    return scheduled
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
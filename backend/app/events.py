@@ -0,0 +1,183 @@
+"""Server-sent events: push leaderboard and game state changes to clients.
+
+``GET /api/stream`` sends a full ``snapshot`` event on connect (game state and the whole
+leaderboard) and afterwards only changes:
+
+- ``state``: the game settings snapshot changed (start/end, language, timeouts),
+- ``leaderboard``: ``changed`` rows (same shape as /api/leaderboard) and ``removed``
+  usernames.
+
+A single broker task on the event loop produces the changes. Every ``TICK`` seconds it
+compares the gamestate version with the last one it published (no query) and, if a
+transaction touching the ``scores`` table was committed since the last tick, takes the
+leaderboard from the rank index (ranking.py, which re-reads only the changed rows) and
+diffs it against the previous copy. Bursts of answers therefore cost one read per tick
+regardless of the number of subscribers.
+
+Each subscriber has a bounded queue. A client that can't keep up doesn't slow down the
+others: when its queue is full the pending changes are dropped and it is sent a fresh
+snapshot instead. Idle connections get a heartbeat comment every ``HEARTBEAT`` seconds,
+and the number of concurrent subscribers is capped (503 beyond that).
+"""
+import asyncio
+import json
+
+from . import gamestate, ranking, scores
+from .db import SessionLocal, CFG
+
+TICK = 0.5
+HEARTBEAT = 15
+_RESYNC = object()
+
+
+def _state(snap):
+    return {
+        'is_active': snap.is_active,
+        'current_phase': snap.current_phase,
+        'default_language': snap.default_language,
+        'version': snap.version,
+    }
+
+
+def _load_leaderboard():
+    # the rank index only re-reads rows changed since its last use
+    dbs = SessionLocal()
+    try:
+        return {row['telegram_username']: row for row in ranking.top(dbs)}
+    finally:
+        dbs.close()
+
+
+def _format(event, data, seq=None):
+    head = f'id: {seq}\n' if seq is not None else ''
+    return f'{head}event: {event}\ndata: {json.dumps(data, default=str, separators=(",", ":"))}\n\n'
+
+
+class _Subscriber:
+    __slots__ = ('queue',)
+
+    def __init__(self, size):
+        self.queue = asyncio.Queue(maxsize=size)
+
+
+class Broker:
+    def __init__(self, max_subscribers, queue_size):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._task = None
+        self._seq = 0
+        self._state = None
+        # username -> row, in leaderboard order; None until first needed
+        self._leaderboard = None
+        self._dirty = True
+        self.resyncs = 0
+
+    async def start(self):
+        scores.on_change(self.leaderboard_changed)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for sub in list(self._subscribers):
+            self._push(sub, None)
+
+    def leaderboard_changed(self, usernames=(), session_ids=()):
+        # called from request threads after a commit that touched the scores table
+        self._dirty = True
+
+    def stats(self):
+        return {'subscribers': len(self._subscribers), 'max_subscribers': self.max_subscribers,
+                'resyncs': self.resyncs, 'seq': self._seq}
+
+    async def subscribe(self):
+        """Register a subscriber and return it with its initial snapshot, or (None, None) at the cap."""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None, None
+        if self._leaderboard is None:
+            await self._refresh_leaderboard()
+        sub = _Subscriber(self.queue_size)
+        self._subscribers.add(sub)
+        return sub, self._snapshot()
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+    def _snapshot(self):
+        snap = gamestate.current()
+        return _format('snapshot', {'state': _state(snap), 'leaderboard': list((self._leaderboard or {}).values())}, self._seq)
+
+    def _push(self, sub, item):
+        try:
+            sub.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # slow consumer: drop what it hasn't read yet and resync it with a snapshot
+            self.resyncs += 1
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(_RESYNC if item is not None else None)
+
+    def _publish(self, event, data):
+        self._seq += 1
+        message = _format(event, data, self._seq)
+        for sub in list(self._subscribers):
+            self._push(sub, message)
+
+    async def _refresh_leaderboard(self):
+        self._dirty = False
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, _load_leaderboard)
+        previous, self._leaderboard = self._leaderboard, rows
+        return previous, rows
+
+    async def _tick(self):
+        snap = gamestate.current()
+        if self._state != snap.version:
+            first = self._state is None
+            self._state = snap.version
+            if not first:
+                self._publish('state', _state(snap))
+        if not self._subscribers:
+            # nobody listening: reload lazily when the next client connects
+            self._leaderboard = None
+            return
+        if self._dirty or self._leaderboard is None:
+            previous, rows = await self._refresh_leaderboard()
+            if previous is None:
+                return
+            changed = [row for name, row in rows.items() if previous.get(name) != row]
+            removed = [name for name in previous if name not in rows]
+            if changed or removed:
+                self._publish('leaderboard', {'changed': changed, 'removed': removed})
+
+    async def _run(self):
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('Event broker error:', e)
+            await asyncio.sleep(TICK)
+
+    async def stream(self, sub, snapshot):
+        """Async generator of SSE messages for one subscriber."""
+        try:
+            yield 'retry: 3000\n\n'
+            yield snapshot
+            while True:
+                try:
+                    item = await asyncio.wait_for(sub.queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                if item is None:
+                    return
+                yield self._snapshot() if item is _RESYNC else item
+        finally:
+            self.unsubscribe(sub)
+
+
+broker = Broker(CFG['stream_max_subscribers'], CFG['stream_queue_size'])
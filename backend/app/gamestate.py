@@ -0,0 +1,91 @@
+"""In-process snapshot of the game settings (the single ``game_state`` row).
+
+The row is read on every scan and by the public ``/api/settings/language`` endpoint but
+only changes when an admin starts/ends the game or edits the language or timeouts. Reads
+go through ``current()``, which returns an immutable ``Snapshot`` without touching the
+database. Admin writes go through ``save()``, which updates the row, commits and publishes
+a new snapshot with the next version number, so the version can be used to tell whether
+anything changed.
+
+The snapshot lives in process memory (like the question decks), so it assumes a single
+backend process; ``load()`` re-reads the row, e.g. at startup.
+"""
+import threading
+from collections import namedtuple
+
+from . import models
+from .db import SessionLocal
+
+Snapshot = namedtuple('Snapshot', [
+    'version', 'is_active', 'current_phase', 'default_language',
+    'question_timeout_seconds', 'task_timeout_seconds', 'updated_at',
+])
+
+DEFAULTS = Snapshot(
+    version=0, is_active=False, current_phase='idle', default_language='en',
+    question_timeout_seconds=10, task_timeout_seconds=300, updated_at=None,
+)
+
+_lock = threading.Lock()
+_current = None
+
+
+def _snapshot(gs, version):
+    if gs is None:
+        return DEFAULTS._replace(version=version)
+    return Snapshot(
+        version=version,
+        is_active=bool(gs.is_active),
+        current_phase=gs.current_phase or DEFAULTS.current_phase,
+        default_language=gs.default_language or DEFAULTS.default_language,
+        question_timeout_seconds=(gs.question_timeout_seconds if gs.question_timeout_seconds is not None
+                                  else DEFAULTS.question_timeout_seconds),
+        task_timeout_seconds=(gs.task_timeout_seconds if gs.task_timeout_seconds is not None
+                              else DEFAULTS.task_timeout_seconds),
+        updated_at=gs.updated_at,
+    )
+
+
+def _row(dbs):
+    return dbs.query(models.GameState).order_by(models.GameState.id).first()
+
+
+def load():
+    """(Re)read the game_state row and publish it as a new snapshot."""
+    global _current
+    dbs = SessionLocal()
+    try:
+        with _lock:
+            version = _current.version + 1 if _current else 1
+            _current = _snapshot(_row(dbs), version)
+            return _current
+    finally:
+        dbs.close()
+
+
+def current():
+    """Return the current settings snapshot (loaded from the database only once)."""
+    snap = _current
+    if snap is None:
+        snap = load()
+    return snap
+
+
+def save(dbs, **fields):
+    """Apply ``fields`` to the game_state row (creating it if missing), commit ``dbs`` and
+    publish the result as a new snapshot, which is returned.
+
+    Any other pending changes in ``dbs`` are committed in the same transaction.
+    """
+    global _current
+    with _lock:
+        gs = _row(dbs)
+        if gs is None:
+            gs = models.GameState(is_active=False, current_phase='idle')
+            dbs.add(gs)
+        for name, value in fields.items():
+            setattr(gs, name, value)
+        dbs.commit()
+        version = _current.version + 1 if _current else 1
+        _current = _snapshot(gs, version)
+        return _current
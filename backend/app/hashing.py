@@ -0,0 +1,170 @@
+"""Password hashing executor.
+
+bcrypt is CPU bound, so hashing and verification run in a dedicated process pool
+instead of occupying the request threadpool. The pool has a fixed number of workers
+(``hash_workers``) and a bounded backlog (``hash_queue_limit``); once the backlog is
+full new work is rejected with HashingBusy, which the app turns into a 503.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .db import CFG
+
+WORKERS = max(1, CFG['hash_workers'])
+QUEUE_LIMIT = max(1, CFG['hash_queue_limit'])
+
+# per worker process CryptContext, created once by the pool initializer
+_ctx = None
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def _init_worker():
+    global _ctx
+    from passlib.context import CryptContext
+    _ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password, submitted_at):
+    wait = time.time() - submitted_at
+    return _ctx.hash(password), wait
+
+
+def _hash_batch(passwords, submitted_at):
+    wait = time.time() - submitted_at
+    return [_ctx.hash(pw) for pw in passwords], wait
+
+
+def _verify(password, password_hash, submitted_at):
+    wait = time.time() - submitted_at
+    try:
+        ok = _ctx.verify(password, password_hash)
+    except (ValueError, TypeError):
+        # malformed/unknown hash in the database: treat as a failed login
+        ok = False
+    return ok, wait
+
+
+class _Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'workers': WORKERS,
+                'queue_limit': QUEUE_LIMIT,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'queue_wait_avg_ms': round(self.wait_total / self.completed * 1000, 2) if self.completed else 0.0,
+                'queue_wait_max_ms': round(self.wait_max * 1000, 2),
+            }
+
+
+_metrics = _Metrics()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: don't fork the server process (threads, open DB connections)
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker)
+    return _pool
+
+
+def _on_done(fut):
+    with _metrics.lock:
+        _metrics.pending -= 1
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        _metrics.completed += 1
+        wait = fut.result()[1]
+        _metrics.wait_total += wait
+        _metrics.wait_max = max(_metrics.wait_max, wait)
+
+
+def _submit(fn, *args):
+    with _metrics.lock:
+        if _metrics.pending >= QUEUE_LIMIT:
+            _metrics.rejected += 1
+            raise HashingBusy()
+        _metrics.pending += 1
+    try:
+        fut = _get_pool().submit(fn, *args, time.time())
+    except Exception:
+        with _metrics.lock:
+            _metrics.pending -= 1
+        raise
+    fut.add_done_callback(_on_done)
+    return fut
+
+
+def submit_hash(password):
+    """Schedule hashing of ``password``; returns a future of (hash, queue_wait)."""
+    return _submit(_hash, password)
+
+
+def submit_verify(password, password_hash):
+    """Schedule verification; returns a future of (ok, queue_wait)."""
+    return _submit(_verify, password, password_hash)
+
+
+def hash_password(password):
+    return submit_hash(password).result()[0]
+
+
+def verify_password(password, password_hash):
+    return submit_verify(password, password_hash).result()[0]
+
+
+def hash_many(passwords, batch_size=8):
+    """Hash a list of passwords across the pool, preserving order.
+
+    Work is sent in small batches with only a couple of batches per worker in flight,
+    so a large import doesn't fill the backlog and starve interactive logins.
+    """
+    passwords = list(passwords)
+    out = []
+    window = []
+    for i in range(0, len(passwords), batch_size):
+        window.append(_submit(_hash_batch, passwords[i:i + batch_size]))
+        if len(window) >= WORKERS * 2:
+            out.extend(window.pop(0).result()[0])
+    for fut in window:
+        out.extend(fut.result()[0])
+    return out
+
+
+async def hash_password_async(password):
+    return (await asyncio.wrap_future(submit_hash(password)))[0]
+
+
+async def verify_password_async(password, password_hash):
+    return (await asyncio.wrap_future(submit_verify(password, password_hash)))[0]
+
+
+def stats():
+    return _metrics.snapshot()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,455 @@
+"""Bulk import pipelines used by the admin import endpoints.
+
+Files are parsed line by line as they are read and processed in chunks: existing rows
+are looked up with one set-based query per chunk, and new rows are inserted in a single
+batched statement (one transaction) per chunk with ``ON CONFLICT DO NOTHING`` where the
+table has a unique key.
+
+Code words, tasks and surveys share one engine (``import_records``) which accepts the
+original plain-text formats as well as CSV (with a header row) and JSONL, dedupes on the
+stored normalized text hash and supports a dry run.
+"""
+import csv
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import models, hashing
+from .db import engine
+
+CHUNK_SIZE = 500
+# attempts (with growing pauses) to get a chunk's passwords into a full hashing queue
+BUSY_RETRIES = 5
+
+
+def iter_lines(fileobj):
+    """Yield (line_number, text) for each line of a binary file object.
+
+    Lines are decoded as UTF-8 with a latin-1 fallback (per line, so one odd line
+    doesn't force the whole file into latin-1).
+    """
+    for idx, raw in enumerate(fileobj, start=1):
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            text = raw.decode('latin-1')
+        yield idx, text.rstrip('\r\n')
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def insert_ignore(conn, table, rows, conflict_column):
+    """Insert ``rows`` skipping ones that conflict on ``conflict_column``.
+
+    Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    dialect = conn.dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(table).values(rows).on_conflict_do_nothing(index_elements=[conflict_column])
+        return len(conn.execute(stmt.returning(table.c.id)).fetchall())
+    if dialect == 'sqlite':
+        stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=[conflict_column])
+        return conn.execute(stmt, rows).rowcount
+    # other backends: rows were already filtered against existing keys
+    return conn.execute(table.insert(), rows).rowcount
+
+
+def _insert(table, rows, conflict_column):
+    with engine.begin() as conn:
+        if conflict_column:
+            return insert_ignore(conn, table, rows, conflict_column)
+        conn.execute(table.insert(), rows)
+        return len(rows)
+
+
+def _insert_chunk(table, fresh, conflict_column, report):
+    """Insert the ``(line, row)`` pairs of ``fresh`` and count them in ``report``.
+
+    One statement per chunk; if it fails the rows are inserted one by one, so only the
+    lines that fail are reported as errors.
+    """
+    try:
+        inserted = _insert(table, [row for _, row in fresh], conflict_column)
+        failed = 0
+    except Exception:
+        inserted = failed = 0
+        for line, row in fresh:
+            try:
+                inserted += _insert(table, [row], conflict_column)
+            except Exception as e:
+                report['errors'].append({'line': line, 'reason': str(e)})
+                failed += 1
+    report['created'] += inserted
+    # rows that lost a race with a concurrent insert
+    report['skipped'] += len(fresh) - failed - inserted
+
+
+class _Timer:
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, stage, started):
+        self.totals[stage] = self.totals.get(stage, 0.0) + (time.perf_counter() - started)
+
+    def timed(self, iterable, stage):
+        """Wrap a generator, charging the time spent producing items to ``stage``."""
+        it = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add(stage, started)
+                return
+            self.add(stage, started)
+            yield item
+
+    def report(self):
+        return {k: round(v * 1000, 1) for k, v in self.totals.items()}
+
+
+def _parse_participants(lines, report):
+    seen = set()
+    for idx, raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.startswith('#'):
+            report['skipped'] += 1
+            continue
+        # split on first whitespace to allow passwords that contain spaces
+        parts = line.split(None, 1)
+        if len(parts) < 2:
+            report['errors'].append({'line': idx, 'reason': 'Invalid format'})
+            continue
+        username = parts[0].strip()
+        password = parts[1].strip()
+        if not username or not password:
+            report['errors'].append({'line': idx, 'reason': 'Missing username or password'})
+            continue
+        if username in seen:
+            # duplicate inside the file: the first occurrence wins
+            report['skipped'] += 1
+            continue
+        seen.add(username)
+        yield idx, username, password
+
+
+def _processed(report):
+    return report['created'] + report['skipped'] + len(report['errors'])
+
+
+def _hash_chunk(passwords):
+    # the hashing queue is shared with logins; wait for room instead of failing the import
+    for attempt in range(BUSY_RETRIES):
+        if attempt:
+            time.sleep(0.5 * attempt)
+        try:
+            return hashing.hash_many(passwords)
+        except hashing.HashingBusy:
+            pass
+    return None
+
+
+def import_participants(fileobj, chunk_size=CHUNK_SIZE, progress=None):
+    """Import ``<username> <password>`` lines. Returns {created, skipped, errors, timings_ms}.
+
+    ``progress(done)`` is called after every chunk (see jobs.JobContext.progress).
+    """
+    report = {'created': 0, 'skipped': 0, 'errors': []}
+    timer = _Timer()
+    table = models.Participant.__table__
+    parsed = timer.timed(_parse_participants(iter_lines(fileobj), report), 'parse')
+    for chunk in _chunks(parsed, chunk_size):
+        started = time.perf_counter()
+        names = [username for _, username, _ in chunk]
+        with engine.connect() as conn:
+            existing = set(conn.execute(select(table.c.username).where(table.c.username.in_(names))).scalars())
+        timer.add('lookup', started)
+        fresh = [row for row in chunk if row[1] not in existing]
+        report['skipped'] += len(chunk) - len(fresh)
+        if not fresh:
+            if progress:
+                progress(_processed(report))
+            continue
+
+        started = time.perf_counter()
+        hashes = _hash_chunk([password for _, _, password in fresh])
+        timer.add('hash', started)
+        if hashes is None:
+            report['errors'].extend({'line': idx, 'reason': 'Server busy, import again later'} for idx, _, _ in fresh)
+            if progress:
+                progress(_processed(report))
+            continue
+
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        rows = [
+            {'username': username, 'username_key': models.normalize_text(username), 'password_hash': ph,
+             'created_at': now, 'language': 'en', 'correct_count': 0}
+            for (_, username, _), ph in zip(fresh, hashes)
+        ]
+        _insert_chunk(table, [(line, row) for (line, _, _), row in zip(fresh, rows)], 'username', report)
+        timer.add('insert', started)
+        if progress:
+            progress(_processed(report))
+    report['timings_ms'] = timer.report()
+    return report
+
+
+# --- code words, tasks and surveys -------------------------------------------------
+
+FORMATS = ('text', 'csv', 'jsonl')
+
+
+class RowError(ValueError):
+    """A record that can't be imported; reported per line."""
+
+    def __init__(self, reason, line=None):
+        super().__init__(reason)
+        self.line = line
+
+
+def detect_format(filename, requested=None):
+    if requested:
+        fmt = requested.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f'Unknown format: {requested}')
+        return fmt
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.jsonl') or name.endswith('.ndjson'):
+        return 'jsonl'
+    return 'text'
+
+
+def _parse_text_lines(lines, report, field):
+    # one record per non-empty, non-comment line
+    for idx, raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.startswith('#'):
+            report['skipped'] += 1
+            continue
+        yield idx, {field: line}
+
+
+def _parse_survey_blocks(lines, report):
+    """6-line blocks: question, four options, number 1..4 of the correct option."""
+    block = []
+    for idx, raw_line in lines:
+        if not block and (not raw_line.strip() or raw_line.strip().startswith('#')):
+            report['skipped'] += 1
+            continue
+        block.append((idx, raw_line.strip()))
+        if len(block) == 6:
+            yield block[0][0], {
+                'question_text': block[0][1],
+                'options': [text for _, text in block[1:5]],
+                'answer': block[5][1],
+                'answer_line': block[5][0],
+            }
+            block = []
+    if block:
+        report['errors'].append({'line': block[0][0], 'reason': 'Incomplete survey block'})
+
+
+def _parse_csv(lines, report):
+    reader = csv.DictReader(text + '\n' for _, text in lines)
+    for rec in reader:
+        if not any((v or '').strip() for v in rec.values() if isinstance(v, str)):
+            report['skipped'] += 1
+            continue
+        yield reader.line_num, rec
+
+
+def _parse_jsonl(lines, report):
+    for idx, raw_line in lines:
+        line = raw_line.strip()
+        if not line or line.startswith('#'):
+            report['skipped'] += 1
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            report['errors'].append({'line': idx, 'reason': 'Invalid JSON'})
+            continue
+        if not isinstance(rec, dict):
+            report['errors'].append({'line': idx, 'reason': 'Expected a JSON object'})
+            continue
+        yield idx, rec
+
+
+def _text(rec, field):
+    value = rec.get(field)
+    return str(value).strip() if value is not None else ''
+
+
+def _build_codeword(rec, now):
+    word = _text(rec, 'word')
+    if not word:
+        return None
+    if len(word) > 128:
+        raise RowError('Word too long')
+    return {'word': word, 'word_hash': models.normalized_hash(word), 'word_key': models.normalize_text(word),
+            'created_at': now, 'used': False}
+
+
+def _quest_id(rec):
+    try:
+        return int(rec.get('quest_id') or 1)
+    except (TypeError, ValueError):
+        raise RowError('Invalid quest_id')
+
+
+def _build_task(rec, now):
+    question_text = _text(rec, 'question_text')
+    if not question_text:
+        return None
+    return {
+        'question_text': question_text,
+        'text_hash': models.normalized_hash(question_text),
+        'correct_answer': '',
+        'options': json.dumps([]),
+        'quest_id': _quest_id(rec),
+        'used': False,
+        'is_task': True,
+    }
+
+
+def _build_survey(rec, now):
+    question_text = _text(rec, 'question_text')
+    if not question_text:
+        raise RowError('Missing question_text')
+    opts = rec.get('options')
+    if opts is None:
+        # CSV layout: option1..option4 columns
+        opts = [_text(rec, f'option{n}') for n in range(1, 5)]
+    if not isinstance(opts, list) or len(opts) != 4:
+        raise RowError('Expected four options')
+    opts = [str(o).strip() for o in opts]
+    answer_line = rec.get('answer_line')
+    if rec.get('correct_answer') is not None and rec.get('answer') is None:
+        correct_answer = _text(rec, 'correct_answer')
+        if correct_answer not in opts:
+            raise RowError('correct_answer is not one of the options')
+    else:
+        try:
+            ans_idx = int(str(rec.get('answer')).strip())
+        except (TypeError, ValueError):
+            raise RowError('Invalid answer index', answer_line)
+        if ans_idx < 1 or ans_idx > 4:
+            raise RowError('Answer index out of range (1-4)', answer_line)
+        correct_answer = opts[ans_idx - 1]
+    return {
+        'question_text': question_text,
+        'text_hash': models.normalized_hash(question_text),
+        'correct_answer': correct_answer,
+        'options': json.dumps(opts),
+        'quest_id': _quest_id(rec),
+        'used': False,
+        'is_task': False,
+    }
+
+
+class _Spec:
+    def __init__(self, model, key, build, text_parser, scope=None, conflict_column=None):
+        self.model = model
+        self.key = key
+        self.build = build
+        self.text_parser = text_parser
+        # extra filters restricting which existing rows count as duplicates
+        self.scope = scope or {}
+        self.conflict_column = conflict_column
+
+
+SPECS = {
+    'codewords': _Spec(models.CodeWord, 'word_hash', _build_codeword,
+                       lambda lines, report: _parse_text_lines(lines, report, 'word'),
+                       conflict_column='word'),
+    'tasks': _Spec(models.Question, 'text_hash', _build_task,
+                   lambda lines, report: _parse_text_lines(lines, report, 'question_text'),
+                   scope={'is_task': True}),
+    'surveys': _Spec(models.Question, 'text_hash', _build_survey, _parse_survey_blocks,
+                     scope={'is_task': False}),
+}
+
+
+def _rows(spec, records, report):
+    seen = set()
+    now = datetime.utcnow()
+    for line, rec in records:
+        try:
+            row = spec.build(rec, now)
+        except RowError as e:
+            report['errors'].append({'line': e.line or line, 'reason': str(e)})
+            continue
+        if row is None:
+            report['skipped'] += 1
+            continue
+        if row[spec.key] in seen:
+            report['skipped'] += 1
+            continue
+        seen.add(row[spec.key])
+        yield line, row
+
+
+def import_records(kind, fileobj, filename=None, fmt=None, dry_run=False, chunk_size=CHUNK_SIZE, progress=None):
+    """Import code words / tasks / surveys.
+
+    Returns {created, skipped, errors, dry_run, timings_ms}; with ``dry_run`` nothing is
+    written and ``created`` is the number of rows that would be inserted.
+    """
+    spec = SPECS[kind]
+    fmt = detect_format(filename, fmt)
+    report = {'created': 0, 'skipped': 0, 'errors': []}
+    timer = _Timer()
+    table = spec.model.__table__
+    lines = iter_lines(fileobj)
+    if fmt == 'csv':
+        records = _parse_csv(lines, report)
+    elif fmt == 'jsonl':
+        records = _parse_jsonl(lines, report)
+    else:
+        records = spec.text_parser(lines, report)
+    rows = timer.timed(_rows(spec, records, report), 'parse')
+
+    key_col = table.c[spec.key]
+    for chunk in _chunks(rows, chunk_size):
+        started = time.perf_counter()
+        stmt = select(key_col).where(key_col.in_([row[spec.key] for _, row in chunk]))
+        for column, value in spec.scope.items():
+            stmt = stmt.where(table.c[column] == value)
+        with engine.connect() as conn:
+            existing = set(conn.execute(stmt).scalars())
+        timer.add('lookup', started)
+        fresh = [(line, row) for line, row in chunk if row[spec.key] not in existing]
+        report['skipped'] += len(chunk) - len(fresh)
+        if dry_run:
+            report['created'] += len(fresh)
+            fresh = []
+        if not fresh:
+            if progress:
+                progress(_processed(report))
+            continue
+
+        started = time.perf_counter()
+        _insert_chunk(table, fresh, spec.conflict_column, report)
+        timer.add('insert', started)
+        if progress:
+            progress(_processed(report))
+    report['dry_run'] = bool(dry_run)
+    report['timings_ms'] = timer.report()
+    return report
@@ -0,0 +1,184 @@
+"""In-process background jobs for long admin operations.
+
+Jobs are recorded in the ``jobs`` table so their state survives the request that started
+them and can be polled via ``GET /api/admin/jobs/{id}``. A small pool of asyncio workers
+takes jobs off a queue and runs the (blocking) job function in a dedicated thread pool,
+so long imports/deletes don't occupy request threads.
+
+A job function is called as ``fn(ctx, *args)``. It should report progress with
+``ctx.progress(done, total)``, which also raises JobCancelled once cancellation has
+been requested. Its return value (JSON-serializable) is stored as the job result.
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from . import models
+from .db import SessionLocal, CFG
+
+STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+# minimum seconds between progress writes to the jobs table
+PROGRESS_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    def __init__(self, job_id, cancel_event):
+        self.job_id = job_id
+        self._cancel = cancel_event
+        self.done = 0
+        self.total = None
+        self._flushed_at = 0.0
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.monotonic()
+        if now - self._flushed_at >= PROGRESS_INTERVAL:
+            self._flushed_at = now
+            _update(self.job_id, progress_done=self.done, progress_total=self.total)
+        if self.cancelled():
+            raise JobCancelled()
+
+
+def _update(job_id, **fields):
+    dbs = SessionLocal()
+    try:
+        dbs.query(models.Job).filter_by(id=job_id).update(fields, synchronize_session=False)
+        dbs.commit()
+    finally:
+        dbs.close()
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'state': job.state,
+        'progress_done': job.progress_done,
+        'progress_total': job.progress_total,
+        'cancel_requested': bool(job.cancel_requested),
+        'result': json.loads(job.result) if job.result else None,
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+class JobRunner:
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._executor = None
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        # jobs that were queued/running when the previous process stopped will never finish
+        dbs = SessionLocal()
+        try:
+            dbs.query(models.Job).filter(models.Job.state.in_(['queued', 'running'])).update(
+                {'state': 'failed', 'error': 'Interrupted by server restart', 'finished_at': datetime.utcnow()},
+                synchronize_session=False)
+            dbs.commit()
+        finally:
+            dbs.close()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for event in list(self._cancel_events.values()):
+            event.set()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, kind, fn, *args):
+        """Record a queued job and schedule ``fn(ctx, *args)``. Safe to call from request threads."""
+        if self._loop is None:
+            raise RuntimeError('Job runner is not started')
+        dbs = SessionLocal()
+        try:
+            job = models.Job(kind=kind, state='queued')
+            dbs.add(job)
+            dbs.commit()
+            job_id = job.id
+        finally:
+            dbs.close()
+        with self._lock:
+            self._cancel_events[job_id] = threading.Event()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (job_id, fn, args))
+        return job_id
+
+    def cancel(self, job_id):
+        """Request cancellation. Queued jobs are cancelled right away; running jobs stop at their next progress report."""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        dbs = SessionLocal()
+        try:
+            job = dbs.query(models.Job).filter_by(id=job_id).first()
+            if not job:
+                return None
+            if job.state in ('queued', 'running'):
+                job.cancel_requested = True
+                if job.state == 'queued':
+                    job.state = 'cancelled'
+                    job.finished_at = datetime.utcnow()
+                dbs.commit()
+            return job_to_dict(job)
+        finally:
+            dbs.close()
+
+    async def _worker(self):
+        while True:
+            job_id, fn, args = await self._queue.get()
+            try:
+                await self._loop.run_in_executor(self._executor, self._run, job_id, fn, args)
+            except Exception as e:
+                print('Job worker error:', e)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id, fn, args):
+        with self._lock:
+            event = self._cancel_events.get(job_id) or threading.Event()
+        try:
+            if event.is_set():
+                return
+            _update(job_id, state='running', started_at=datetime.utcnow())
+            ctx = JobContext(job_id, event)
+            try:
+                result = fn(ctx, *args)
+            except JobCancelled:
+                _update(job_id, state='cancelled', progress_done=ctx.done, progress_total=ctx.total, finished_at=datetime.utcnow())
+            except Exception as e:
+                _update(job_id, state='failed', error=str(e), progress_done=ctx.done, progress_total=ctx.total, finished_at=datetime.utcnow())
+            else:
+                _update(job_id, state='done', result=json.dumps(result, default=str), progress_done=ctx.done,
+                        progress_total=ctx.total, finished_at=datetime.utcnow())
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+
+runner = JobRunner(CFG['job_workers'])
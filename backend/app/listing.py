@@ -0,0 +1,142 @@
+"""Cursor pagination, search and sorting for the admin list endpoints.
+
+``/api/admin/questions``, ``/tasks``, ``/participants`` and ``/codewords`` accept:
+
+- ``limit``: page size (1..``PAGE_MAX``). Without it the whole (searched, sorted) list
+  is returned, as before.
+- ``cursor``: continue after the previous page; its value is the ``X-Next-Cursor``
+  response header, which is only set when more rows follow.
+- ``sort``: one of the endpoint's sort keys, ``-`` in front for descending (``-id``,
+  newest first, is the default).
+- ``q`` and ``match``: ``prefix`` or ``contains`` search on the name/word/text.
+
+Pages are keyset pages ordered by ``(sort column, id)``: the cursor holds the last row's
+values and the next page starts with ``WHERE (col, id) > (…)``, so every page costs the
+same however deep it is. Names and words are searched and sorted through their
+``normalize_text`` keys (``username_key``, ``word_key``), which makes the search case
+and whitespace insensitive. A prefix search is a ``LIKE 'key%'`` served by an index on
+the key in pattern order (``text_pattern_ops`` on Postgres, ``NOCASE`` on SQLite);
+substring search uses trigram indexes on Postgres where ``pg_trgm`` is available.
+
+With ``limit`` the ``X-Total-Count`` header holds the number of matching rows. Counts
+are cached per table version (versions.py), so they are only recomputed after the table
+was written to.
+"""
+import base64
+import binascii
+import json
+import threading
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, func, or_
+
+from . import versions
+from .models import normalize_text
+
+PAGE_MAX = 200
+MATCHES = ('prefix', 'contains')
+_COUNTS_MAX = 512
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def _encode(sort, value, row_id):
+    raw = json.dumps([sort, value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode(cursor, sort):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, value, row_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    if name != sort:
+        raise HTTPException(status_code=400, detail='Cursor is for another sort order')
+    return value, row_id
+
+
+def _like_escape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search(column, normalized, q, match):
+    if normalized:
+        key = normalize_text(q)
+        if not key:
+            return None
+        # a prefix LIKE uses the text_pattern_ops / NOCASE key indexes (migration 11); a
+        # range on the key would only be right under C collation
+        pattern = f'{_like_escape(key)}%' if match == 'prefix' else f'%{_like_escape(key)}%'
+        return column.like(pattern, escape='\\')
+    text = ' '.join(q.split()).lower()
+    if not text:
+        return None
+    pattern = f'{_like_escape(text)}%' if match == 'prefix' else f'%{_like_escape(text)}%'
+    return func.lower(column).like(pattern, escape='\\')
+
+
+def count(query, table, key):
+    """Number of rows of ``query``, cached until ``table`` changes."""
+    tag = versions.etag(table)
+    with _counts_lock:
+        hit = _counts.get(key)
+        if hit is not None and hit[0] == tag:
+            return hit[1]
+    total = query.order_by(None).count()
+    with _counts_lock:
+        if len(_counts) >= _COUNTS_MAX:
+            _counts.clear()
+        _counts[key] = (tag, total)
+    return total
+
+
+def page(query, response: Response, *, table, id_column, sorts, sort=None, default_sort='-id',
+         search=None, q=None, match=None, limit=None, cursor=None):
+    """Rows of ``query`` searched, sorted and paginated per the request parameters.
+
+    ``sorts`` maps sort keys to columns, ``search`` is ``(column, normalized)`` with
+    ``normalized`` telling whether the column holds ``normalize_text`` keys. ``table``
+    is the versions.py name the count cache is keyed on.
+    """
+    sort = sort or default_sort
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in sorts:
+        raise HTTPException(status_code=400, detail=f'sort must be one of: {", ".join(sorted(sorts))}')
+    if limit is not None and not 0 < limit <= PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f'limit must be 1..{PAGE_MAX}')
+    if match is None:
+        match = 'prefix' if search is not None and search[1] else 'contains'
+    if match not in MATCHES:
+        raise HTTPException(status_code=400, detail=f'match must be one of: {", ".join(MATCHES)}')
+    column = sorts[name]
+
+    if q and search is not None:
+        condition = _search(search[0], search[1], q, match)
+        if condition is not None:
+            query = query.filter(condition)
+    if limit is not None:
+        # the statement and its parameters identify base filters and search alike
+        compiled = query.statement.compile()
+        key = (table, str(compiled), tuple(sorted(compiled.params.items())))
+        response.headers['X-Total-Count'] = str(count(query, table, key))
+
+    if cursor:
+        value, row_id = _decode(cursor, sort)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, id_column < row_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, id_column > row_id)))
+    if descending:
+        query = query.order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(column.asc(), id_column.asc())
+    if limit is None:
+        return query.all()
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = _encode(sort, getattr(last, column.key), getattr(last, id_column.key))
+    return rows
@@ -1,6 +1,7 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from . import db, routers
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from . import db, routers, hashing, jobs, gamestate, events, uploads, resumable, derivatives, storage
 import os
 
 app = FastAPI(title="Birthday Raffle Quiz")
@@ -9,11 +10,36 @@ app = FastAPI(title="Birthday Raffle Quiz")
 @app.on_event("startup")
 def startup():
     db.init_database()
+    gamestate.load()
 
 
-UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-# serve uploaded files at /uploads
-app.mount('/uploads', StaticFiles(directory=UPLOAD_DIR), name='uploads')
+@app.on_event("startup")
+async def start_jobs():
+    await jobs.runner.start()
+    await events.broker.start()
+    await resumable.sweeper.start()
+    await storage.collector.start()
+    # variants for uploads that don't have them yet
+    await run_in_threadpool(derivatives.backfill)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await storage.collector.stop()
+    await resumable.sweeper.stop()
+    await events.broker.stop()
+    await jobs.runner.stop()
+    hashing.shutdown()
+    derivatives.shutdown()
+
+
+@app.exception_handler(hashing.HashingBusy)
+def hashing_busy(request: Request, exc: hashing.HashingBusy):
+    return JSONResponse(status_code=503, content={'detail': 'Server busy, please retry'}, headers={'Retry-After': '1'})
+
+
+os.makedirs(uploads.UPLOAD_DIR, exist_ok=True)
 
 app.include_router(routers.api_router)
+# uploaded files at /uploads/<key>
+app.include_router(routers.files_router)
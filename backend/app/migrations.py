@@ -0,0 +1,254 @@
+"""Versioned schema migrations.
+
+Each step in ``MIGRATIONS`` has a version number and is applied at most once: applied
+steps are recorded in the ``schema_migrations`` table, and ``migrate()`` only runs the
+steps newer than the recorded version, each in its own transaction together with its
+version row. When the schema is current, startup does no DDL at all.
+
+Steps must be idempotent (check for existing columns, ``CREATE INDEX IF NOT EXISTS``):
+a database created by ``Base.metadata.create_all`` already has the latest schema, but
+starts without any recorded version and runs every step once.
+
+New tables and columns need a step here; ``create_all`` only runs when there are
+pending steps.
+"""
+import os
+
+from sqlalchemy import func, inspect, select, text
+
+from . import models
+from .models import Base, normalized_hash, normalize_text
+
+# Postgres advisory lock key, so concurrently starting workers don't migrate twice
+_LOCK_KEY = 72150811
+
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl, not_null=False):
+    if column not in _columns(conn, table):
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    if not_null and conn.dialect.name == 'postgresql':
+        conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL'))
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    conn.execute(text(f'CREATE {kind} IF NOT EXISTS {name} ON {table} ({", ".join(columns)})'))
+
+
+def _legacy_columns(conn):
+    # the additive changes init_database used to re-apply on every boot
+    _add_column(conn, 'questions', 'used', 'boolean DEFAULT false', not_null=True)
+    _add_column(conn, 'code_words', 'used', 'boolean DEFAULT false', not_null=True)
+    _add_column(conn, 'questions', 'is_task', 'boolean DEFAULT false', not_null=True)
+    _add_column(conn, 'game_state', 'default_language', "varchar(16) DEFAULT 'en'")
+    _add_column(conn, 'game_state', 'question_timeout_seconds', 'integer DEFAULT 10')
+    _add_column(conn, 'game_state', 'task_timeout_seconds', 'integer DEFAULT 300')
+    _add_column(conn, 'participants', 'language', "varchar(16) DEFAULT 'en'")
+    _add_column(conn, 'participants', 'correct_count', 'integer DEFAULT 0')
+    _add_column(conn, 'task_submissions', 'rating', 'integer')
+
+
+def _text_hashes(conn):
+    # normalized text hashes used to dedupe imports and look up code words
+    _add_column(conn, 'questions', 'text_hash', 'varchar(64)')
+    _create_index(conn, 'ix_questions_text_hash', 'questions', ['text_hash'])
+    _add_column(conn, 'code_words', 'word_hash', 'varchar(64)')
+    _create_index(conn, 'ix_code_words_word_hash', 'code_words', ['word_hash'])
+    # backfill rows created before the columns existed (new rows get them from column defaults)
+    questions = models.Question.__table__
+    for qid, question_text in conn.execute(
+            select(questions.c.id, questions.c.question_text).where(questions.c.text_hash == None)).fetchall():
+        conn.execute(questions.update().where(questions.c.id == qid).values(text_hash=normalized_hash(question_text)))
+    words = models.CodeWord.__table__
+    for wid, word in conn.execute(
+            select(words.c.id, words.c.word).where(words.c.word_hash == None)).fetchall():
+        conn.execute(words.update().where(words.c.id == wid).values(word_hash=normalized_hash(word)))
+
+
+def _unique_scans(conn):
+    # one scan per (session, code); required by the scan insert's ON CONFLICT clause.
+    # Drop duplicates recorded before the constraint existed, keeping the first scan.
+    conn.execute(text(
+        'DELETE FROM user_scans WHERE id NOT IN '
+        '(SELECT MIN(id) FROM user_scans GROUP BY session_id, code)'))
+    _create_index(conn, 'uq_user_scans_session_code', 'user_scans', ['session_id', 'code'], unique=True)
+
+
+def _event_indexes(conn):
+    # user_scans (session_id, code) is served by uq_user_scans_session_code
+    _create_index(conn, 'ix_user_answers_session_id', 'user_answers', ['session_id'])
+    _create_index(conn, 'ix_user_served_questions_session_id', 'user_served_questions', ['session_id'])
+    _create_index(conn, 'ix_task_submissions_session_question', 'task_submissions', ['session_id', 'question_id'])
+    _create_index(conn, 'ix_user_sessions_telegram_username', 'user_sessions', ['telegram_username'])
+
+
+def _scores(conn):
+    # materialized leaderboard, filled from the raw events
+    from . import scores
+    scores.table.create(conn, checkfirst=True)
+    _create_index(conn, 'ix_scores_rank', 'scores', ['score DESC', 'username'])
+    scores.repair(conn)
+
+
+def _task_uploads(conn):
+    # resumable uploads in progress
+    models.TaskUpload.__table__.create(conn, checkfirst=True)
+    _create_index(conn, 'ix_task_uploads_updated_at', 'task_uploads', ['updated_at'])
+
+
+def _content_store(conn):
+    # move uploads to the content-addressed store: re-point rows with legacy file names to
+    # hash keys and count the references. The legacy files are linked (or copied), not
+    # moved, so a failed migration leaves them intact.
+    import shutil
+    from . import storage, uploads
+    models.StoredFile.__table__.create(conn, checkfirst=True)
+    store = storage.backend()
+    keys = {}
+    for model, column in ((models.TaskSubmission, 'filename'), (models.Box, 'hint_filename')):
+        t = model.__table__
+        for row_id, name in conn.execute(select(t.c.id, t.c[column]).where(t.c[column] != None)).fetchall():
+            if storage.is_key(name):
+                continue
+            source = os.path.join(uploads.UPLOAD_DIR, os.path.basename(name))
+            if not os.path.isfile(source):
+                continue
+            if name not in keys:
+                with open(source, 'rb') as f:
+                    kind = uploads.sniff(f.read(uploads.SNIFF_BYTES))
+                key = storage.digest_file(source) + (kind[1] if kind else os.path.splitext(name)[1].lower())
+                if not store.exists(key):
+                    tmp = os.path.join(uploads.PARTIAL_DIR, f'{key}.migrate')
+                    os.makedirs(uploads.PARTIAL_DIR, exist_ok=True)
+                    try:
+                        os.link(source, tmp)
+                    except OSError:
+                        shutil.copyfile(source, tmp)
+                    store.put(key, tmp)
+                keys[name] = key
+            conn.execute(t.update().where(t.c.id == row_id).values({column: keys[name]}))
+    # reference counts from scratch
+    counts = {}
+    for t, column in ((models.TaskSubmission.__table__, 'filename'), (models.Box.__table__, 'hint_filename')):
+        for name, n in conn.execute(select(t.c[column], func.count()).where(t.c[column] != None).group_by(t.c[column])):
+            if storage.is_key(name):
+                counts[name] = counts.get(name, 0) + n
+    conn.execute(storage.table.delete())
+    if counts:
+        conn.execute(storage.table.insert(), [{'key': k, 'refs': n} for k, n in counts.items()])
+
+
+def _upload_tombstones(conn):
+    # deferred deletion of unreferenced uploads (see storage.py)
+    _add_column(conn, 'stored_files', 'collect_after', 'timestamp')
+    _add_column(conn, 'stored_files', 'attempts', 'integer DEFAULT 0', not_null=True)
+    _add_column(conn, 'stored_files', 'last_error', 'varchar(256)')
+    _create_index(conn, 'ix_stored_files_collect_after', 'stored_files', ['collect_after'])
+    conn.execute(text('UPDATE stored_files SET collect_after = updated_at WHERE refs <= 0'))
+
+
+def _submission_review_index(conn):
+    # admin submission review pages and task summary (see admin_task_submissions)
+    _create_index(conn, 'ix_task_submissions_question_review', 'task_submissions', ['question_id', 'id', 'rating'])
+
+
+def _admin_list_indexes(conn):
+    # search keys and indexes of the paginated admin lists (see listing.py)
+    _add_column(conn, 'participants', 'username_key', 'varchar(256)')
+    _add_column(conn, 'code_words', 'word_key', 'varchar(256)')
+    participants = models.Participant.__table__
+    for pid, username in conn.execute(
+            select(participants.c.id, participants.c.username).where(participants.c.username_key == None)).fetchall():
+        conn.execute(participants.update().where(participants.c.id == pid).values(username_key=normalize_text(username)))
+    words = models.CodeWord.__table__
+    for wid, word in conn.execute(select(words.c.id, words.c.word).where(words.c.word_key == None)).fetchall():
+        conn.execute(words.update().where(words.c.id == wid).values(word_key=normalize_text(word)))
+    _create_index(conn, 'ix_participants_username_key', 'participants', ['username_key', 'id'])
+    _create_index(conn, 'ix_code_words_word_key', 'code_words', ['word_key', 'id'])
+    _create_index(conn, 'ix_questions_is_task_id', 'questions', ['is_task', 'id'])
+    if conn.dialect.name == 'postgresql':
+        # substring search (?match=contains) uses trigram indexes where pg_trgm can be installed
+        try:
+            with conn.begin_nested():
+                conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        except Exception:
+            return
+        _create_index(conn, 'ix_participants_username_key_trgm', 'participants USING gin', ['username_key gin_trgm_ops'])
+        _create_index(conn, 'ix_code_words_word_key_trgm', 'code_words USING gin', ['word_key gin_trgm_ops'])
+        _create_index(conn, 'ix_questions_text_trgm', 'questions USING gin', ['lower(question_text) gin_trgm_ops'])
+
+
+def _prefix_search_indexes(conn):
+    # prefix search is a LIKE 'key%' (see listing.py); the plain (key, id) indexes only
+    # serve it under C collation, so add indexes in an order LIKE can use
+    if conn.dialect.name == 'postgresql':
+        _create_index(conn, 'ix_participants_username_key_prefix', 'participants', ['username_key text_pattern_ops', 'id'])
+        _create_index(conn, 'ix_code_words_word_key_prefix', 'code_words', ['word_key text_pattern_ops', 'id'])
+    elif conn.dialect.name == 'sqlite':
+        # SQLite's LIKE ignores ASCII case, so it needs NOCASE; the keys are case-folded anyway
+        _create_index(conn, 'ix_participants_username_key_prefix', 'participants', ['username_key COLLATE NOCASE', 'id'])
+        _create_index(conn, 'ix_code_words_word_key_prefix', 'code_words', ['word_key COLLATE NOCASE', 'id'])
+
+
+
+def _submission_upload_ids(conn):
+    # finalize recognizes a submission made from the same resumable upload (see resumable.py)
+    _add_column(conn, 'task_submissions', 'upload_id', 'varchar(64)')
+    _create_index(conn, 'ix_task_submissions_upload_id', 'task_submissions', ['upload_id'])
+
+# (version, name, step); append only, never renumber
+MIGRATIONS = [
+    (1, 'legacy columns', _legacy_columns),
+    (2, 'normalized text hashes', _text_hashes),
+    (3, 'unique scans per session', _unique_scans),
+    (4, 'event table indexes', _event_indexes),
+    (5, 'leaderboard scores', _scores),
+    (6, 'resumable task uploads', _task_uploads),
+    (7, 'content-addressed uploads', _content_store),
+    (8, 'upload tombstones', _upload_tombstones),
+    (9, 'submission review index', _submission_review_index),
+    (10, 'admin list indexes', _admin_list_indexes),
+    (11, 'prefix search indexes', _prefix_search_indexes),
+    (12, 'submission upload ids', _submission_upload_ids),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(engine):
+    """Highest applied migration, 0 for a database without the migrations table."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(models.SchemaMigration.__tablename__):
+            return 0
+        return conn.execute(func.max(models.SchemaMigration.version).select()).scalar() or 0
+
+
+def migrate(engine):
+    """Create missing tables and apply pending migrations. Returns the list of applied versions."""
+    if current_version(engine) >= LATEST:
+        return []
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == 'postgresql':
+            lock_conn.execute(text('SELECT pg_advisory_lock(:key)'), {'key': _LOCK_KEY})
+        try:
+            Base.metadata.create_all(engine)
+            # re-read under the lock: another worker may have migrated in the meantime
+            version = current_version(engine)
+            applied = []
+            table = models.SchemaMigration.__table__
+            for number, name, step in MIGRATIONS:
+                if number <= version:
+                    continue
+                with engine.begin() as conn:
+                    step(conn)
+                    conn.execute(table.insert().values(version=number, name=name))
+                print(f'Applied migration {number}: {name}')
+                applied.append(number)
+            return applied
+        finally:
+            if engine.dialect.name == 'postgresql':
+                lock_conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': _LOCK_KEY})
@@ -1,14 +1,40 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+import hashlib
+import unicodedata
 
 Base = declarative_base()
 
 
+def normalize_text(text):
+    """Case-fold, NFKC-normalize and collapse whitespace."""
+    return ' '.join(unicodedata.normalize('NFKC', text or '').casefold().split())
+
+
+def normalized_hash(text):
+    """Stable key used to detect duplicate question texts / code words."""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def _hash_of(column):
+    # column default computing the hash from another column of the same insert
+    def default(context):
+        return normalized_hash(context.get_current_parameters().get(column))
+    return default
+
+
+def _normalized_of(column):
+    # column default: normalize_text of another column of the same insert (search keys)
+    def default(context):
+        return normalize_text(context.get_current_parameters().get(column))
+    return default
+
+
 class UserSession(Base):
     __tablename__ = 'user_sessions'
     id = Column(Integer, primary_key=True)
-    telegram_username = Column(String(128), nullable=False)
+    telegram_username = Column(String(128), nullable=False, index=True)
     session_id = Column(String(128), nullable=False, unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -23,13 +49,15 @@ class Question(Base):
     used = Column(Boolean, default=False, nullable=False)
     # whether this question is a task (e.g., upload a selfie) delivered per participant
     is_task = Column(Boolean, default=False, nullable=False)
+    # normalized_hash(question_text); used to skip duplicates on import
+    text_hash = Column(String(64), index=True, default=_hash_of('question_text'))
     # removed is_active: questions are considered present unless removed via admin in future
 
 
 class UserAnswer(Base):
     __tablename__ = 'user_answers'
     id = Column(Integer, primary_key=True)
-    session_id = Column(String(128), nullable=False)
+    session_id = Column(String(128), nullable=False, index=True)
     question_id = Column(Integer, nullable=False)
     answer = Column(String(256), nullable=False)
     is_correct = Column(Boolean, nullable=False)
@@ -65,6 +93,8 @@ class QRCode(Base):
 
 class UserScan(Base):
     __tablename__ = 'user_scans'
+    # a session can scan each code once; scans are recorded with ON CONFLICT DO NOTHING
+    __table_args__ = (UniqueConstraint('session_id', 'code', name='uq_user_scans_session_code'),)
     id = Column(Integer, primary_key=True)
     session_id = Column(String(128), nullable=False)
     # store the raw scanned payload (numeric or word) as string for flexibility
@@ -75,7 +105,7 @@ class UserScan(Base):
 class UserServedQuestion(Base):
     __tablename__ = 'user_served_questions'
     id = Column(Integer, primary_key=True)
-    session_id = Column(String(128), nullable=False)
+    session_id = Column(String(128), nullable=False, index=True)
     question_id = Column(Integer, nullable=False)
     served_at = Column(DateTime, default=datetime.utcnow)
 
@@ -86,6 +116,10 @@ class CodeWord(Base):
     word = Column(String(128), unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     used = Column(Boolean, default=False, nullable=False)
+    # normalized_hash(word); case/whitespace-insensitive duplicate detection
+    word_hash = Column(String(64), index=True, default=_hash_of('word'))
+    # normalize_text(word); admin list search and sort (see app/listing.py)
+    word_key = Column(String(256), default=_normalized_of('word'))
 
 
 class Participant(Base):
@@ -97,10 +131,18 @@ class Participant(Base):
     language = Column(String(16), default='en')
     # number of correct answers / admin-awarded points
     correct_count = Column(Integer, default=0)
+    # normalize_text(username); admin list search and sort (see app/listing.py)
+    username_key = Column(String(256), default=_normalized_of('username'))
 
 
 class TaskSubmission(Base):
     __tablename__ = 'task_submissions'
+    __table_args__ = (
+        Index('ix_task_submissions_session_question', 'session_id', 'question_id'),
+        # review pages (keyset on id, newest first, rated/unrated filter) and the
+        # per-task counts are both read from this index
+        Index('ix_task_submissions_question_review', 'question_id', 'id', 'rating'),
+    )
     id = Column(Integer, primary_key=True)
     session_id = Column(String(128), nullable=False)
     question_id = Column(Integer, nullable=False)
@@ -108,6 +150,67 @@ class TaskSubmission(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     # admin-assigned rating (0..5); null if not rated yet
     rating = Column(Integer, nullable=True)
+    # the resumable upload (task_uploads.id) it was made from, so finalize can be retried
+    upload_id = Column(String(64), nullable=True, index=True)
+
+
+class TaskUpload(Base):
+    """Resumable task submission upload in progress (see app/resumable.py)."""
+    __tablename__ = 'task_uploads'
+    id = Column(String(64), primary_key=True)
+    session_id = Column(String(128), nullable=False)
+    question_id = Column(Integer, nullable=False)
+    filename = Column(String(512), nullable=True)
+    # declared total size and the fixed chunk size; chunk n starts at n * chunk_size
+    size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    # bytes received so far (always a whole number of chunks, or size)
+    received = Column(Integer, nullable=False, default=0)
+    # sniffed from the first chunk
+    content_type = Column(String(32), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # uploads without activity for upload_ttl seconds are expired
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class StoredFile(Base):
+    """A file in the content-addressed upload store and its reference count (see app/storage.py)."""
+    __tablename__ = 'stored_files'
+    id = Column(Integer, primary_key=True)
+    # <sha256>.<ext>
+    key = Column(String(128), unique=True, nullable=False)
+    size = Column(Integer, nullable=True)
+    content_type = Column(String(32), nullable=True)
+    # task submissions and box hints referencing the file; rows with refs <= 0 are
+    # tombstones of files waiting to be deleted by the collector
+    refs = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    # when the collector may (re)try deleting a tombstoned file, failed attempts and the last error
+    collect_after = Column(DateTime, nullable=True, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(256), nullable=True)
+
+
+class Score(Base):
+    """Materialized leaderboard row per username (see app/scores.py)."""
+    __tablename__ = 'scores'
+    id = Column(Integer, primary_key=True)
+    username = Column(String(128), unique=True, nullable=False)
+    # answers given / answered correctly across all sessions of the username
+    answers = Column(Integer, nullable=False, default=0)
+    correct_answers = Column(Integer, nullable=False, default=0)
+    # admin-awarded points (Participant.correct_count)
+    awarded = Column(Integer, nullable=False, default=0)
+    # correct_answers + awarded; the leaderboard ranks by this
+    score = Column(Integer, nullable=False, default=0)
+
+
+Index('ix_scores_rank', Score.score.desc(), Score.username)
+# admin lists (see app/listing.py): prefix search and name order, newest first per kind
+Index('ix_participants_username_key', Participant.username_key, Participant.id)
+Index('ix_code_words_word_key', CodeWord.word_key, CodeWord.id)
+Index('ix_questions_is_task_id', Question.is_task, Question.id)
 
 
 class Box(Base):
@@ -116,3 +219,27 @@ class Box(Base):
     box_index = Column(Integer, nullable=False, unique=True)
     hint_filename = Column(String(512), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(64), nullable=False)
+    # queued -> running -> done | failed | cancelled
+    state = Column(String(16), nullable=False, default='queued')
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(Text, nullable=True)  # JSON string
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class SchemaMigration(Base):
+    __tablename__ = 'schema_migrations'
+    # one row per applied step of app/migrations.py
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(128), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,75 @@
+"""Per-quest cache of pre-encoded questions for ``GET /api/quest/{quest_id}``.
+
+The first request for a quest loads its questions once and encodes each one as the
+exact JSON response body; later requests just pick a random entry and return the bytes.
+Quests without questions are cached too (as empty), so repeated 404s don't hit the
+database either.
+
+Admin question create/delete/import and the mass deletes call ``invalidate()``. A
+version counter makes sure an entry built from data read before an invalidation is not
+stored afterwards.
+"""
+import json
+import random
+import threading
+
+from . import models
+
+_lock = threading.Lock()
+_version = 0
+# quest_id -> tuple of encoded response bodies
+_entries = {}
+_hits = 0
+_misses = 0
+
+
+def _encode(question):
+    body = {
+        "id": question.id,
+        "question_text": question.question_text,
+        "options": json.loads(question.options),
+    }
+    # same encoding as FastAPI's JSONResponse
+    return json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def random_question(db, quest_id):
+    """Return the encoded body of a random question of ``quest_id``, or None if it has none."""
+    global _hits, _misses
+    with _lock:
+        entry = _entries.get(quest_id)
+        if entry is not None:
+            _hits += 1
+        else:
+            _misses += 1
+            version = _version
+    if entry is None:
+        rows = db.query(models.Question).filter_by(quest_id=quest_id).order_by(models.Question.id).all()
+        entry = tuple(_encode(q) for q in rows)
+        with _lock:
+            if version == _version:
+                _entries[quest_id] = entry
+    return random.choice(entry) if entry else None
+
+
+def invalidate(quest_id=None):
+    """Drop the cached questions of one quest, or of all quests."""
+    global _version
+    with _lock:
+        _version += 1
+        if quest_id is None:
+            _entries.clear()
+        else:
+            _entries.pop(quest_id, None)
+
+
+def stats():
+    with _lock:
+        total = _hits + _misses
+        return {
+            'quests': len(_entries),
+            'questions': sum(len(e) for e in _entries.values()),
+            'hits': _hits,
+            'misses': _misses,
+            'hit_ratio': round(_hits / total, 4) if total else None,
+        }
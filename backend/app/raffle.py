@@ -0,0 +1,80 @@
+"""Weighted raffle: draw winners without replacement, weighted by leaderboard score.
+
+Each participant with a session enters with weight ``max(1, score)``, where ``score`` is
+the leaderboard score (correct answers plus admin-awarded points, see scores.py), so
+everybody who played has a chance and a higher score means proportionally more tickets.
+
+Sampling uses exponential keys (Efraimidis–Spirakis): every entry draws
+``key = Exp(1) / weight`` and the ``k`` smallest keys win, in key order. This is the same
+distribution as drawing one winner at a time proportionally to weight and removing it,
+but costs O(n log k) with a bounded heap instead of O(n·k). When NumPy is installed the
+keys are drawn in one vectorized call and the winners selected with ``argpartition``.
+
+Every draw is seeded. The seed (random if not given) and the method are returned with the
+winners; entries are ordered by username, so the same seed, method and scores reproduce
+the same draw. The two methods use different generators and give different winners for
+the same seed.
+"""
+import heapq
+import random
+import secrets
+
+from sqlalchemy import select
+
+from . import models
+
+try:
+    import numpy as np
+except ImportError:  # optional: the heap method needs only the standard library
+    np = None
+
+METHODS = ('numpy', 'heap')
+
+
+def default_method():
+    return 'numpy' if np is not None else 'heap'
+
+
+def entries(db):
+    """``[(username, weight)]`` for every participant with a session, ordered by username."""
+    table = models.Score.__table__
+    rows = db.execute(select(table.c.username, table.c.score).order_by(table.c.username))
+    return [(username, max(1, int(score))) for username, score in rows if username]
+
+
+def _draw_heap(weights, k, seed):
+    rng = random.Random(seed)
+    keys = ((rng.expovariate(1.0) / w, i) for i, w in enumerate(weights))
+    return [i for _, i in heapq.nsmallest(k, keys)]
+
+
+def _draw_numpy(weights, k, seed):
+    rng = np.random.default_rng(seed)
+    keys = rng.standard_exponential(len(weights)) / np.asarray(weights, dtype=np.float64)
+    if k < len(keys):
+        chosen = np.argpartition(keys, k - 1)[:k]
+    else:
+        chosen = np.arange(len(keys))
+    return chosen[np.argsort(keys[chosen], kind='stable')].tolist()
+
+
+def draw(entries, k, seed=None, method=None):
+    """Pick ``k`` distinct winners from ``[(name, weight)]``.
+
+    Returns ``{'winners', 'seed', 'method', 'entries'}``. Raises ValueError for an unknown
+    method, or 'numpy' when NumPy isn't installed.
+    """
+    method = method or default_method()
+    if method not in METHODS:
+        raise ValueError(f'Unknown method: {method}')
+    if method == 'numpy' and np is None:
+        raise ValueError('NumPy is not installed')
+    if seed is None:
+        seed = secrets.randbits(32)
+    k = max(0, min(int(k), len(entries)))
+    winners = []
+    if k:
+        weights = [w for _, w in entries]
+        picked = _draw_numpy(weights, k, seed) if method == 'numpy' else _draw_heap(weights, k, seed)
+        winners = [entries[i][0] for i in picked]
+    return {'winners': winners, 'seed': seed, 'method': method, 'entries': len(entries)}
@@ -0,0 +1,206 @@
+"""In-memory rank index over the ``scores`` table for top-N and "my rank" queries.
+
+Leaderboard order is score descending, then username. ``RankIndex`` keeps:
+
+- a Fenwick tree counting users per score, so the number of users with a higher score
+  (and so a user's rank) is found in O(log S),
+- per score, the usernames in sorted order (bisect), to place a user among ties,
+- the sorted list of distinct scores, so top-N walks only non-empty scores.
+
+The module-level index is built from the ``scores`` table on first use and then kept up
+to date incrementally: commits that touch the table (see scores.on_change) queue the
+affected usernames/sessions, and the next read re-reads just those rows. As a safety net
+against changes made outside this process (e.g. scripts/repair_scores.py), the index is
+rebuilt from the table when it is older than ``MAX_AGE`` seconds. The table is read
+without holding the index lock: readers that arrive during a sync use the index as it is.
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy import select
+
+from . import models, scores
+
+MAX_AGE = 60
+
+
+class _Fenwick:
+    def __init__(self, size):
+        self.tree = [0] * (size + 1)
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of counts for indexes 0..i."""
+        i = min(i + 1, len(self.tree) - 1)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class RankIndex:
+    def __init__(self):
+        self._rows = {}
+        self._score = {}
+        self._buckets = {}
+        self._distinct = []
+        self._counts = _Fenwick(64)
+
+    def __len__(self):
+        return len(self._score)
+
+    def _grow(self, score):
+        size = len(self._counts)
+        while size <= score:
+            size *= 2
+        tree = _Fenwick(size)
+        for s, names in self._buckets.items():
+            tree.add(s, len(names))
+        self._counts = tree
+
+    def set(self, username, score, row):
+        """Insert or move ``username`` to ``score``; ``row`` is what queries return for it."""
+        score = max(0, int(score))
+        old = self._score.get(username)
+        if old is not None and old != score:
+            self.remove(username)
+        self._rows[username] = row
+        if old == score:
+            return
+        if score >= len(self._counts):
+            self._grow(score)
+        self._score[username] = score
+        bucket = self._buckets.get(score)
+        if bucket is None:
+            bucket = self._buckets[score] = []
+            bisect.insort(self._distinct, score)
+        bisect.insort(bucket, username)
+        self._counts.add(score, 1)
+
+    def remove(self, username):
+        score = self._score.pop(username, None)
+        self._rows.pop(username, None)
+        if score is None:
+            return
+        bucket = self._buckets[score]
+        del bucket[bisect.bisect_left(bucket, username)]
+        if not bucket:
+            del self._buckets[score]
+            del self._distinct[bisect.bisect_left(self._distinct, score)]
+        self._counts.add(score, -1)
+
+    def rank(self, username):
+        """1-based position of ``username`` in leaderboard order, or None."""
+        score = self._score.get(username)
+        if score is None:
+            return None
+        higher = len(self._score) - self._counts.prefix(score)
+        return higher + bisect.bisect_left(self._buckets[score], username) + 1
+
+    def row(self, username):
+        return self._rows.get(username)
+
+    def top(self, n=None):
+        """Rows of the first ``n`` users (all when n is None) in leaderboard order."""
+        out = []
+        for score in reversed(self._distinct):
+            for username in self._buckets[score]:
+                if n is not None and len(out) >= n:
+                    return out
+                out.append(self._rows[username])
+        return out
+
+
+def _row(score):
+    pct = (score.score / score.answers * 100) if score.answers else 0.0
+    return {'telegram_username': score.username, 'correct_count': score.score, 'completion_pct': round(pct, 1)}
+
+
+# _lock guards the index for reads and for applying changes; DB reads happen outside it,
+# one sync at a time under _sync_lock, and commit hooks only take _pending_lock
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_pending_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+_pending_users = set()
+_pending_sessions = set()
+
+
+def changed(usernames, session_ids):
+    with _pending_lock:
+        _pending_users.update(usernames)
+        _pending_sessions.update(session_ids)
+
+
+scores.on_change(changed)
+
+
+def _take_pending():
+    with _pending_lock:
+        usernames, session_ids = set(_pending_users), set(_pending_sessions)
+        _pending_users.clear()
+        _pending_sessions.clear()
+    return usernames, session_ids
+
+
+def _sync(db):
+    global _index, _built_at
+    if _index is None or time.monotonic() - _built_at > MAX_AGE:
+        # changes committed while the table is read are queued again and applied next time
+        _take_pending()
+        index = RankIndex()
+        # ordered scan, so usernames are appended to their score buckets
+        for score in scores.leaderboard(db):
+            index.set(score.username, score.score, _row(score))
+        with _lock:
+            _index, _built_at = index, time.monotonic()
+        return
+    usernames, session_ids = _take_pending()
+    if session_ids:
+        usernames.update(u for (u,) in db.execute(select(models.UserSession.telegram_username).where(
+            models.UserSession.session_id.in_(list(session_ids)))))
+    if not usernames:
+        return
+    rows = {score.username: _row(score) for score in
+            db.query(models.Score).filter(models.Score.username.in_(list(usernames)))}
+    with _lock:
+        for username in usernames:
+            row = rows.get(username)
+            if row is None:
+                _index.remove(username)
+            else:
+                _index.set(username, row['correct_count'], row)
+
+
+def _refresh(db):
+    # bring the index up to date; while another request does, use it as it is
+    if _sync_lock.acquire(blocking=_index is None):
+        try:
+            _sync(db)
+        finally:
+            _sync_lock.release()
+
+
+def top(db, limit=None):
+    """Leaderboard rows in order, the first ``limit`` only if given."""
+    _refresh(db)
+    with _lock:
+        return _index.top(limit)
+
+
+def position(db, username):
+    """``(rank, total, row)`` of ``username``; rank and row are None if it has no score."""
+    _refresh(db)
+    with _lock:
+        return _index.rank(username), len(_index), _index.row(username)
@@ -0,0 +1,297 @@
+"""Resumable task submission uploads.
+
+For clients on unreliable connections, a task photo can be sent in fixed-size chunks
+instead of one multipart POST:
+
+1. ``POST /api/tasks/uploads`` with ``session_id``, ``question_id``, ``size`` (and
+   optionally ``filename``) creates an upload and returns its ``upload_id``,
+   ``chunk_size`` and ``offset``. The task rules are checked here already.
+2. ``PUT /api/tasks/uploads/{id}/chunks/{n}`` with the raw bytes of chunk ``n``
+   (``size`` bytes from ``n * chunk_size``; only the last chunk may be shorter).
+3. ``GET /api/tasks/uploads/{id}`` returns the received ``offset``; after a dropped
+   connection the client continues with chunk ``offset // chunk_size``.
+4. ``POST /api/tasks/uploads/{id}/finalize`` turns the complete upload into a
+   TaskSubmission, exactly like ``/api/tasks/submit``. The upload is removed in the same
+   transaction, so it survives a failed finalize. Finalize may be retried: the
+   submission records the upload id, and is returned for an upload that is already gone.
+
+Chunks must arrive in order. Re-sending a chunk that was already received is accepted
+and ignored, so a retry after a lost response is harmless; a chunk past the next one is
+refused with 409 and the current offset. Data is written to ``uploads/.partial/<id>.upload``
+from the threadpool and the row in ``task_uploads`` only advances once a chunk is
+complete, so a chunk cut off mid-way is simply sent again.
+
+Uploads without activity for ``upload_ttl`` seconds are expired by a sweeper task, which
+also removes partial files left behind by interrupted streaming uploads (see uploads.py).
+Creating an upload again for the same session and task resumes the pending one when
+size and filename match, and replaces it otherwise.
+"""
+import asyncio
+import os
+import secrets
+import shutil
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from . import models, uploads
+from .db import SessionLocal, CFG
+
+CHUNK_SIZE = max(64 * 1024, CFG['upload_chunk_size'])
+TTL = max(60, CFG['upload_ttl'])
+SWEEP_INTERVAL = max(30, TTL // 4)
+
+
+def _path(upload_id):
+    return os.path.join(uploads.PARTIAL_DIR, f'{upload_id}.upload')
+
+
+def _expired_before():
+    return datetime.utcnow() - timedelta(seconds=TTL)
+
+
+def describe(row):
+    return {
+        'upload_id': row.id,
+        'size': row.size,
+        'chunk_size': row.chunk_size,
+        'offset': row.received,
+        'complete': row.received >= row.size,
+        'expires_at': (row.updated_at + timedelta(seconds=TTL)).isoformat(),
+    }
+
+
+def _discard(dbs, row):
+    try:
+        os.remove(_path(row.id))
+    except FileNotFoundError:
+        pass
+    dbs.delete(row)
+
+
+def get(dbs, upload_id):
+    """The upload row, or 404 (expired uploads are removed on access)."""
+    row = dbs.query(models.TaskUpload).filter_by(id=upload_id).first()
+    if row is not None and row.updated_at < _expired_before():
+        _discard(dbs, row)
+        dbs.commit()
+        row = None
+    if row is None:
+        raise HTTPException(status_code=404, detail='Upload not found')
+    return row
+
+
+def create(session_id, question_id, size, filename=None):
+    """Start (or resume) an upload; the caller has checked the task rules. Blocking."""
+    if size <= 0 or size > uploads.MAX_BYTES:
+        raise HTTPException(status_code=400, detail='File too large' if size > 0 else 'Invalid size')
+    dbs = SessionLocal()
+    try:
+        for row in dbs.query(models.TaskUpload).filter_by(session_id=session_id, question_id=question_id).all():
+            if row.size == size and row.filename == filename and row.updated_at >= _expired_before():
+                row.updated_at = datetime.utcnow()
+                dbs.commit()
+                return describe(row)
+            _discard(dbs, row)
+        row = models.TaskUpload(id=secrets.token_urlsafe(24), session_id=session_id, question_id=question_id,
+                                filename=filename, size=size, chunk_size=CHUNK_SIZE, received=0)
+        os.makedirs(uploads.PARTIAL_DIR, exist_ok=True)
+        open(_path(row.id), 'wb').close()
+        dbs.add(row)
+        dbs.commit()
+        return describe(row)
+    finally:
+        dbs.close()
+
+
+def status(upload_id):
+    dbs = SessionLocal()
+    try:
+        return describe(get(dbs, upload_id))
+    finally:
+        dbs.close()
+
+
+def _begin_chunk(upload_id, index):
+    # returns (start, length) of the chunk to write, or None if it was received already
+    dbs = SessionLocal()
+    try:
+        row = get(dbs, upload_id)
+        start = index * row.chunk_size
+        if index < 0 or start >= row.size:
+            raise HTTPException(status_code=400, detail='Invalid chunk number')
+        if start < row.received:
+            return None
+        if start > row.received:
+            raise HTTPException(status_code=409, detail=f'Expected chunk {row.received // row.chunk_size}',
+                                headers={'Upload-Offset': str(row.received)})
+        return start, min(row.chunk_size, row.size - start)
+    finally:
+        dbs.close()
+
+
+def _open_at(upload_id, start):
+    f = open(_path(upload_id), 'r+b')
+    f.seek(start)
+    return f
+
+
+def _end_chunk(upload_id, start, length, content_type):
+    dbs = SessionLocal()
+    try:
+        fields = {'received': start + length, 'updated_at': datetime.utcnow()}
+        if content_type:
+            fields['content_type'] = content_type
+        # a concurrent retry of the same chunk may have advanced it already
+        dbs.query(models.TaskUpload).filter_by(id=upload_id, received=start).update(fields, synchronize_session=False)
+        dbs.commit()
+        return describe(get(dbs, upload_id))
+    finally:
+        dbs.close()
+
+
+def abort(upload_id):
+    dbs = SessionLocal()
+    try:
+        _discard(dbs, get(dbs, upload_id))
+        dbs.commit()
+    finally:
+        dbs.close()
+
+
+async def write_chunk(request: Request, upload_id, index):
+    """Stream chunk ``index`` from the request body into the upload; returns its status."""
+    span = await run_in_threadpool(_begin_chunk, upload_id, index)
+    if span is None:
+        # a retry of a chunk that was already received
+        return await run_in_threadpool(status, upload_id)
+    start, length = span
+    out = await run_in_threadpool(_open_at, upload_id, start)
+    received = 0
+    head = b''
+    try:
+        async for data in request.stream():
+            if not data:
+                continue
+            received += len(data)
+            if received > length:
+                raise HTTPException(status_code=400, detail=f'Chunk must be {length} bytes',
+                                    headers={'Connection': 'close'})
+            if start == 0 and len(head) < uploads.SNIFF_BYTES:
+                head += data[:uploads.SNIFF_BYTES - len(head)]
+            await run_in_threadpool(out.write, data)
+    finally:
+        await run_in_threadpool(out.close)
+    if received != length:
+        raise HTTPException(status_code=400, detail=f'Chunk must be {length} bytes')
+    content_type = None
+    if start == 0:
+        kind = uploads.sniff(head)
+        if kind is None:
+            await run_in_threadpool(abort, upload_id)
+            raise HTTPException(status_code=400, detail='Invalid file type')
+        content_type = kind[0]
+    return await run_in_threadpool(_end_chunk, upload_id, start, length, content_type)
+
+
+def _link(upload_id):
+    # a second name for the partial file: ingesting moves it away, the upload keeps its own
+    path = os.path.join(uploads.PARTIAL_DIR, f'{upload_id}.{secrets.token_hex(4)}.part')
+    try:
+        os.link(_path(upload_id), path)
+    except OSError:
+        shutil.copyfile(_path(upload_id), path)
+    return path
+
+
+def take(upload_id):
+    """``(row fields, Upload)`` of a complete upload. Blocking.
+
+    The upload itself stays in place until ``finish`` removes its row in the transaction
+    that stores the submission, so a failed finalize can be retried. The caller stores or
+    discards the returned Upload.
+    """
+    dbs = SessionLocal()
+    try:
+        row = get(dbs, upload_id)
+        if row.received < row.size:
+            raise HTTPException(status_code=409, detail='Upload incomplete', headers={'Upload-Offset': str(row.received)})
+        upload = uploads.Upload(_link(row.id), row.filename)
+        upload.size = row.size
+        upload.content_type = row.content_type
+        upload.ext = uploads.EXTENSIONS.get(row.content_type, '')
+        info = {'session_id': row.session_id, 'question_id': row.question_id}
+        return info, upload
+    finally:
+        dbs.close()
+
+
+def finish(dbs, upload_id):
+    """Remove the upload's row in the transaction of ``dbs``; ``cleanup`` after the commit."""
+    dbs.query(models.TaskUpload).filter_by(id=upload_id).delete(synchronize_session=False)
+
+
+def cleanup(upload_id):
+    """Remove the partial file of a finished upload. Blocking."""
+    try:
+        os.remove(_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def sweep():
+    """Expire idle uploads and remove stale partial files. Blocking; returns the counts."""
+    cutoff = _expired_before()
+    dbs = SessionLocal()
+    try:
+        expired = dbs.query(models.TaskUpload).filter(models.TaskUpload.updated_at < cutoff).all()
+        for row in expired:
+            _discard(dbs, row)
+        dbs.commit()
+        active = {f'{upload_id}.upload' for (upload_id,) in dbs.query(models.TaskUpload.id)}
+    finally:
+        dbs.close()
+    stale = 0
+    try:
+        names = os.listdir(uploads.PARTIAL_DIR)
+    except FileNotFoundError:
+        names = []
+    limit = time.time() - TTL
+    for name in names:
+        path = os.path.join(uploads.PARTIAL_DIR, name)
+        try:
+            if name not in active and os.path.getmtime(path) < limit:
+                os.remove(path)
+                stale += 1
+        except OSError:
+            pass
+    return {'expired': len(expired), 'stale_files': stale}
+
+
+class Sweeper:
+    def __init__(self, interval):
+        self.interval = interval
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(sweep)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('Upload sweeper error:', e)
+            await asyncio.sleep(self.interval)
+
+
+sweeper = Sweeper(SWEEP_INTERVAL)
@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from sqlalchemy.orm import Session
-from . import models, schemas
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, StreamingResponse
+from . import models, schemas, auth, hashing, importer, jobs, decks, scans, gamestate, codes, quests, scores, events, ranking, versions, raffle, uploads, resumable, derivatives, storage, serving, listing
+from .auth import check_admin
 from .db import SessionLocal
-import random
 import json
+import shutil
+import tempfile
+import threading
 from datetime import datetime
-from sqlalchemy import func, case, or_
+from typing import Optional
+from sqlalchemy import func
 
 api_router = APIRouter(prefix="/api")
-security = HTTPBasic()
+# uploaded files by store key (see storage.py), outside /api
+files_router = APIRouter()
+security = auth.AdminAuth()
+basic_security = HTTPBasic()
 
 
 def get_db():
@@ -24,41 +33,66 @@ def get_db():
 def create_session(payload: schemas.SessionCreate, db: Session = Depends(get_db)):
     # create or update session
     s = db.query(models.UserSession).filter_by(session_id=payload.session_id).first()
+    previous = None
     if not s:
         s = models.UserSession(telegram_username=payload.telegram_username, session_id=payload.session_id)
         db.add(s)
     else:
+        previous = s.telegram_username
         s.telegram_username = payload.telegram_username
+    db.flush()
+    scores.refresh(db, {previous, payload.telegram_username})
     db.commit()
     return {"ok": True}
 
 
+def _participant_password_hash(username):
+    dbs = SessionLocal()
+    try:
+        p = dbs.query(models.Participant).filter_by(username=username).first()
+        return p.password_hash if p else None
+    finally:
+        dbs.close()
+
+
+def _upsert_session(session_id, username):
+    dbs = SessionLocal()
+    try:
+        s = dbs.query(models.UserSession).filter_by(session_id=session_id).first()
+        previous = None
+        if not s:
+            s = models.UserSession(telegram_username=username, session_id=session_id)
+            dbs.add(s)
+        else:
+            previous = s.telegram_username
+            s.telegram_username = username
+        dbs.flush()
+        scores.refresh(dbs, {previous, username})
+        dbs.commit()
+    finally:
+        dbs.close()
+
+
 @api_router.post('/participant/register')
-def participant_register(payload: dict, db: Session = Depends(get_db)):
+async def participant_register(payload: dict):
     # payload: { username, password, session_id }
+    # async so that waiting on bcrypt (process pool) doesn't hold a threadpool slot;
+    # the short DB lookups still go through the threadpool
     username = payload.get('username')
     password = payload.get('password')
     session_id = payload.get('session_id')
     if not username or not password or not session_id:
         raise HTTPException(status_code=400, detail='Missing fields')
     # check if participant exists
-    p = db.query(models.Participant).filter_by(username=username).first()
-    from passlib.context import CryptContext
-    pwd = CryptContext(schemes=["bcrypt"], deprecated='auto')
+    password_hash = await run_in_threadpool(_participant_password_hash, username)
     # Do NOT allow self-registration. Participant must be created by admin.
-    if not p:
+    if password_hash is None:
         raise HTTPException(status_code=403, detail='Registration disabled; contact an administrator')
     # verify password
-    if not pwd.verify(password, p.password_hash):
+    if not await hashing.verify_password_async(password, password_hash):
         raise HTTPException(status_code=401, detail='Invalid credentials')
     # create/update session
-    s = db.query(models.UserSession).filter_by(session_id=session_id).first()
-    if not s:
-        s = models.UserSession(telegram_username=username, session_id=session_id)
-        db.add(s)
-    else:
-        s.telegram_username = username
-    db.commit()
+    await run_in_threadpool(_upsert_session, session_id, username)
     return {"ok": True}
 
 
@@ -68,16 +102,11 @@ def get_quest(quest_id: int, request: Request, db: Session = Depends(get_db)):
     session_id = request.cookies.get('session_id') or request.query_params.get('session_id')
     if not session_id:
         raise HTTPException(status_code=401, detail='No session')
-    # pick random question for quest
-    q = db.query(models.Question).filter_by(quest_id=quest_id).order_by(models.Question.id).all()
-    if not q:
+    # pick random question for quest (pre-encoded, see quests.py)
+    body = quests.random_question(db, quest_id)
+    if body is None:
         raise HTTPException(status_code=404, detail='No questions')
-    chosen = random.choice(q)
-    return {
-        "id": chosen.id,
-        "question_text": chosen.question_text,
-        "options": json.loads(chosen.options)
-    }
+    return Response(content=body, media_type='application/json')
 
 
 @api_router.post('/answer')
@@ -88,43 +117,52 @@ def submit_answer(payload: schemas.AnswerIn, db: Session = Depends(get_db)):
     is_correct = (payload.answer == q.correct_answer)
     ua = models.UserAnswer(session_id=payload.session_id, question_id=q.id, answer=payload.answer, is_correct=is_correct)
     db.add(ua)
+    scores.record_answer(db, payload.session_id, is_correct)
     db.commit()
+    decks.mark_seen(payload.session_id, q.id)
     return {"is_correct": is_correct}
 
 
 @api_router.get('/leaderboard')
-def leaderboard(db: Session = Depends(get_db)):
-    # aggregate correct counts per username using LEFT JOIN so users with zero answers are included
-    # include admin-awarded correct_count from participants table
-    rows = db.query(
-        models.UserSession.telegram_username,
-        func.count(models.UserAnswer.id).label('total'),
-        func.coalesce(func.sum(case([(models.UserAnswer.is_correct == True, 1)], else_=0)), 0).label('correct_answers'),
-        func.coalesce(func.max(models.Participant.correct_count), 0).label('awarded')
-    ).outerjoin(models.UserAnswer, models.UserSession.session_id == models.UserAnswer.session_id).outerjoin(models.Participant, models.UserSession.telegram_username == models.Participant.username).group_by(models.UserSession.telegram_username).all()
-
-    out = []
-    for username, total, correct_answers, awarded in rows:
-        total_correct = int(correct_answers or 0) + int(awarded or 0)
-        pct = (total_correct / total * 100) if total else 0.0
-        out.append({'telegram_username': username, 'correct_count': total_correct, 'completion_pct': round(pct, 1)})
-    out.sort(key=lambda r: r['correct_count'], reverse=True)
-    return out
-
-
-def check_admin(creds: HTTPBasicCredentials):
-    # very small auth: check against AdminUser
-    dbs = SessionLocal()
-    try:
-        user = dbs.query(models.AdminUser).filter_by(username=creds.username).first()
-        if not user:
-            return False
-        # verify password
-        from passlib.context import CryptContext
-        pwd = CryptContext(schemes=["bcrypt"], deprecated='auto')
-        return pwd.verify(creds.password, user.password_hash)
-    finally:
-        dbs.close()
+def leaderboard(request: Request, response: Response, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    # correct answers plus admin-awarded points per username, from the materialized
+    # scores table (see scores.py), in rank order; ?limit=N returns the top N only
+    if limit is not None and limit < 0:
+        raise HTTPException(status_code=400, detail='Invalid limit')
+    not_modified = versions.conditional(request, response, 'scores')
+    if not_modified:
+        return not_modified
+    return ranking.top(db, limit)
+
+
+@api_router.get('/leaderboard/me')
+def leaderboard_me(session_id: str, db: Session = Depends(get_db)):
+    """Rank (1-based, in leaderboard order) and row of the session's participant."""
+    us = db.query(models.UserSession.telegram_username).filter_by(session_id=session_id).first()
+    if not us:
+        raise HTTPException(status_code=404, detail='Unknown session')
+    rank, total, row = ranking.position(db, us.telegram_username)
+    if row is None:
+        row = {'telegram_username': us.telegram_username, 'correct_count': 0, 'completion_pct': 0.0}
+    return dict(row, rank=rank, total=total)
+
+
+@api_router.get('/stream')
+async def stream():
+    """Server-sent events: a snapshot of game state and leaderboard, then changes (see events.py)."""
+    sub, snapshot = await events.broker.subscribe()
+    if sub is None:
+        raise HTTPException(status_code=503, detail='Too many subscribers', headers={'Retry-After': '5'})
+    return StreamingResponse(events.broker.stream(sub, snapshot), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@api_router.post('/admin/login')
+def admin_login(creds: HTTPBasicCredentials = Depends(basic_security)):
+    """Exchange admin username/password (basic auth) for a signed bearer token."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return {"token": auth.issue_token(creds.username), "token_type": "bearer", "expires_in": auth.TOKEN_TTL}
 
 
 @api_router.post('/admin/start')
@@ -132,16 +170,10 @@ def admin_start(creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
     dbs = SessionLocal()
-    gs = dbs.query(models.GameState).first()
-    if not gs:
-        gs = models.GameState(is_active=True, current_phase='running', updated_at=datetime.utcnow())
-        dbs.add(gs)
-    else:
-        gs.is_active = True
-        gs.current_phase = 'running'
-        gs.updated_at = datetime.utcnow()
-    dbs.commit()
-    dbs.close()
+    try:
+        gamestate.save(dbs, is_active=True, current_phase='running', updated_at=datetime.utcnow())
+    finally:
+        dbs.close()
     return {"ok": True}
 
 
@@ -150,86 +182,92 @@ def admin_end(creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
     dbs = SessionLocal()
-    gs = dbs.query(models.GameState).first()
-    if gs:
-        gs.is_active = False
-        gs.current_phase = 'ended'
-        gs.updated_at = datetime.utcnow()
-        dbs.commit()
-    dbs.close()
+    try:
+        gamestate.save(dbs, is_active=False, current_phase='ended', updated_at=datetime.utcnow())
+    finally:
+        dbs.close()
     return {"ok": True}
 
 
-@api_router.post('/admin/raffle')
+@api_router.post('/admin/raffle', response_model=schemas.RaffleResult)
 def admin_raffle(payload: dict, creds: HTTPBasicCredentials = Depends(security)):
-    # payload: {"winners": int}
+    # payload: {"winners": int, "seed": optional int, "method": optional "numpy" | "heap"}
+    # weighted by leaderboard score (see raffle.py); pass the returned seed and method
+    # back to reproduce a draw
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    num = int(payload.get('winners', 1))
+    try:
+        num = int(payload.get('winners', 1))
+        seed = payload.get('seed')
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail='Invalid winners or seed')
+    if seed is not None and seed < 0:
+        raise HTTPException(status_code=400, detail='Invalid winners or seed')
     dbs = SessionLocal()
-    # compute correct counts per username for all registered sessions (include zeros)
-    from sqlalchemy import func, case
-    rows = dbs.query(
-        models.UserSession.telegram_username,
-        func.coalesce(func.sum(case([(models.UserAnswer.is_correct == True, 1)], else_=0)), 0).label('correct')
-    ).outerjoin(models.UserAnswer, models.UserSession.session_id == models.UserAnswer.session_id).group_by(models.UserSession.telegram_username).all()
-    # convert rows to a list of (username, weight)
-    stats = [(username, int(correct)) for username, correct in rows if username]
-    if not stats:
+    try:
+        entries = raffle.entries(dbs)
+    finally:
         dbs.close()
-        return {"winners": []}
-
-    participants = [[username, max(1, score)] for username, score in stats]
-    winners = []
-    # weighted sampling without replacement using cumulative weights
-    import random as _random
-    for _ in range(min(num, len(participants))):
-        total = sum(w for _, w in participants)
-        if total <= 0:
-            break
-        r = _random.uniform(0, total)
-        cum = 0
-        chosen_index = None
-        for i, (user, w) in enumerate(participants):
-            cum += w
-            if r <= cum:
-                chosen_index = i
-                break
-        if chosen_index is None:
-            chosen_index = len(participants) - 1
-        winners.append(participants[chosen_index][0])
-        # remove chosen participant to avoid duplicates
-        participants.pop(chosen_index)
-
-    dbs.close()
-    return {"winners": winners}
+    try:
+        return raffle.draw(entries, num, seed=seed, method=payload.get('method'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @api_router.get('/admin/game')
 def admin_game_status(creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        gs = dbs.query(models.GameState).first()
-        if not gs:
-            return {"is_active": False, "current_phase": "idle", "updated_at": None}
-        return {"is_active": bool(gs.is_active), "current_phase": gs.current_phase, "updated_at": gs.updated_at}
-    finally:
-        dbs.close()
+    gs = gamestate.current()
+    return {"is_active": gs.is_active, "current_phase": gs.current_phase, "updated_at": gs.updated_at, "version": gs.version}
+
+
+@api_router.get('/admin/metrics/hashing')
+def admin_hashing_metrics(creds: HTTPBasicCredentials = Depends(security)):
+    """Password hashing pool stats: backlog, rejections and queue wait times."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return hashing.stats()
+
+
+@api_router.get('/admin/metrics/stream')
+def admin_stream_metrics(creds: HTTPBasicCredentials = Depends(security)):
+    """Subscriber count and resyncs of /api/stream."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return events.broker.stats()
+
+
+@api_router.get('/admin/metrics/quest_cache')
+def admin_quest_cache_metrics(creds: HTTPBasicCredentials = Depends(security)):
+    """Hit/miss counters of the /api/quest question cache."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return quests.stats()
+
+
+@api_router.get('/admin/metrics/derivatives')
+def admin_derivative_metrics(creds: HTTPBasicCredentials = Depends(security)):
+    """Thumbnail/WebP pipeline stats: pending, completed and failed uploads."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return derivatives.stats()
+
+
+@api_router.get('/admin/metrics/storage')
+def admin_storage_metrics(creds: HTTPBasicCredentials = Depends(security)):
+    """Upload collector stats: files deleted, failures, pending tombstones and the last reconciliation."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return storage.collector.stats()
 
 
 @api_router.get('/admin/settings/language')
 def admin_get_language(creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        gs = dbs.query(models.GameState).first()
-        lang = getattr(gs, 'default_language', 'en') if gs else 'en'
-        return {"default_language": lang}
-    finally:
-        dbs.close()
+    return {"default_language": gamestate.current().default_language}
 
 
 @api_router.post('/admin/settings/language')
@@ -242,12 +280,6 @@ def admin_set_language(payload: dict, creds: HTTPBasicCredentials = Depends(secu
         raise HTTPException(status_code=400, detail='Missing language')
     dbs = SessionLocal()
     try:
-        gs = dbs.query(models.GameState).first()
-        if not gs:
-            gs = models.GameState(is_active=False, current_phase='idle', default_language=lang)
-            dbs.add(gs)
-        else:
-            gs.default_language = lang
         # apply to all participants as default
         try:
             dbs.execute("UPDATE participants SET language = :lang", {'lang': lang})
@@ -256,37 +288,31 @@ def admin_set_language(payload: dict, creds: HTTPBasicCredentials = Depends(secu
             parts = dbs.query(models.Participant).all()
             for p in parts:
                 p.language = lang
-        dbs.commit()
+        # commits the participant update together with the new default
+        gamestate.save(dbs, default_language=lang)
         return {"default_language": lang}
     finally:
         dbs.close()
 
 
 @api_router.get('/settings/language')
-def get_default_language():
+def get_default_language(request: Request, response: Response):
     # public endpoint for clients to fetch current default language
-    dbs = SessionLocal()
-    try:
-        gs = dbs.query(models.GameState).first()
-        lang = getattr(gs, 'default_language', 'en') if gs else 'en'
-        return {"default_language": lang}
-    finally:
-        dbs.close()
+    not_modified = versions.conditional(request, response, 'game_state')
+    if not_modified:
+        return not_modified
+    return {"default_language": gamestate.current().default_language}
 
 
 @api_router.get('/admin/settings/timeouts')
 def admin_get_timeouts(creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        gs = dbs.query(models.GameState).first()
-        return {
-            'question_timeout_seconds': getattr(gs, 'question_timeout_seconds', 10) if gs else 10,
-            'task_timeout_seconds': getattr(gs, 'task_timeout_seconds', 300) if gs else 300
-        }
-    finally:
-        dbs.close()
+    gs = gamestate.current()
+    return {
+        'question_timeout_seconds': gs.question_timeout_seconds,
+        'task_timeout_seconds': gs.task_timeout_seconds
+    }
 
 
 @api_router.post('/admin/settings/timeouts')
@@ -304,14 +330,7 @@ def admin_set_timeouts(payload: dict, creds: HTTPBasicCredentials = Depends(secu
         raise HTTPException(status_code=400, detail='Invalid timeout values')
     dbs = SessionLocal()
     try:
-        gs = dbs.query(models.GameState).first()
-        if not gs:
-            gs = models.GameState(is_active=False, current_phase='idle', question_timeout_seconds=qv, task_timeout_seconds=tv)
-            dbs.add(gs)
-        else:
-            gs.question_timeout_seconds = qv
-            gs.task_timeout_seconds = tv
-        dbs.commit()
+        gamestate.save(dbs, question_timeout_seconds=qv, task_timeout_seconds=tv)
         return {'question_timeout_seconds': qv, 'task_timeout_seconds': tv}
     finally:
         dbs.close()
@@ -330,15 +349,15 @@ def admin_change_password(payload: dict, creds: HTTPBasicCredentials = Depends(s
     if not username or not new_password:
         raise HTTPException(status_code=400, detail='Missing fields')
     # hash new password and update admin user
-    from passlib.context import CryptContext
-    pwd = CryptContext(schemes=["bcrypt"], deprecated='auto')
     dbs = SessionLocal()
     try:
         user = dbs.query(models.AdminUser).filter_by(username=username).first()
         if not user:
             raise HTTPException(status_code=404, detail='Admin user not found')
-        user.password_hash = pwd.hash(new_password)
+        user.password_hash = hashing.hash_password(new_password)
         dbs.commit()
+        # old credentials and tokens must stop working right away
+        auth.invalidate()
         return {"ok": True}
     finally:
         dbs.close()
@@ -346,85 +365,74 @@ def admin_change_password(payload: dict, creds: HTTPBasicCredentials = Depends(s
 
 @api_router.post('/scan', response_model=schemas.ScanResult)
 def scan_code(payload: schemas.ScanRequest, db: Session = Depends(get_db)):
+    # support special method payloads (e.g. 'random') or numeric codes
+    code_raw = str(payload.code or '')
+    # reject payloads that can't be a code word, QR code or 'random' without touching the database
+    if not codes.is_known(code_raw):
+        try:
+            int(code_raw)
+        except Exception:
+            return schemas.ScanResult(question=None, time_limit_seconds=0, message='Invalid code format')
+        return schemas.ScanResult(question=None, time_limit_seconds=0, message='Invalid or inactive code')
+    # game settings come from the in-process snapshot (no query)
+    gs = gamestate.current()
+    # validate session, code word / QR code and prior scans, and record the scan
+    # if everything checks out -- all in one round trip (see scans.py)
+    check = scans.check_and_record(db, payload.session_id, code_raw, gs.is_active)
     # verify session exists
-    s = db.query(models.UserSession).filter_by(session_id=payload.session_id).first()
-    if not s:
+    if not check.has_session:
         raise HTTPException(status_code=401, detail='Unknown session')
 
     # ensure the game is currently active (started and not ended)
-    gs = db.query(models.GameState).first()
-    if not gs or not getattr(gs, 'is_active', False):
+    if not gs.is_active:
         # game hasn't been started or has been ended
         return schemas.ScanResult(question=None, time_limit_seconds=0, message='Game not active')
 
-    # support special method payloads (e.g. 'random') or numeric codes
-    code_raw = str(payload.code or '')
-    # check if payload matches any admin-managed code word
-    cw = db.query(models.CodeWord).filter(func.lower(models.CodeWord.word) == code_raw.lower()).first()
-    if cw is not None or code_raw.lower() == 'random':
+    if check.cw_id is not None or code_raw.lower() == 'random':
         # treat admin-managed words and literal 'random' as a trigger to pick from all questions
-        qr = None
-        is_word_trigger = True
+        quest_key = None
         # if this is an admin-managed word, ensure it hasn't been used already
-        if cw is not None and getattr(cw, 'used', False):
+        if check.cw_id is not None and check.cw_used:
             return schemas.ScanResult(question=None, time_limit_seconds=0, message='Word already used')
     else:
-        is_word_trigger = False
         # try numeric code
         try:
-            code_int = int(code_raw)
+            int(code_raw)
         except Exception:
             return schemas.ScanResult(question=None, time_limit_seconds=0, message='Invalid code format')
-        qr = db.query(models.QRCode).filter_by(code=code_int).first()
-        if not qr:
+        if check.qr_quest_id is None:
             return schemas.ScanResult(question=None, time_limit_seconds=0, message='Invalid or inactive code')
+        quest_key = check.qr_quest_id
 
-    # ensure user hasn't already scanned this code
-    prior = db.query(models.UserScan).filter_by(session_id=payload.session_id, code=payload.code).first()
-    if prior:
+    # ensure user hasn't already scanned this code (the guarded insert didn't record it)
+    if not check.recorded:
         return schemas.ScanResult(question=None, time_limit_seconds=0, message='Code already scanned')
 
-    # record the scan
-    us = models.UserScan(session_id=payload.session_id, code=payload.code)
-    db.add(us)
-    db.commit()
-
-    # find questions that the user hasn't answered yet and haven't been served to them
-    answered_qs = db.query(models.UserAnswer.question_id).filter_by(session_id=payload.session_id).subquery()
-    served_qs = db.query(models.UserServedQuestion.question_id).filter_by(session_id=payload.session_id).subquery()
-    # Make tasks available to different participants even if their global 'used' flag is True.
-    # We still exclude questions already answered by this session or previously served to this session.
-    if is_word_trigger or code_raw.lower() == 'random':
-        # search across all quests: include questions that are tasks OR not marked used
-        avail = db.query(models.Question).filter(~models.Question.id.in_(answered_qs), ~models.Question.id.in_(served_qs), or_(models.Question.is_task == True, models.Question.used == False)).all()
-    else:
-        avail = db.query(models.Question).filter(models.Question.quest_id == qr.quest_id, ~models.Question.id.in_(answered_qs), ~models.Question.id.in_(served_qs), or_(models.Question.is_task == True, models.Question.used == False)).all()
-    if not avail:
+    # pick the next question from this session's shuffled deck: questions the user hasn't answered
+    # or been served yet. Tasks stay available to different participants even if their global
+    # 'used' flag is True; regular questions only while unused.
+    chosen = decks.next_question(db, payload.session_id, quest_key)
+    if chosen is None:
+        # keep the recorded scan
+        db.commit()
         return schemas.ScanResult(question=None, time_limit_seconds=0, message='No available questions for this QR')
 
-    chosen = random.choice(avail)
     # record that this question was served so it won't be repeated for this session
-    usq = models.UserServedQuestion(session_id=payload.session_id, question_id=chosen.id)
-    db.add(usq)
-    # For regular (non-task) questions, mark them as used globally so they are not served again.
-    # For task-type questions (is_task=True) we intentionally do NOT mark them used so the same task
-    # can be given to different participants; served_qs prevents re-serving to the same session.
-    if not getattr(chosen, 'is_task', False):
-        chosen.used = True
-        db.add(chosen)
+    db.add(models.UserServedQuestion(session_id=payload.session_id, question_id=chosen.id))
+    # Regular (non-task) questions were already claimed (marked used globally) by decks.next_question.
+    # Task-type questions (is_task=True) are intentionally NOT marked used so the same task can be given
+    # to different participants; the served record prevents re-serving to the same session.
     # if this scan was triggered by an admin-managed codeword, mark that word used as well
-    if cw is not None:
-        cw.used = True
-        db.add(cw)
+    if check.cw_id is not None:
+        db.query(models.CodeWord).filter_by(id=check.cw_id).update({models.CodeWord.used: True}, synchronize_session=False)
     db.commit()
 
     qout = schemas.QuestionOut(id=chosen.id, question_text=chosen.question_text, options=json.loads(chosen.options) if chosen.options else [], is_task=getattr(chosen, 'is_task', False))
     # determine time limit: prefer per-question setting if available (not currently stored), otherwise use GameState defaults
-    gs = db.query(models.GameState).first()
     if getattr(chosen, 'is_task', False):
-        time_limit = getattr(gs, 'task_timeout_seconds', 300) if gs else 300
+        time_limit = gs.task_timeout_seconds
     else:
-        time_limit = getattr(gs, 'question_timeout_seconds', 10) if gs else 10
+        time_limit = gs.question_timeout_seconds
     return schemas.ScanResult(question=qout, time_limit_seconds=int(time_limit or 0), message='')
 
 
@@ -439,19 +447,34 @@ def admin_create_question(payload: schemas.QuestionCreate, creds: HTTPBasicCrede
     dbs.commit()
     qid = q.id
     dbs.close()
+    decks.add_question(qid, payload.quest_id)
+    quests.invalidate(payload.quest_id)
     return {"id": qid}
 
 
+def _list_questions(dbs, response, is_task, sort, q, match, limit, cursor):
+    Q = models.Question
+    return listing.page(dbs.query(Q).filter(Q.is_task == is_task), response, table='questions', id_column=Q.id,
+                        sorts={'id': Q.id}, sort=sort, search=(Q.question_text, False), q=q, match=match,
+                        limit=limit, cursor=cursor)
+
 
 @api_router.get('/admin/tasks')
-def admin_list_tasks(creds: HTTPBasicCredentials = Depends(security)):
+def admin_list_tasks(request: Request, response: Response, sort: Optional[str] = None, q: Optional[str] = None,
+                     match: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                     creds: HTTPBasicCredentials = Depends(security)):
+    # paging, search and sorting parameters: see listing.py
     if not check_admin(creds):
         raise HTTPException(status_code=401)
+    not_modified = versions.conditional(request, response, 'questions', private=True)
+    if not_modified:
+        return not_modified
     dbs = SessionLocal()
-    rows = dbs.query(models.Question).filter(models.Question.is_task == True).order_by(models.Question.id.desc()).all()
-    out = [{'id': r.id, 'question_text': r.question_text, 'quest_id': r.quest_id, 'is_task': True} for r in rows]
-    dbs.close()
-    return out
+    try:
+        rows = _list_questions(dbs, response, True, sort, q, match, limit, cursor)
+        return [{'id': r.id, 'question_text': r.question_text, 'quest_id': r.quest_id, 'is_task': True} for r in rows]
+    finally:
+        dbs.close()
 
 
 @api_router.get('/admin/tasks/summary')
@@ -461,38 +484,60 @@ def admin_tasks_summary(creds: HTTPBasicCredentials = Depends(security)):
         raise HTTPException(status_code=401)
     dbs = SessionLocal()
     try:
-        rows = dbs.query(
-            models.Question.id,
+        # counted from ix_task_submissions_question_review alone
+        counts = dbs.query(
+            models.TaskSubmission.question_id,
             func.count(models.TaskSubmission.id).label('total'),
-            func.coalesce(func.sum(case([(models.TaskSubmission.rating != None, 1)], else_=0)), 0).label('rated')
-        ).outerjoin(models.TaskSubmission, models.Question.id == models.TaskSubmission.question_id).filter(models.Question.is_task == True).group_by(models.Question.id).all()
-        out = []
-        for qid, total, rated in rows:
-            out.append({'question_id': qid, 'total': int(total or 0), 'rated': int(rated or 0)})
-        return out
+            func.count(models.TaskSubmission.rating).label('rated'),
+        ).group_by(models.TaskSubmission.question_id).subquery()
+        rows = dbs.query(models.Question.id, counts.c.total, counts.c.rated) \
+            .outerjoin(counts, counts.c.question_id == models.Question.id) \
+            .filter(models.Question.is_task == True).all()
+        return [{'question_id': qid, 'total': int(total or 0), 'rated': int(rated or 0)} for qid, total, rated in rows]
     finally:
         dbs.close()
 
 
+SUBMISSIONS_PAGE_MAX = 500
+
+
 @api_router.get('/admin/tasks/submissions/{question_id}')
-def admin_task_submissions(question_id: int, creds: HTTPBasicCredentials = Depends(security)):
+def admin_task_submissions(question_id: int, response: Response, after: Optional[int] = None, limit: Optional[int] = None,
+                           rated: Optional[bool] = None, creds: HTTPBasicCredentials = Depends(security)):
+    """Submissions of a task, newest first, with the participant's username.
+
+    ``?limit=N`` returns one page; if there are more, the ``X-Next-After`` header holds the
+    value to pass as ``?after=`` for the next one (keyset pagination on the submission id).
+    ``?rated=true|false`` returns only rated or unrated submissions. Without ``limit``
+    all submissions are returned.
+    """
     if not check_admin(creds):
         raise HTTPException(status_code=401)
+    if limit is not None and not 0 < limit <= SUBMISSIONS_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f'limit must be 1..{SUBMISSIONS_PAGE_MAX}')
+    TS = models.TaskSubmission
     dbs = SessionLocal()
-    subs = dbs.query(models.TaskSubmission).filter_by(question_id=question_id).order_by(models.TaskSubmission.created_at.desc()).all()
-    out = []
-    for s in subs:
-        username = None
-        try:
-            if s.session_id:
-                us = dbs.query(models.UserSession).filter_by(session_id=s.session_id).first()
-                if us:
-                    username = getattr(us, 'telegram_username', None)
-        except Exception:
-            username = None
-        out.append({'id': s.id, 'session_id': s.session_id, 'username': username, 'question_id': s.question_id, 'filename': s.filename, 'created_at': s.created_at, 'rating': getattr(s, 'rating', None)})
-    dbs.close()
-    return out
+    try:
+        q = dbs.query(TS.id, TS.session_id, TS.question_id, TS.filename, TS.created_at, TS.rating,
+                      models.UserSession.telegram_username) \
+            .outerjoin(models.UserSession, models.UserSession.session_id == TS.session_id) \
+            .filter(TS.question_id == question_id)
+        if after is not None:
+            q = q.filter(TS.id < after)
+        if rated is not None:
+            q = q.filter(TS.rating != None if rated else TS.rating == None)
+        q = q.order_by(TS.id.desc())
+        if limit is not None:
+            q = q.limit(limit + 1)
+        rows = q.all()
+    finally:
+        dbs.close()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers['X-Next-After'] = str(rows[-1].id)
+    return [{'id': r.id, 'session_id': r.session_id, 'username': r.telegram_username, 'question_id': r.question_id,
+             'filename': r.filename, 'created_at': r.created_at, 'rating': r.rating, **derivatives.urls(r.filename)}
+            for r in rows]
 
 
 @api_router.post('/admin/tasks/submit_rating')
@@ -535,48 +580,188 @@ def admin_submit_rating(payload: dict, creds: HTTPBasicCredentials = Depends(sec
         participant.correct_count = (participant.correct_count or 0) + points
         dbs.add(sub)
         dbs.add(participant)
+        scores.award(dbs, username, points)
         dbs.commit()
         return {'ok': True, 'new_correct_count': participant.correct_count}
     finally:
         dbs.close()
 
 
+def _check_task_submission(question_id, session_id):
+    # the question must be a task the participant hasn't submitted yet
+    dbs = SessionLocal()
+    try:
+        q = dbs.query(models.Question).filter_by(id=question_id).first()
+        if not q or not getattr(q, 'is_task', False):
+            raise HTTPException(status_code=404, detail='Task not found')
+        exists = dbs.query(models.TaskSubmission).filter_by(session_id=session_id, question_id=question_id).first()
+        if exists:
+            raise HTTPException(status_code=400, detail='Task already submitted')
+    finally:
+        dbs.close()
+
 
-@api_router.post('/tasks/submit')
-def submit_task(question_id: int = Form(...), session_id: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # session_id must be provided so we know which participant submits
+def _task_fields(fields):
+    try:
+        question_id = int(fields.get('question_id', ''))
+    except ValueError:
+        raise HTTPException(status_code=422, detail='Invalid question_id')
+    session_id = fields.get('session_id')
     if not session_id:
         raise HTTPException(status_code=400, detail='Missing session_id')
-    # ensure question exists and is a task
-    q = db.query(models.Question).filter_by(id=question_id).first()
-    if not q or not getattr(q, 'is_task', False):
-        raise HTTPException(status_code=404, detail='Task not found')
-    # ensure participant hasn't submitted this task before
-    exists = db.query(models.TaskSubmission).filter_by(session_id=session_id, question_id=question_id).first()
-    if exists:
-        raise HTTPException(status_code=400, detail='Task already submitted')
-    # basic server-side validation: only accept image/* and limit size
-    allowed = ['image/jpeg', 'image/png', 'image/webp']
-    if file.content_type not in allowed:
-        raise HTTPException(status_code=400, detail='Invalid file type')
-    # read file into memory up to a limit
-    raw = file.file.read()
-    max_bytes = 8 * 1024 * 1024
-    if len(raw) > max_bytes:
-        raise HTTPException(status_code=400, detail='File too large')
-    # save file to uploads/ folder
-    import os
-    UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    # create a safe filename
-    safe_name = f"{session_id}_{question_id}_{int(datetime.utcnow().timestamp())}_{file.filename}"
-    save_path = os.path.join(UPLOAD_DIR, safe_name)
-    with open(save_path, 'wb') as f:
-        f.write(raw)
-    ts = models.TaskSubmission(session_id=session_id, question_id=question_id, filename=safe_name)
-    db.add(ts)
-    db.commit()
-    return {"ok": True, "filename": safe_name}
+    return question_id, session_id
+
+
+# one submission per (session, task): the check and the insert run under this lock
+_submission_lock = threading.Lock()
+
+
+def _schedule_variants(key, on_ready=None):
+    # the upload is stored already; without variants the original is served, and
+    # derivatives.backfill renders them at the next start
+    try:
+        derivatives.schedule(key, on_ready)
+    except Exception as e:
+        print('Could not schedule image variants:', e)
+
+
+def _store_upload(upload, key, save):
+    """Put ``upload`` into the content store as ``key`` and run ``save(dbs, key)``.
+
+    Blocking. ``key`` is ``storage.upload_key(upload)``, computed before any lock is
+    taken; only storing the file and committing its reference hold ``storage.lock``. If
+    ``save`` fails the reference is released again, and the file is deleted later unless
+    other rows use the same content.
+    """
+    with storage.lock:
+        storage.ingest(upload, key)
+        dbs = SessionLocal()
+        try:
+            storage.ref(dbs, key, upload.size, upload.content_type)
+            dbs.commit()
+        except Exception:
+            dbs.rollback()
+            storage.discard(key)
+            raise
+        finally:
+            dbs.close()
+    dbs = SessionLocal()
+    try:
+        save(dbs, key)
+        dbs.commit()
+    except Exception:
+        dbs.rollback()
+        storage.release(dbs, [key])
+        dbs.commit()
+        raise
+    finally:
+        dbs.close()
+    return key
+
+
+def _submitted_from(upload_id):
+    # filename of the submission made from the resumable upload, if there is one
+    dbs = SessionLocal()
+    try:
+        sub = dbs.query(models.TaskSubmission).filter_by(upload_id=upload_id).first()
+        return sub.filename if sub else None
+    finally:
+        dbs.close()
+
+
+def _save_task_submission(question_id, session_id, upload, upload_id=None):
+    """Store ``upload`` as the submission for the task; returns its filename. Blocking.
+
+    For a resumable upload (``upload_id``) the upload row is removed in the same
+    transaction, and a submission made from that same upload is returned instead of
+    refused.
+    """
+    def save(dbs, key):
+        dbs.add(models.TaskSubmission(session_id=session_id, question_id=question_id, filename=key,
+                                      upload_id=upload_id))
+        if upload_id is not None:
+            resumable.finish(dbs, upload_id)
+
+    key = storage.upload_key(upload)
+    with _submission_lock:
+        if upload_id is not None:
+            # a concurrent finalize of the same upload got here first
+            name = _submitted_from(upload_id)
+            if name is not None:
+                return name
+        _check_task_submission(question_id, session_id)
+        _store_upload(upload, key, save)
+    _schedule_variants(key)
+    return key
+
+
+@api_router.post('/tasks/submit')
+async def submit_task(request: Request):
+    """Multipart form with question_id, session_id and the image file.
+
+    The file is streamed to disk (see uploads.py); when question_id and session_id are sent
+    before it, the task is checked before the file is read.
+    """
+    async def before_file(fields):
+        if fields.get('question_id') and fields.get('session_id'):
+            await run_in_threadpool(_check_task_submission, *_task_fields(fields))
+
+    fields, upload = await uploads.receive(request, before_file=before_file)
+    try:
+        question_id, session_id = _task_fields(fields)
+        if upload is None:
+            raise HTTPException(status_code=400, detail='No file uploaded')
+        name = await run_in_threadpool(_save_task_submission, question_id, session_id, upload)
+    finally:
+        await run_in_threadpool(uploads.discard, upload)
+    return {"ok": True, "filename": name}
+
+
+@api_router.post('/tasks/uploads')
+def create_task_upload(payload: schemas.TaskUploadCreate):
+    # resumable alternative to /tasks/submit for slow or unreliable connections (see resumable.py)
+    if not payload.session_id:
+        raise HTTPException(status_code=400, detail='Missing session_id')
+    _check_task_submission(payload.question_id, payload.session_id)
+    return resumable.create(payload.session_id, payload.question_id, payload.size, payload.filename)
+
+
+@api_router.get('/tasks/uploads/{upload_id}')
+def task_upload_status(upload_id: str, response: Response):
+    out = resumable.status(upload_id)
+    response.headers['Upload-Offset'] = str(out['offset'])
+    return out
+
+
+@api_router.put('/tasks/uploads/{upload_id}/chunks/{index}')
+async def put_task_upload_chunk(upload_id: str, index: int, request: Request, response: Response):
+    out = await resumable.write_chunk(request, upload_id, index)
+    response.headers['Upload-Offset'] = str(out['offset'])
+    return out
+
+
+@api_router.post('/tasks/uploads/{upload_id}/finalize')
+def finalize_task_upload(upload_id: str):
+    # safe to retry: a finalized upload is gone, but its submission records the upload id
+    try:
+        info, upload = resumable.take(upload_id)
+    except HTTPException as e:
+        name = _submitted_from(upload_id) if e.status_code == 404 else None
+        if name is None:
+            raise
+        return {"ok": True, "filename": name}
+    try:
+        name = _save_task_submission(info['question_id'], info['session_id'], upload, upload_id)
+    finally:
+        uploads.discard(upload)
+    resumable.cleanup(upload_id)
+    return {"ok": True, "filename": name}
+
+
+@api_router.delete('/tasks/uploads/{upload_id}')
+def abort_task_upload(upload_id: str):
+    resumable.abort(upload_id)
+    return {"ok": True}
 
 
 @api_router.post('/admin/questions/reset')
@@ -589,6 +774,8 @@ def admin_reset_questions(creds: HTTPBasicCredentials = Depends(security)):
         dbs.commit()
     finally:
         dbs.close()
+    # previously used questions are available again
+    decks.invalidate()
     return {"ok": True}
 
 
@@ -607,6 +794,7 @@ def admin_create_qrcode(payload: schemas.QRCodeCreate, creds: HTTPBasicCredentia
     dbs.commit()
     qid = qr.id
     dbs.close()
+    codes.add_qrcode(payload.code)
     return {"id": qid}
 
 
@@ -615,27 +803,39 @@ def admin_create_codeword(payload: schemas.CodeWordCreate, creds: HTTPBasicCrede
     if not check_admin(creds):
         raise HTTPException(status_code=401)
     dbs = SessionLocal()
-    exists = dbs.query(models.CodeWord).filter(func.lower(models.CodeWord.word) == payload.word.lower()).first()
+    word_hash = models.normalized_hash(payload.word)
+    exists = dbs.query(models.CodeWord.id).filter(models.CodeWord.word_hash == word_hash).first()
     if exists:
         dbs.close()
         raise HTTPException(status_code=400, detail='Word already exists')
-    cw = models.CodeWord(word=payload.word)
+    cw = models.CodeWord(word=payload.word, word_hash=word_hash)
     dbs.add(cw)
     dbs.commit()
     wid = cw.id
     dbs.close()
+    codes.add_word(word_hash)
     return {"id": wid}
 
 
 @api_router.get('/admin/codewords')
-def admin_list_codewords(creds: HTTPBasicCredentials = Depends(security)):
+def admin_list_codewords(request: Request, response: Response, sort: Optional[str] = None, q: Optional[str] = None,
+                         match: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                         creds: HTTPBasicCredentials = Depends(security)):
+    # paging, search and sorting parameters: see listing.py
     if not check_admin(creds):
         raise HTTPException(status_code=401)
+    not_modified = versions.conditional(request, response, 'code_words', private=True)
+    if not_modified:
+        return not_modified
+    CW = models.CodeWord
     dbs = SessionLocal()
-    rows = dbs.query(models.CodeWord).order_by(models.CodeWord.id.desc()).all()
-    out = [{'id': r.id, 'word': r.word} for r in rows]
-    dbs.close()
-    return out
+    try:
+        rows = listing.page(dbs.query(CW.id, CW.word, CW.word_key), response, table='code_words', id_column=CW.id,
+                            sorts={'id': CW.id, 'word': CW.word_key}, sort=sort, search=(CW.word_key, True),
+                            q=q, match=match, limit=limit, cursor=cursor)
+        return [{'id': r.id, 'word': r.word} for r in rows]
+    finally:
+        dbs.close()
 
 
 @api_router.delete('/admin/codeword/{word_id}')
@@ -647,27 +847,17 @@ def admin_delete_codeword(word_id: int, creds: HTTPBasicCredentials = Depends(se
     if not cw:
         dbs.close()
         raise HTTPException(status_code=404, detail='Not found')
+    word_hash = cw.word_hash
     dbs.delete(cw)
     dbs.commit()
     dbs.close()
+    codes.remove_word(word_hash)
     return {"ok": True}
 
 
-def _uploads_dir():
-    import os
-    return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
-
-
 def _delete_submission_files(dbs, submissions):
-    import os
-    UPLOAD_DIR = _uploads_dir()
-    for s in submissions:
-        try:
-            path = os.path.join(UPLOAD_DIR, s.filename)
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception:
-            pass
+    # tombstones files no longer referenced; the storage collector deletes them after dbs commits
+    storage.release(dbs, [s.filename for s in submissions])
 
 
 @api_router.delete('/admin/question/{question_id}')
@@ -679,22 +869,110 @@ def admin_delete_question(question_id: int, creds: HTTPBasicCredentials = Depend
         q = dbs.query(models.Question).filter_by(id=question_id).first()
         if not q:
             raise HTTPException(status_code=404, detail='Not found')
-        # delete related task submissions and files
-        subs = dbs.query(models.TaskSubmission).filter_by(question_id=question_id).all()
-        _delete_submission_files(dbs, subs)
-        for s in subs:
-            dbs.delete(s)
-        # delete served questions and answers referencing this question
-        dbs.query(models.UserServedQuestion).filter_by(question_id=question_id).delete()
-        dbs.query(models.UserAnswer).filter_by(question_id=question_id).delete()
+        # delete related task submissions and files, served questions and answers
+        _delete_question_data(dbs, [question_id])
         # finally delete the question
+        quest_id = q.quest_id
         dbs.delete(q)
         dbs.commit()
+        quests.invalidate(quest_id)
         return {"ok": True}
     finally:
         dbs.close()
 
 
+def _delete_session_data(dbs, session_ids):
+    """Delete submissions (and their files), answers, served questions and scans of these sessions."""
+    if not session_ids:
+        return
+    subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.session_id.in_(session_ids)).all()
+    _delete_submission_files(dbs, subs)
+    for s in subs:
+        dbs.delete(s)
+    # delete answers, served questions, scans for these sessions
+    dbs.query(models.UserAnswer).filter(models.UserAnswer.session_id.in_(session_ids)).delete(synchronize_session=False)
+    dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.session_id.in_(session_ids)).delete(synchronize_session=False)
+    dbs.query(models.UserScan).filter(models.UserScan.session_id.in_(session_ids)).delete(synchronize_session=False)
+
+
+def _delete_question_data(dbs, question_ids):
+    """Delete submissions (and their files), served questions and answers referencing these questions."""
+    if not question_ids:
+        return
+    subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.question_id.in_(question_ids)).all()
+    _delete_submission_files(dbs, subs)
+    for s in subs:
+        dbs.delete(s)
+    dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.question_id.in_(question_ids)).delete(synchronize_session=False)
+    scores.forget_answers(dbs, question_ids)
+    dbs.query(models.UserAnswer).filter(models.UserAnswer.question_id.in_(question_ids)).delete(synchronize_session=False)
+
+
+PURGE_BATCH = 200
+
+
+def _purge_participants(ctx=None):
+    """Delete all participants with their sessions and data.
+
+    As a background job (``ctx`` given) every batch is committed so progress and
+    cancellation take effect; called directly it is one transaction.
+    """
+    dbs = SessionLocal()
+    try:
+        ids = [pid for (pid,) in dbs.query(models.Participant.id).order_by(models.Participant.id).all()]
+        deleted = 0
+        for i in range(0, len(ids), PURGE_BATCH):
+            parts = dbs.query(models.Participant).filter(models.Participant.id.in_(ids[i:i + PURGE_BATCH])).all()
+            usernames = [p.username for p in parts]
+            sessions = dbs.query(models.UserSession).filter(models.UserSession.telegram_username.in_(usernames)).all()
+            _delete_session_data(dbs, [s.session_id for s in sessions])
+            for s in sessions:
+                dbs.delete(s)
+            for p in parts:
+                dbs.delete(p)
+            scores.remove(dbs, usernames)
+            deleted += len(parts)
+            if ctx:
+                dbs.commit()
+                ctx.progress(deleted, len(ids))
+        dbs.commit()
+        return {'deleted': deleted}
+    finally:
+        dbs.close()
+        decks.invalidate()
+
+
+def _purge_questions(ctx, is_task):
+    """Delete all tasks (is_task=True) or all regular questions with related data.
+
+    Commits per batch as a background job only, like _purge_participants.
+    """
+    dbs = SessionLocal()
+    try:
+        ids = [qid for (qid,) in dbs.query(models.Question.id).filter(models.Question.is_task == is_task).order_by(models.Question.id).all()]
+        deleted = 0
+        for i in range(0, len(ids), PURGE_BATCH):
+            batch = ids[i:i + PURGE_BATCH]
+            _delete_question_data(dbs, batch)
+            dbs.query(models.Question).filter(models.Question.id.in_(batch)).delete(synchronize_session=False)
+            deleted += len(batch)
+            if ctx:
+                dbs.commit()
+                ctx.progress(deleted, len(ids))
+        dbs.commit()
+        return {'deleted': deleted}
+    finally:
+        dbs.close()
+        decks.invalidate()
+        quests.invalidate()
+
+
+def _start_job(response, kind, fn, *args):
+    job_id = jobs.runner.submit(kind, fn, *args)
+    response.status_code = 202
+    return {'job_id': job_id, 'state': 'queued'}
+
+
 @api_router.delete('/admin/participant/{participant_id}')
 def admin_delete_participant(participant_id: int, creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
@@ -708,109 +986,48 @@ def admin_delete_participant(participant_id: int, creds: HTTPBasicCredentials =
         # find sessions for this username
         sessions = dbs.query(models.UserSession).filter_by(telegram_username=username).all()
         session_ids = [s.session_id for s in sessions]
-        # delete task submissions and files for these sessions
-        if session_ids:
-            subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.session_id.in_(session_ids)).all()
-            _delete_submission_files(dbs, subs)
-            for s in subs:
-                dbs.delete(s)
-            # delete answers, served questions, scans for these sessions
-            dbs.query(models.UserAnswer).filter(models.UserAnswer.session_id.in_(session_ids)).delete(synchronize_session=False)
-            dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.session_id.in_(session_ids)).delete(synchronize_session=False)
-            dbs.query(models.UserScan).filter(models.UserScan.session_id.in_(session_ids)).delete(synchronize_session=False)
-            # delete sessions themselves
-            for s in sessions:
-                dbs.delete(s)
+        _delete_session_data(dbs, session_ids)
+        # delete sessions themselves
+        for s in sessions:
+            dbs.delete(s)
         # finally delete participant
         dbs.delete(p)
+        scores.remove(dbs, [username])
         dbs.commit()
+        decks.forget_sessions(session_ids)
         return {"ok": True}
     finally:
         dbs.close()
 
 
 @api_router.delete('/admin/tasks/all')
-def admin_delete_all_tasks(creds: HTTPBasicCredentials = Depends(security)):
+def admin_delete_all_tasks(response: Response, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        # find all task questions
-        tasks = dbs.query(models.Question).filter(models.Question.is_task == True).all()
-        task_ids = [t.id for t in tasks]
-        # delete submissions files
-        if task_ids:
-            subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.question_id.in_(task_ids)).all()
-            _delete_submission_files(dbs, subs)
-            for s in subs:
-                dbs.delete(s)
-        # delete served questions and answers for these tasks
-        if task_ids:
-            dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.question_id.in_(task_ids)).delete(synchronize_session=False)
-            dbs.query(models.UserAnswer).filter(models.UserAnswer.question_id.in_(task_ids)).delete(synchronize_session=False)
-        # delete the task questions
-        for t in tasks:
-            dbs.delete(t)
-        dbs.commit()
-        return {"ok": True}
-    finally:
-        dbs.close()
+    if background:
+        return _start_job(response, 'delete_tasks', _purge_questions, True)
+    _purge_questions(None, True)
+    return {"ok": True}
 
 
 @api_router.delete('/admin/questions/all')
-def admin_delete_all_questions(creds: HTTPBasicCredentials = Depends(security)):
+def admin_delete_all_questions(response: Response, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        # find all non-task questions
-        qs = dbs.query(models.Question).filter(models.Question.is_task == False).all()
-        q_ids = [q.id for q in qs]
-        if q_ids:
-            subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.question_id.in_(q_ids)).all()
-            _delete_submission_files(dbs, subs)
-            for s in subs:
-                dbs.delete(s)
-            dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.question_id.in_(q_ids)).delete(synchronize_session=False)
-            dbs.query(models.UserAnswer).filter(models.UserAnswer.question_id.in_(q_ids)).delete(synchronize_session=False)
-        for q in qs:
-            dbs.delete(q)
-        dbs.commit()
-        return {"ok": True}
-    finally:
-        dbs.close()
+    if background:
+        return _start_job(response, 'delete_questions', _purge_questions, False)
+    _purge_questions(None, False)
+    return {"ok": True}
 
 
 @api_router.delete('/admin/participants/all')
-def admin_delete_all_participants(creds: HTTPBasicCredentials = Depends(security)):
+def admin_delete_all_participants(response: Response, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    dbs = SessionLocal()
-    try:
-        parts = dbs.query(models.Participant).all()
-        # collect usernames
-        usernames = [p.username for p in parts]
-        session_ids = []
-        if usernames:
-            sessions = dbs.query(models.UserSession).filter(models.UserSession.telegram_username.in_(usernames)).all()
-            session_ids = [s.session_id for s in sessions]
-            # delete submissions files for these sessions
-            if session_ids:
-                subs = dbs.query(models.TaskSubmission).filter(models.TaskSubmission.session_id.in_(session_ids)).all()
-                _delete_submission_files(dbs, subs)
-                for s in subs:
-                    dbs.delete(s)
-                dbs.query(models.UserAnswer).filter(models.UserAnswer.session_id.in_(session_ids)).delete(synchronize_session=False)
-                dbs.query(models.UserServedQuestion).filter(models.UserServedQuestion.session_id.in_(session_ids)).delete(synchronize_session=False)
-                dbs.query(models.UserScan).filter(models.UserScan.session_id.in_(session_ids)).delete(synchronize_session=False)
-            for s in sessions:
-                dbs.delete(s)
-        for p in parts:
-            dbs.delete(p)
-        dbs.commit()
-        return {"ok": True}
-    finally:
-        dbs.close()
+    if background:
+        return _start_job(response, 'delete_participants', _purge_participants)
+    _purge_participants()
+    return {"ok": True}
 
 
 @api_router.delete('/admin/codewords/all')
@@ -824,27 +1041,35 @@ def admin_delete_all_codewords(creds: HTTPBasicCredentials = Depends(security)):
         return {"ok": True}
     finally:
         dbs.close()
+        codes.invalidate()
 
 
 @api_router.get('/admin/questions')
-def admin_list_questions(creds: HTTPBasicCredentials = Depends(security)):
+def admin_list_questions(request: Request, response: Response, sort: Optional[str] = None, q: Optional[str] = None,
+                         match: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                         creds: HTTPBasicCredentials = Depends(security)):
+    # paging, search and sorting parameters: see listing.py
     if not check_admin(creds):
         raise HTTPException(status_code=401)
+    not_modified = versions.conditional(request, response, 'questions', private=True)
+    if not_modified:
+        return not_modified
     dbs = SessionLocal()
-    rows = dbs.query(models.Question).filter(models.Question.is_task == False).order_by(models.Question.id.desc()).all()
-    out = []
-    import json as _json
-    for q in rows:
-        out.append({
-            'id': q.id,
-            'question_text': q.question_text,
-            'options': _json.loads(q.options),
-            'correct_answer': q.correct_answer,
-            'quest_id': q.quest_id,
-            # is_active removed
-        })
-    dbs.close()
-    return out
+    try:
+        rows = _list_questions(dbs, response, False, sort, q, match, limit, cursor)
+        out = []
+        for r in rows:
+            out.append({
+                'id': r.id,
+                'question_text': r.question_text,
+                'options': json.loads(r.options),
+                'correct_answer': r.correct_answer,
+                'quest_id': r.quest_id,
+                # is_active removed
+            })
+        return out
+    finally:
+        dbs.close()
 
 
 @api_router.post('/admin/participant')
@@ -860,9 +1085,7 @@ def admin_create_participant(payload: dict, creds: HTTPBasicCredentials = Depend
     if exists:
         dbs.close()
         raise HTTPException(status_code=400, detail='Username already exists')
-    from passlib.context import CryptContext
-    pwd = CryptContext(schemes=["bcrypt"], deprecated='auto')
-    ph = pwd.hash(password)
+    ph = hashing.hash_password(password)
     p = models.Participant(username=username, password_hash=ph)
     dbs.add(p)
     dbs.commit()
@@ -872,183 +1095,118 @@ def admin_create_participant(payload: dict, creds: HTTPBasicCredentials = Depend
 
 
 @api_router.get('/admin/participants')
-def admin_list_participants(creds: HTTPBasicCredentials = Depends(security)):
+def admin_list_participants(request: Request, response: Response, sort: Optional[str] = None, q: Optional[str] = None,
+                            match: Optional[str] = None, limit: Optional[int] = None, cursor: Optional[str] = None,
+                            creds: HTTPBasicCredentials = Depends(security)):
+    # paging, search and sorting parameters: see listing.py
     if not check_admin(creds):
         raise HTTPException(status_code=401)
+    not_modified = versions.conditional(request, response, 'participants', private=True)
+    if not_modified:
+        return not_modified
+    P = models.Participant
     dbs = SessionLocal()
-    rows = dbs.query(models.Participant).order_by(models.Participant.id.desc()).all()
-    out = [{'id': r.id, 'username': r.username, 'created_at': r.created_at.isoformat()} for r in rows]
-    dbs.close()
-    return out
+    try:
+        rows = listing.page(dbs.query(P.id, P.username, P.username_key, P.created_at), response, table='participants',
+                            id_column=P.id, sorts={'id': P.id, 'username': P.username_key}, sort=sort,
+                            search=(P.username_key, True), q=q, match=match, limit=limit, cursor=cursor)
+        return [{'id': r.id, 'username': r.username, 'created_at': r.created_at.isoformat()} for r in rows]
+    finally:
+        dbs.close()
 
 
 @api_router.post('/admin/participants/import')
-def admin_import_participants(file: UploadFile = File(...), creds: HTTPBasicCredentials = Depends(security)):
+def admin_import_participants(response: Response, file: UploadFile = File(...), background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
     """Import participants from a text file. Each line: <username> <password>
-    Lines starting with # or empty lines are ignored. Returns a summary.
+    Lines starting with # or empty lines are ignored. Returns a summary with per-stage timings,
+    or a job id (202) when `background=true`.
     """
     if not check_admin(creds):
         raise HTTPException(status_code=401)
     if not file.filename:
         raise HTTPException(status_code=400, detail='No file uploaded')
-
-    content = None
+    if background:
+        return _start_job(response, 'import_participants', _import_participants_job, _spool_upload(file))
     try:
-        raw = file.file.read()
-        try:
-            content = raw.decode('utf-8')
-        except Exception:
-            # fallback to latin-1 to avoid decode errors for weird encodings
-            content = raw.decode('latin-1')
+        return importer.import_participants(file.file)
     finally:
         try:
             file.file.close()
         except Exception:
             pass
 
-    lines = content.splitlines()
-    created = 0
-    skipped = 0
-    errors = []
-    dbs = SessionLocal()
-    from passlib.context import CryptContext
-    pwd = CryptContext(schemes=["bcrypt"], deprecated='auto')
-    for idx, raw_line in enumerate(lines, start=1):
-        line = raw_line.strip()
-        if not line or line.startswith('#'):
-            skipped += 1
-            continue
-        # split on first whitespace to allow passwords that contain spaces
-        parts = line.split(None, 1)
-        if len(parts) < 2:
-            errors.append({'line': idx, 'reason': 'Invalid format'})
-            continue
-        username = parts[0].strip()
-        password = parts[1].strip()
-        if not username or not password:
-            errors.append({'line': idx, 'reason': 'Missing username or password'})
-            continue
-        exists = dbs.query(models.Participant).filter_by(username=username).first()
-        if exists:
-            skipped += 1
-            continue
-        try:
-            ph = pwd.hash(password)
-            p = models.Participant(username=username, password_hash=ph)
-            dbs.add(p)
-            dbs.commit()
-            created += 1
-        except Exception as e:
-            dbs.rollback()
-            errors.append({'line': idx, 'reason': str(e)})
-
-    dbs.close()
-    return {'created': created, 'skipped': skipped, 'errors': errors}
 
+def _spool_upload(file):
+    # the upload is closed when the request ends, so background jobs get their own copy
+    tmp = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(file.file, tmp)
+    finally:
+        file.file.close()
+    tmp.seek(0)
+    return tmp
 
-@api_router.post('/admin/codewords/import')
-def admin_import_codewords(file: UploadFile = File(...), creds: HTTPBasicCredentials = Depends(security)):
-    """Import code words from a text file. Each line contains one word. Lines starting with # or empty lines are ignored."""
-    if not check_admin(creds):
-        raise HTTPException(status_code=401)
-    if not file.filename:
-        raise HTTPException(status_code=400, detail='No file uploaded')
 
+def _import_participants_job(ctx, fileobj):
     try:
-        raw = file.file.read()
-        try:
-            content = raw.decode('utf-8')
-        except Exception:
-            content = raw.decode('latin-1')
+        return importer.import_participants(fileobj, progress=ctx.progress)
     finally:
-        try:
-            file.file.close()
-        except Exception:
-            pass
+        fileobj.close()
 
-    lines = content.splitlines()
-    created = 0
-    skipped = 0
-    errors = []
-    dbs = SessionLocal()
-    for idx, raw_line in enumerate(lines, start=1):
-        line = raw_line.strip()
-        if not line or line.startswith('#'):
-            skipped += 1
-            continue
-        word = line.strip()
-        if not word:
-            skipped += 1
-            continue
-        exists = dbs.query(models.CodeWord).filter(func.lower(models.CodeWord.word) == word.lower()).first()
-        if exists:
-            skipped += 1
-            continue
-        try:
-            cw = models.CodeWord(word=word)
-            dbs.add(cw)
-            dbs.commit()
-            created += 1
-        except Exception as e:
-            dbs.rollback()
-            errors.append({'line': idx, 'reason': str(e)})
 
-    dbs.close()
-    return {'created': created, 'skipped': skipped, 'errors': errors}
+def _import_records_job(ctx, kind, fileobj, filename, fmt, dry_run):
+    try:
+        return importer.import_records(kind, fileobj, filename, fmt=fmt, dry_run=dry_run, progress=ctx.progress)
+    finally:
+        fileobj.close()
+        if kind in ('tasks', 'surveys'):
+            decks.invalidate()
+            quests.invalidate()
+        elif kind == 'codewords':
+            codes.invalidate()
 
 
-@api_router.post('/admin/tasks/import')
-def admin_import_tasks(file: UploadFile = File(...), creds: HTTPBasicCredentials = Depends(security)):
-    """Import tasks from a text file. Each non-empty, non-# line becomes a task (question with is_task=True).
-    Returns a summary similar to participants import."""
-    if not check_admin(creds):
-        raise HTTPException(status_code=401)
+def _import_upload(kind, file, fmt, dry_run, background, response):
     if not file.filename:
         raise HTTPException(status_code=400, detail='No file uploaded')
-
-    content = None
     try:
-        raw = file.file.read()
-        try:
-            content = raw.decode('utf-8')
-        except Exception:
-            # fallback to latin-1 to avoid decode errors for weird encodings
-            content = raw.decode('latin-1')
+        importer.detect_format(file.filename, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if background:
+        return _start_job(response, f'import_{kind}', _import_records_job, kind, _spool_upload(file), file.filename, fmt, dry_run)
+    try:
+        return importer.import_records(kind, file.file, file.filename, fmt=fmt, dry_run=dry_run)
     finally:
         try:
             file.file.close()
         except Exception:
             pass
+        if kind in ('tasks', 'surveys'):
+            decks.invalidate()
+            quests.invalidate()
+        elif kind == 'codewords':
+            codes.invalidate()
 
-    lines = content.splitlines()
-    created = 0
-    skipped = 0
-    errors = []
-    dbs = SessionLocal()
-    import json as _json
-    for idx, raw_line in enumerate(lines, start=1):
-        line = raw_line.strip()
-        if not line or line.startswith('#'):
-            skipped += 1
-            continue
-        # each valid line is treated as a task instruction / question_text
-        question_text = line
-        # avoid duplicates by exact match
-        exists = dbs.query(models.Question).filter(models.Question.question_text == question_text, models.Question.is_task == True).first()
-        if exists:
-            skipped += 1
-            continue
-        try:
-            q = models.Question(question_text=question_text, correct_answer='', options=_json.dumps([]), quest_id=1, is_task=True)
-            dbs.add(q)
-            dbs.commit()
-            created += 1
-        except Exception as e:
-            dbs.rollback()
-            errors.append({'line': idx, 'reason': str(e)})
 
-    dbs.close()
-    return {'created': created, 'skipped': skipped, 'errors': errors}
+@api_router.post('/admin/codewords/import')
+def admin_import_codewords(response: Response, file: UploadFile = File(...), format: Optional[str] = None, dry_run: bool = False, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
+    """Import code words. Text files contain one word per line (lines starting with # or empty lines are ignored);
+    CSV needs a `word` column, JSONL objects a `word` key. Format is taken from the file extension unless `format` is given.
+    With `dry_run=true` nothing is written and the summary reports what would be created.
+    With `background=true` the import runs as a job and its id is returned (202)."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return _import_upload('codewords', file, format, dry_run, background, response)
+
+
+@api_router.post('/admin/tasks/import')
+def admin_import_tasks(response: Response, file: UploadFile = File(...), format: Optional[str] = None, dry_run: bool = False, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
+    """Import tasks. Each non-empty, non-# line of a text file becomes a task (question with is_task=True);
+    CSV/JSONL use `question_text` and optional `quest_id`. Returns a summary similar to participants import."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    return _import_upload('tasks', file, format, dry_run, background, response)
 
 
 @api_router.get('/admin/boxes')
@@ -1057,7 +1215,10 @@ def admin_list_boxes(creds: HTTPBasicCredentials = Depends(security)):
         raise HTTPException(status_code=401)
     dbs = SessionLocal()
     rows = dbs.query(models.Box).order_by(models.Box.box_index.asc()).all()
-    out = [{'box_index': r.box_index, 'hint_filename': r.hint_filename} for r in rows]
+    out = []
+    for r in rows:
+        hint = derivatives.urls(r.hint_filename) if r.hint_filename else {}
+        out.append({'box_index': r.box_index, 'hint_filename': r.hint_filename, 'hint_thumb_url': hint.get('thumb_url')})
     dbs.close()
     return out
 
@@ -1085,6 +1246,7 @@ def admin_set_box_count(payload: dict, creds: HTTPBasicCredentials = Depends(sec
         # delete extra boxes
         for idx in list(existing.keys()):
             if idx > cnt:
+                storage.release(dbs, [existing[idx].hint_filename])
                 dbs.query(models.Box).filter_by(box_index=idx).delete()
         dbs.commit()
         # return current list
@@ -1095,132 +1257,125 @@ def admin_set_box_count(payload: dict, creds: HTTPBasicCredentials = Depends(sec
         dbs.close()
 
 
-@api_router.post('/admin/boxes/{box_index}/hint')
-def admin_upload_box_hint(box_index: int, file: UploadFile = File(...), creds: HTTPBasicCredentials = Depends(security)):
-    # upload image hint for a specific box
-    if not check_admin(creds):
-        raise HTTPException(status_code=401)
-    if not file or not file.filename:
-        raise HTTPException(status_code=400, detail='No file uploaded')
-    # basic validation
-    allowed = ['image/jpeg', 'image/png', 'image/webp']
-    if file.content_type not in allowed:
-        raise HTTPException(status_code=400, detail='Invalid file type')
-    raw = file.file.read()
-    max_bytes = 8 * 1024 * 1024
-    if len(raw) > max_bytes:
-        raise HTTPException(status_code=400, detail='File too large')
-    import os
-    UPLOAD_DIR = _uploads_dir()
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    safe_name = f"box_{box_index}_{int(datetime.utcnow().timestamp())}_{file.filename}"
-    save_path = os.path.join(UPLOAD_DIR, safe_name)
-    with open(save_path, 'wb') as f:
-        f.write(raw)
-    dbs = SessionLocal()
-    try:
+def _save_box_hint(box_index, upload):
+    def save(dbs, key):
         b = dbs.query(models.Box).filter_by(box_index=box_index).first()
         if not b:
             # auto-create the box record
-            b = models.Box(box_index=box_index, hint_filename=safe_name)
-            dbs.add(b)
-        else:
-            b.hint_filename = safe_name
-        dbs.commit()
-        return {'ok': True, 'hint_filename': safe_name, 'url': f'/uploads/{safe_name}'}
+            dbs.add(models.Box(box_index=box_index, hint_filename=key))
+            return
+        # the previous hint file is deleted once nothing references it
+        storage.release(dbs, [b.hint_filename])
+        b.hint_filename = key
+
+    key = storage.upload_key(upload)
+    _store_upload(upload, key, save)
+    _schedule_variants(key, derivatives.hint_ready)
+    return key
+
+
+@api_router.post('/admin/boxes/{box_index}/hint')
+async def admin_upload_box_hint(box_index: int, request: Request, creds: HTTPBasicCredentials = Depends(security)):
+    # upload image hint for a specific box, streamed to disk (see uploads.py)
+    if not await run_in_threadpool(check_admin, creds):
+        raise HTTPException(status_code=401)
+    _, upload = await uploads.receive(request)
+    try:
+        if upload is None:
+            raise HTTPException(status_code=400, detail='No file uploaded')
+        name = await run_in_threadpool(_save_box_hint, box_index, upload)
     finally:
-        dbs.close()
+        await run_in_threadpool(uploads.discard, upload)
+    return {'ok': True, 'hint_filename': name, 'url': f'/uploads/{name}'}
 
 
 @api_router.get('/boxes')
-def public_list_boxes():
+def public_list_boxes(request: Request, response: Response):
     """Public endpoint for participants to fetch box list and hint URLs."""
+    not_modified = versions.conditional(request, response, 'boxes')
+    if not_modified:
+        return not_modified
     dbs = SessionLocal()
     try:
         rows = dbs.query(models.Box).order_by(models.Box.box_index.asc()).all()
         out = []
         for r in rows:
-            hint_url = f'/uploads/{r.hint_filename}' if r.hint_filename else None
-            out.append({'box_index': r.box_index, 'hint_url': hint_url, 'hint_filename': r.hint_filename})
+            # hint_url: the resized WebP once generated, the original until then
+            hint = derivatives.urls(r.hint_filename) if r.hint_filename else {}
+            out.append({'box_index': r.box_index, 'hint_url': hint.get('preview_url'), 'hint_thumb_url': hint.get('thumb_url'),
+                        'hint_original_url': hint.get('url'), 'hint_filename': r.hint_filename})
         return out
     finally:
         dbs.close()
 
 
 @api_router.post('/admin/surveys/import')
-def admin_import_surveys(file: UploadFile = File(...), creds: HTTPBasicCredentials = Depends(security)):
+def admin_import_surveys(response: Response, file: UploadFile = File(...), format: Optional[str] = None, dry_run: bool = False, background: bool = False, creds: HTTPBasicCredentials = Depends(security)):
     """Import surveys from a text file. Each survey block consists of:
     Line 1: question
     Lines 2-5: four answer options
     Line 6: number 1..4 indicating the correct option
     Repeats for multiple questions. Lines starting with # or empty lines are ignored.
-    Returns a summary: {created, skipped, errors}
+    CSV files use columns question_text, option1..option4, answer (1..4); JSONL objects use
+    question_text, options (list of 4) and answer (1..4) or correct_answer.
+    Returns a summary: {created, skipped, errors, dry_run, timings_ms}
     """
     if not check_admin(creds):
         raise HTTPException(status_code=401)
-    if not file.filename:
-        raise HTTPException(status_code=400, detail='No file uploaded')
+    return _import_upload('surveys', file, format, dry_run, background, response)
 
-    content = None
+
+@api_router.get('/admin/jobs')
+def admin_list_jobs(creds: HTTPBasicCredentials = Depends(security)):
+    """Most recent background jobs, newest first."""
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    dbs = SessionLocal()
     try:
-        raw = file.file.read()
-        try:
-            content = raw.decode('utf-8')
-        except Exception:
-            content = raw.decode('latin-1')
+        rows = dbs.query(models.Job).order_by(models.Job.id.desc()).limit(50).all()
+        return [jobs.job_to_dict(j) for j in rows]
     finally:
-        try:
-            file.file.close()
-        except Exception:
-            pass
+        dbs.close()
+
 
-    lines = [ln.rstrip('\r') for ln in content.splitlines()]
-    created = 0
-    skipped = 0
-    errors = []
+@api_router.get('/admin/jobs/{job_id}')
+def admin_get_job(job_id: int, creds: HTTPBasicCredentials = Depends(security)):
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
     dbs = SessionLocal()
-    import json as _json
-    i = 0
-    total = len(lines)
-    while i < total:
-        # skip empty or comment lines
-        if not lines[i].strip() or lines[i].strip().startswith('#'):
-            skipped += 1
-            i += 1
-            continue
-        # need at least 6 lines for a block
-        if i + 5 >= total:
-            errors.append({'line': i+1, 'reason': 'Incomplete survey block'})
-            break
-        q_text = lines[i].strip()
-        opts = [lines[i+1].strip(), lines[i+2].strip(), lines[i+3].strip(), lines[i+4].strip()]
-        ans_line = lines[i+5].strip()
-        try:
-            ans_idx = int(ans_line)
-        except Exception:
-            errors.append({'line': i+6, 'reason': 'Invalid answer index'})
-            i += 6
-            continue
-        if ans_idx < 1 or ans_idx > 4:
-            errors.append({'line': i+6, 'reason': 'Answer index out of range (1-4)'})
-            i += 6
-            continue
-        correct_answer = opts[ans_idx-1]
-        # avoid duplicate by exact question text
-        exists = dbs.query(models.Question).filter(models.Question.question_text == q_text, models.Question.is_task == False).first()
-        if exists:
-            skipped += 1
-        else:
-            try:
-                q = models.Question(question_text=q_text, correct_answer=correct_answer, options=_json.dumps(opts), quest_id=1, is_task=False)
-                dbs.add(q)
-                dbs.commit()
-                created += 1
-            except Exception as e:
-                dbs.rollback()
-                errors.append({'line': i+1, 'reason': str(e)})
-        i += 6
+    try:
+        job = dbs.query(models.Job).filter_by(id=job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail='Job not found')
+        return jobs.job_to_dict(job)
+    finally:
+        dbs.close()
 
-    dbs.close()
-    return {'created': created, 'skipped': skipped, 'errors': errors}
 
+@api_router.post('/admin/jobs/{job_id}/cancel')
+def admin_cancel_job(job_id: int, creds: HTTPBasicCredentials = Depends(security)):
+    if not check_admin(creds):
+        raise HTTPException(status_code=401)
+    job = jobs.runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
+
+
+@files_router.api_route('/uploads/{name}', methods=['GET', 'HEAD'])
+def serve_upload(name: str, request: Request):
+    store = storage.backend()
+    try:
+        path = store.local_path(name)
+    except ValueError:
+        raise HTTPException(status_code=404)
+    if path is not None:
+        # immutable caching, validators, ranges and sendfile: see app/serving.py
+        res = serving.file_response(request, name, path)
+        if res is None:
+            raise HTTPException(status_code=404)
+        return res
+    url = store.url(name)
+    if url is None:
+        raise HTTPException(status_code=404)
+    return RedirectResponse(url)
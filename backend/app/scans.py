@@ -0,0 +1,96 @@
+"""Validation and recording of a /api/scan request in one database round trip.
+
+Everything a scan needs to know up front (session exists, the matching code word or QR
+code, whether this session already scanned the code) is read with a single SELECT of
+scalar sub-queries; game settings come from the in-process snapshot (gamestate.py).
+The scan itself is recorded with an INSERT guarded by the unique ``(session_id, code)``
+constraint, so double taps can't record the same scan twice.
+
+On Postgres both steps are one statement (a data-modifying CTE). On SQLite, which has no
+data-modifying CTEs, the SELECT runs first and is followed by the guarded INSERT. Either
+way the INSERT is part of the scan's transaction and is committed together with the
+served question.
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects import sqlite
+
+from . import models
+
+ScanCheck = namedtuple('ScanCheck', [
+    'has_session', 'cw_id', 'cw_used', 'qr_quest_id', 'recorded',
+])
+
+_CHECKS = """
+SELECT
+    EXISTS (SELECT 1 FROM user_sessions WHERE session_id = :sid) AS has_session,
+    cw.id AS cw_id,
+    cw.used AS cw_used,
+    (SELECT quest_id FROM qrcodes WHERE code = :code_int) AS qr_quest_id,
+    EXISTS (SELECT 1 FROM user_scans WHERE session_id = :sid AND code = :code) AS already_scanned
+FROM (SELECT 1 AS one) AS base
+LEFT JOIN (SELECT id, used FROM code_words WHERE word_hash = :word_hash ORDER BY id LIMIT 1) AS cw ON 1 = 1
+"""
+
+# a scan is recorded only when it would be accepted (see routers.scan_code for the messages)
+_VALID = """
+    :is_active AND v.has_session AND NOT v.already_scanned
+    AND CASE WHEN v.cw_id IS NOT NULL THEN NOT v.cw_used
+             WHEN :is_random THEN TRUE
+             ELSE v.qr_quest_id IS NOT NULL END
+"""
+
+_PG_CHECK_AND_RECORD = text(f"""
+WITH v AS ({_CHECKS}),
+ins AS (
+    INSERT INTO user_scans (session_id, code, scanned_at)
+    SELECT :sid, :code, :now FROM v WHERE {_VALID}
+    ON CONFLICT (session_id, code) DO NOTHING
+    RETURNING id
+)
+SELECT v.*, EXISTS (SELECT 1 FROM ins) AS recorded FROM v
+""")
+
+
+def _is_valid(row, is_active, is_random):
+    if not (is_active and row.has_session) or row.already_scanned:
+        return False
+    if row.cw_id is not None:
+        return not row.cw_used
+    return is_random or row.qr_quest_id is not None
+
+
+def check_and_record(db, session_id, code, is_active):
+    """Validate a scan of ``code`` by ``session_id`` and record it if valid (and the game is active)."""
+    try:
+        code_int = int(code)
+    except ValueError:
+        code_int = None
+    params = {
+        'sid': session_id,
+        'code': code,
+        'code_int': code_int,
+        'word_hash': models.normalized_hash(code),
+        'is_random': code.lower() == 'random',
+        'is_active': bool(is_active),
+        'now': datetime.utcnow(),
+    }
+    if db.bind.dialect.name == 'postgresql':
+        row = db.execute(_PG_CHECK_AND_RECORD, params).first()
+        recorded = bool(row.recorded)
+    else:
+        row = db.execute(text(_CHECKS), params).first()
+        recorded = False
+        if _is_valid(row, params['is_active'], params['is_random']):
+            stmt = sqlite.insert(models.UserScan.__table__).on_conflict_do_nothing(index_elements=['session_id', 'code'])
+            res = db.execute(stmt, {'session_id': session_id, 'code': code, 'scanned_at': params['now']})
+            recorded = res.rowcount == 1
+    return ScanCheck(
+        has_session=bool(row.has_session),
+        cw_id=row.cw_id,
+        cw_used=bool(row.cw_used),
+        qr_quest_id=row.qr_quest_id,
+        recorded=recorded,
+    )
@@ -63,6 +63,9 @@ class LeaderboardRow(BaseModel):
 
 class RaffleResult(BaseModel):
     winners: List[str]
+    seed: int
+    method: str
+    entries: int
 
 
 class ParticipantCreate(BaseModel):
@@ -89,3 +92,10 @@ class TaskSubmissionOut(BaseModel):
     question_id: int
     filename: str
     created_at: str
+
+
+class TaskUploadCreate(BaseModel):
+    session_id: str
+    question_id: int
+    size: int
+    filename: Optional[str] = None
@@ -0,0 +1,176 @@
+"""Materialized leaderboard: one ``scores`` row per username that has a session.
+
+The leaderboard used to aggregate ``user_sessions`` ⟕ ``user_answers`` ⟕ ``participants``
+on every poll. The same numbers are now kept in the ``scores`` table and updated in the
+transaction of the event that changes them:
+
+- an answer (``record_answer``) and an admin rating (``award``) increment the row,
+- deleting questions subtracts the deleted answers (``forget_answers``),
+- creating/re-assigning a session recomputes the affected usernames (``refresh``),
+- deleting participants drops their rows (``remove``).
+
+``compute`` is the reference definition from the raw events; ``repair`` compares the table
+with it and fixes differences (``scripts/repair_scores.py``).
+
+Callbacks registered with ``on_change`` run after a session that changed the table
+commits, as ``fn(usernames, session_ids)`` with the rows it touched (by username, or by
+the session of an answer); see events.py and ranking.py.
+"""
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .db import SessionLocal
+from .importer import insert_ignore
+
+table = models.Score.__table__
+_listeners = []
+
+
+def on_change(fn):
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def _touched(db, usernames=(), session_ids=()):
+    if isinstance(db, Session):
+        changes = db.info.setdefault('scores_changed', (set(), set()))
+        changes[0].update(usernames)
+        changes[1].update(session_ids)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _after_commit(session):
+    changes = session.info.pop('scores_changed', None)
+    if changes:
+        for fn in _listeners:
+            fn(*changes)
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('scores_changed', None)
+
+
+def compute(bind, usernames=None):
+    """Scores from the raw events: {username: (answers, correct_answers, awarded)}."""
+    sessions = models.UserSession.__table__
+    answers = models.UserAnswer.__table__
+    participants = models.Participant.__table__
+    q = select(
+        sessions.c.telegram_username,
+        func.count(answers.c.id),
+        func.coalesce(func.sum(case([(answers.c.is_correct == True, 1)], else_=0)), 0),
+        func.coalesce(func.max(participants.c.correct_count), 0),
+    ).select_from(
+        sessions.outerjoin(answers, sessions.c.session_id == answers.c.session_id)
+        .outerjoin(participants, sessions.c.telegram_username == participants.c.username)
+    ).group_by(sessions.c.telegram_username)
+    if usernames is not None:
+        q = q.where(sessions.c.telegram_username.in_(list(usernames)))
+    return {u: (int(n), int(c), int(a)) for u, n, c, a in bind.execute(q) if u}
+
+
+def _row(username, answers, correct, awarded):
+    return {'username': username, 'answers': answers, 'correct_answers': correct,
+            'awarded': awarded, 'score': correct + awarded}
+
+
+def refresh(db, usernames):
+    """Recompute the rows of ``usernames`` from the raw events (dropping ones without sessions)."""
+    usernames = {u for u in usernames if u}
+    if not usernames:
+        return
+    _touched(db, usernames)
+    computed = compute(db, usernames)
+    for username, values in computed.items():
+        res = db.execute(table.update().where(table.c.username == username).values(**_row(username, *values)))
+        if res.rowcount == 0:
+            insert_ignore(db.connection(), table, [_row(username, *values)], 'username')
+    gone = usernames - set(computed)
+    if gone:
+        remove(db, gone)
+
+
+def record_answer(db, session_id, is_correct):
+    """Count an answer of ``session_id`` (ignored for unknown sessions, like the leaderboard)."""
+    point = 1 if is_correct else 0
+    _touched(db, session_ids=[session_id])
+    username = select(models.UserSession.telegram_username).where(
+        models.UserSession.session_id == session_id).scalar_subquery()
+    db.execute(table.update().where(table.c.username == username).values(
+        answers=table.c.answers + 1,
+        correct_answers=table.c.correct_answers + point,
+        score=table.c.score + point,
+    ))
+
+
+def award(db, username, points):
+    """Add admin-awarded points to ``username``."""
+    _touched(db, [username])
+    db.execute(table.update().where(table.c.username == username).values(
+        awarded=table.c.awarded + points,
+        score=table.c.score + points,
+    ))
+
+
+def forget_answers(db, question_ids):
+    """Subtract the answers to ``question_ids``; call before deleting them."""
+    if not question_ids:
+        return
+    answers = models.UserAnswer.__table__
+    sessions = models.UserSession.__table__
+    q = select(
+        sessions.c.telegram_username,
+        func.count(answers.c.id),
+        func.coalesce(func.sum(case([(answers.c.is_correct == True, 1)], else_=0)), 0),
+    ).select_from(answers.join(sessions, sessions.c.session_id == answers.c.session_id)).where(
+        answers.c.question_id.in_(list(question_ids))
+    ).group_by(sessions.c.telegram_username)
+    for username, n, correct in db.execute(q).fetchall():
+        _touched(db, [username])
+        db.execute(table.update().where(table.c.username == username).values(
+            answers=table.c.answers - int(n),
+            correct_answers=table.c.correct_answers - int(correct),
+            score=table.c.score - int(correct),
+        ))
+
+
+def remove(db, usernames):
+    usernames = list(usernames)
+    if usernames:
+        _touched(db, usernames)
+        db.execute(table.delete().where(table.c.username.in_(usernames)))
+
+
+def leaderboard(db):
+    """Rows ordered by score (served by ix_scores_rank)."""
+    return db.query(models.Score).order_by(models.Score.score.desc(), models.Score.username).all()
+
+
+def repair(bind, apply=True):
+    """Compare the table with the raw events and (if ``apply``) fix differences.
+
+    Returns ``{'checked', 'mismatched', 'missing', 'extra', 'applied'}``; the three lists hold
+    the affected usernames.
+    """
+    expected = {u: _row(u, *v) for u, v in compute(bind).items()}
+    stored = {r.username: dict(r._mapping) for r in bind.execute(
+        select(table.c.username, table.c.answers, table.c.correct_answers, table.c.awarded, table.c.score))}
+    missing = sorted(set(expected) - set(stored))
+    extra = sorted(set(stored) - set(expected))
+    mismatched = sorted(u for u in set(expected) & set(stored) if expected[u] != stored[u])
+    if apply:
+        for username in mismatched:
+            bind.execute(table.update().where(table.c.username == username).values(**expected[username]))
+        if missing:
+            bind.execute(table.insert(), [expected[u] for u in missing])
+        if extra:
+            bind.execute(table.delete().where(table.c.username.in_(extra)))
+    return {
+        'checked': len(expected),
+        'mismatched': mismatched,
+        'missing': missing,
+        'extra': extra,
+        'applied': bool(apply),
+    }
@@ -0,0 +1,153 @@
+"""HTTP responses for stored uploads (``GET``/``HEAD /uploads/<key>``).
+
+Store keys are content hashes (see storage.py), so the bytes behind a key never change
+and the URL itself is the version. Responses for hash keys are therefore cacheable for
+a year (``Cache-Control: public, max-age=31536000, immutable``) with the key as a
+strong ``ETag``; browsers and the proxy keep them and repeat views are not fetched
+again. Legacy names (from before the store) are revalidated on every use instead.
+
+Conditional requests (``If-None-Match``, ``If-Modified-Since``) get 304, and single
+byte ranges (``Range: bytes=…``, honouring ``If-Range``) get 206 with the slice only;
+multi-range requests get the whole file. The body is sent with the ASGI zero-copy
+extension (``http.response.zerocopysend``, i.e. sendfile) when the server offers it,
+and read in chunks from the threadpool otherwise.
+"""
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from . import storage
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, no-cache'
+CHUNK = 256 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp', '.gif': 'image/gif'}
+
+
+def _media_type(key):
+    return _TYPES.get(os.path.splitext(key)[1].lower(), 'application/octet-stream')
+
+
+def _etag(key, st):
+    if storage.is_key(key):
+        return f'"{key}"'
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    match = request.headers.get('if-none-match')
+    if match is not None:
+        return match.strip() == '*' or etag in [t.strip().removeprefix('W/') for t in match.split(',')]
+    since = request.headers.get('if-modified-since')
+    if since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range(request, etag, size):
+    """``(start, end)`` (inclusive) of a satisfiable single range, None for the whole
+    file, or ``False`` if the range can't be satisfied."""
+    header = request.headers.get('range')
+    if not header:
+        return None
+    if_range = request.headers.get('if-range')
+    if if_range is not None and if_range.strip() != etag:
+        return None
+    m = _RANGE_RE.match(header.strip().replace(' ', ''))
+    if not m or (not m.group(1) and not m.group(2)):
+        # malformed or multiple ranges: send everything
+        return None
+    if not m.group(1):
+        suffix = int(m.group(2))
+        if suffix == 0:
+            return False
+        return max(0, size - suffix), size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+class FileSliceResponse(Response):
+    """``count`` bytes of ``path`` from ``offset``, sent with sendfile if the server supports it."""
+
+    def __init__(self, path, offset, count, status_code, headers, media_type, send_body=True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.offset = offset
+        self.count = count
+        self.send_body = send_body
+        self.headers['content-length'] = str(count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.send_body or self.count == 0:
+            await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        try:
+            f = await run_in_threadpool(open, self.path, 'rb')
+        except FileNotFoundError:
+            # deleted by the storage collector since file_response looked at it
+            await Response(status_code=404)(scope, receive, send)
+            return
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        try:
+            if 'http.response.zerocopysend' in scope.get('extensions', {}):
+                await send({'type': 'http.response.zerocopysend', 'file': f.fileno(),
+                            'offset': self.offset, 'count': self.count})
+                return
+            await run_in_threadpool(f.seek, self.offset)
+            remaining = self.count
+            while remaining > 0:
+                data = await run_in_threadpool(f.read, min(CHUNK, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                await send({'type': 'http.response.body', 'body': data, 'more_body': remaining > 0})
+            if remaining > 0:
+                # the file shrank underneath us; end the response
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await run_in_threadpool(f.close)
+
+
+def file_response(request: Request, key, path):
+    """Response for the stored file ``key`` at ``path``; None if it isn't a regular file."""
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        # e.g. a fan-out directory of the store reached through a legacy name
+        return None
+    etag = _etag(key, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+        'Cache-Control': IMMUTABLE if storage.is_key(key) else REVALIDATE,
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+    send_body = request.method != 'HEAD'
+    media_type = _media_type(key)
+    span = _range(request, etag, st.st_size)
+    if span is False:
+        headers['Content-Range'] = f'bytes */{st.st_size}'
+        return Response(status_code=416, headers=headers)
+    if span is None:
+        return FileSliceResponse(path, 0, st.st_size, 200, headers, media_type, send_body)
+    start, end = span
+    headers['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+    return FileSliceResponse(path, start, end - start + 1, 206, headers, media_type, send_body)
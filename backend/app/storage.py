@@ -0,0 +1,410 @@
+"""Content-addressed store for uploaded files.
+
+Uploads are stored under their content: the key of a file is the SHA-256 of its bytes
+plus the extension of its sniffed type (``<sha256>.jpg``), and that key is what
+``TaskSubmission.filename`` and ``Box.hint_filename`` hold. Identical photos are stored
+once. The ``stored_files`` table counts the rows referencing each key:
+
+- ``ingest`` moves a received upload into the store under its key (``upload_key``,
+  hashed before taking ``lock``) or drops it if the content is already there; the
+  caller then commits a ``ref`` for it, saves the referencing row in a transaction of
+  its own and releases the reference again if that fails,
+- ``release`` decrements the counts in the transaction that deletes or replaces rows.
+  A row whose count reaches zero is a tombstone: nothing is deleted in the request, and
+  a rolled back transaction leaves both the rows and the files intact.
+
+``ingest`` and the reference's commit run under ``lock``, as does the collector, so a
+file is never deleted between being found present by ``ingest`` and referenced.
+
+The ``collector`` task deletes tombstoned files (and files derived from them, e.g. image
+variants, see ``register_derived``) in batches of ``COLLECT_BATCH``, woken up after each
+commit that released files. A file that can't be deleted keeps its tombstone and is
+retried with exponential backoff. Every ``RECONCILE_INTERVAL`` (and at startup) it also
+walks the store for orphaned files no row knows about, e.g. left behind by a crash
+between storing a file and committing its reference, and tombstones them.
+
+Where the bytes live is up to the backend (``upload_backend`` setting). ``LocalBackend``
+keeps them in ``uploads/`` in two levels of shard directories taken from the hash
+(``uploads/ab/cd/abcd….jpg``) so no directory grows large. Other backends (e.g. an
+object store) can be added with ``register_backend``; they implement the ``Backend``
+methods, and may return None from ``local_path`` and a URL from ``url`` instead.
+Names from before the store existed (not hash keys) resolve to ``uploads/<name>``.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, func, select
+
+from . import models
+from .db import SessionLocal, CFG
+from .importer import insert_ignore
+
+KEY_RE = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9-]+)+$')
+table = models.StoredFile.__table__
+lock = threading.RLock()
+_derived = []
+
+COLLECT_BATCH = 200
+COLLECT_INTERVAL = 60
+RECONCILE_INTERVAL = 3600
+# retry delay after the n-th failed deletion: 30s, 1m, 2m, ... up to an hour
+RETRY_BASE = 30
+RETRY_MAX = 3600
+
+
+def is_key(name):
+    return bool(name) and KEY_RE.match(name) is not None
+
+
+def digest_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Backend:
+    """Interface of a file store. Keys are flat names; backends choose the layout."""
+
+    def put(self, key, path):
+        """Move the local file ``path`` into the store as ``key`` (replacing it atomically)."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove ``key``; missing keys are ignored."""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Binary file object with the content of ``key``."""
+        raise NotImplementedError
+
+    def keys(self):
+        """Iterate over all stored hash keys."""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of ``key`` if the backend keeps it locally, else None."""
+        return None
+
+    def url(self, key):
+        """URL to redirect clients to for ``key`` if not served locally, else None."""
+        return None
+
+
+class LocalBackend(Backend):
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        if KEY_RE.match(key):
+            return os.path.join(self.root, key[0:2], key[2:4], key)
+        if '/' in key or '\\' in key or key.startswith('.'):
+            raise ValueError(f'Invalid key: {key}')
+        # legacy flat upload
+        return os.path.join(self.root, key)
+
+    def put(self, key, path):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    def exists(self, key):
+        try:
+            return os.path.exists(self._path(key))
+        except ValueError:
+            return False
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def keys(self):
+        for first in sorted(os.listdir(self.root)):
+            if len(first) != 2 or not os.path.isdir(os.path.join(self.root, first)):
+                continue
+            for second in sorted(os.listdir(os.path.join(self.root, first))):
+                for name in sorted(os.listdir(os.path.join(self.root, first, second))):
+                    if KEY_RE.match(name):
+                        yield name
+
+    def local_path(self, key):
+        return self._path(key)
+
+
+_backends = {}
+_backend = None
+
+
+def register_backend(name, factory):
+    """Make ``factory(upload_dir)`` available as ``upload_backend = name``."""
+    _backends[name] = factory
+
+
+register_backend('local', LocalBackend)
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        from .uploads import UPLOAD_DIR
+        name = CFG['upload_backend']
+        if name not in _backends:
+            raise RuntimeError(f'Unknown upload backend: {name}')
+        _backend = _backends[name](UPLOAD_DIR)
+    return _backend
+
+
+def upload_key(upload):
+    """The key a received upload is stored under. Blocking (reads the whole file), so
+    call it before taking ``lock``."""
+    return digest_file(upload.path) + upload.ext
+
+
+def ingest(upload, key):
+    """Store a received upload as ``key`` (see ``upload_key``). Blocking; call under ``lock``.
+
+    The key must be referenced (``ref``) and committed before the lock is released.
+    """
+    store = backend()
+    if store.exists(key):
+        os.remove(upload.path)
+    else:
+        store.put(key, upload.path)
+
+
+def ref(db, key, size=None, content_type=None):
+    """Count one more reference to ``key`` in the transaction of ``db``."""
+    now = datetime.utcnow()
+    # (a tombstone referenced again is revived)
+    update = table.update().where(table.c.key == key).values(refs=table.c.refs + 1, updated_at=now,
+                                                             attempts=0, last_error=None)
+    if db.execute(update).rowcount == 0:
+        row = {'key': key, 'size': size, 'content_type': content_type, 'refs': 1, 'created_at': now, 'updated_at': now}
+        if not insert_ignore(db.connection(), table, [row], 'key'):
+            db.execute(update)
+
+
+def _tombstone(db, keys, now):
+    # tombstones for keys without a row (legacy names, orphaned files)
+    rows = [{'key': k, 'refs': 0, 'created_at': now, 'updated_at': now, 'collect_after': now} for k in keys]
+    insert_ignore(db.connection(), table, rows, 'key')
+
+
+def release(db, keys):
+    """Drop one reference per entry of ``keys`` (a key may repeat). Files left without
+    references are deleted by the collector after ``db`` commits."""
+    counts = {}
+    for key in keys:
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+    now = datetime.utcnow()
+    unknown = []
+    for key, n in counts.items():
+        res = db.execute(table.update().where(table.c.key == key)
+                         .values(refs=table.c.refs - n, updated_at=now, collect_after=now))
+        if res.rowcount == 0:
+            unknown.append(key)
+    _tombstone(db, unknown, now)
+    if counts:
+        db.info['storage_released'] = True
+
+
+def discard(key):
+    """Tombstone ``key`` unless it is referenced, e.g. after failing to save the row
+    referencing a just ingested file. Blocking."""
+    dbs = SessionLocal()
+    try:
+        _tombstone(dbs, [key], datetime.utcnow())
+        dbs.commit()
+    finally:
+        dbs.close()
+    collector.wake()
+
+
+def register_derived(fn):
+    """Register ``fn(key)`` returning the keys of files derived from ``key`` (e.g. image
+    variants); they are deleted together with it and are not orphans while it exists."""
+    if fn not in _derived:
+        _derived.append(fn)
+
+
+def derived(key):
+    if not is_key(key):
+        return []
+    return [name for fn in _derived for name in fn(key)]
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_MAX, RETRY_BASE * 2 ** min(attempts, 16)))
+
+
+def collect(batch=COLLECT_BATCH):
+    """Delete up to ``batch`` tombstoned files that are due. Blocking; returns the counts."""
+    store = backend()
+    now = datetime.utcnow()
+    deleted, failed = [], []
+    with lock:
+        dbs = SessionLocal()
+        try:
+            due = dbs.execute(select(table.c.key, table.c.attempts)
+                              .where(table.c.refs <= 0, table.c.collect_after <= now)
+                              .order_by(table.c.collect_after).limit(batch)).fetchall()
+            for key, attempts in due:
+                try:
+                    try:
+                        store.delete(key)
+                    except ValueError:
+                        # a legacy name that can't be a file in the store
+                        pass
+                    for name in derived(key):
+                        store.delete(name)
+                except Exception as e:
+                    failed.append(key)
+                    dbs.execute(table.update().where(table.c.key == key).values(
+                        attempts=(attempts or 0) + 1, collect_after=now + _retry_delay(attempts or 0),
+                        last_error=f'{type(e).__name__}: {e}'[:256]))
+                else:
+                    deleted.append(key)
+            if deleted:
+                dbs.execute(table.delete().where(table.c.key.in_(deleted), table.c.refs <= 0))
+            dbs.commit()
+        finally:
+            dbs.close()
+    return {'deleted': len(deleted), 'failed': len(failed), 'more': len(due) == batch}
+
+
+def reconcile():
+    """Tombstone stored files that no row knows about. Blocking; returns the counts.
+
+    Files are listed without holding ``lock`` and checked against the table under it, so
+    uploads stored in the meantime are never mistaken for orphans.
+    """
+    store = backend()
+    on_disk = list(store.keys())
+    orphans = []
+    missing = 0
+    with lock:
+        dbs = SessionLocal()
+        try:
+            live = {}
+            for key, refs in dbs.execute(select(table.c.key, table.c.refs)):
+                live[key] = refs
+            expected = set(live)
+            for key in live:
+                expected.update(derived(key))
+            found = set(on_disk)
+            orphans = [key for key in on_disk if key not in expected]
+            missing = sum(1 for key, refs in live.items() if refs > 0 and is_key(key) and key not in found)
+            now = datetime.utcnow()
+            for i in range(0, len(orphans), COLLECT_BATCH):
+                _tombstone(dbs, orphans[i:i + COLLECT_BATCH], now)
+            dbs.commit()
+        finally:
+            dbs.close()
+    return {'files': len(on_disk), 'orphans': len(orphans), 'missing': missing}
+
+
+def pending():
+    """Number of tombstones and how many of them failed at least once."""
+    dbs = SessionLocal()
+    try:
+        total, failing = dbs.execute(select(func.count(), func.count(table.c.last_error))
+                                     .where(table.c.refs <= 0)).one()
+        return {'tombstones': total, 'failing': failing}
+    finally:
+        dbs.close()
+
+
+class Collector:
+    """Background task running ``collect`` (and periodically ``reconcile``)."""
+
+    def __init__(self, interval, reconcile_interval):
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self.deleted = 0
+        self.failed = 0
+        self.last_reconcile = None
+        self._task = None
+        self._loop = None
+        self._wake = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._loop = None
+
+    def wake(self):
+        """Run a collection soon; callable from any thread."""
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                # the loop has been closed
+                pass
+
+    def stats(self):
+        out = {'deleted': self.deleted, 'failed': self.failed, 'last_reconcile': self.last_reconcile}
+        out.update(pending())
+        return out
+
+    async def _run(self):
+        reconciled_at = None
+        while True:
+            self._wake.clear()
+            try:
+                if reconciled_at is None or self._loop.time() - reconciled_at >= self.reconcile_interval:
+                    result = await run_in_threadpool(reconcile)
+                    result['at'] = datetime.utcnow().isoformat()
+                    self.last_reconcile = result
+                    reconciled_at = self._loop.time()
+                while True:
+                    result = await run_in_threadpool(collect)
+                    self.deleted += result['deleted']
+                    self.failed += result['failed']
+                    if not result['more']:
+                        break
+                    # let request handlers in between large batches
+                    await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print('Upload collector error:', e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+collector = Collector(COLLECT_INTERVAL, RECONCILE_INTERVAL)
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('storage_released', None):
+        collector.wake()
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('storage_released', None)
@@ -0,0 +1,220 @@
+"""Streaming image uploads (task submissions and box hints).
+
+``receive`` parses the multipart request body itself instead of letting the framework
+spool the whole upload first: file data is written chunk by chunk to a temporary file in
+``uploads/.partial`` and the request is rejected as soon as
+
+- ``Content-Length`` (when sent) or the bytes received so far exceed ``MAX_BYTES``,
+- the first bytes of the file aren't a JPEG, PNG or WebP signature (the client's
+  ``Content-Type`` is ignored),
+- a ``before_file`` check on the fields sent ahead of the file fails.
+
+Memory use per upload is therefore one network chunk, and all file operations run in the
+threadpool. The finished file is moved into the content store (``storage.ingest``, an
+atomic rename for the local backend), so ``/uploads`` never serves a partial file;
+``discard`` removes it instead.
+"""
+import os
+import tempfile
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import MultipartParser, parse_options_header
+
+from .db import CFG
+
+UPLOAD_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'uploads'))
+# same filesystem as UPLOAD_DIR, so the final rename is atomic
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, '.partial')
+MAX_BYTES = CFG['max_upload_bytes']
+# room for the multipart boundaries and the small form fields
+FORM_OVERHEAD = 64 * 1024
+MAX_FIELD_BYTES = 1024
+SNIFF_BYTES = 12
+# rejecting mid-body: close the connection rather than reading the rest of the upload
+_CLOSE = {'Connection': 'close'}
+
+
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp'}
+
+
+def _sniff_type(head):
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def sniff(head):
+    """``(content_type, extension)`` from the first bytes of a file, or None."""
+    content_type = _sniff_type(head)
+    return (content_type, EXTENSIONS[content_type]) if content_type else None
+
+
+class Upload:
+    """A received file, still in PARTIAL_DIR until ingested into the store or discarded."""
+
+    def __init__(self, path, filename):
+        self.path = path
+        self.filename = filename
+        self.size = 0
+        self.content_type = None
+        self.ext = ''
+
+
+class _Receiver:
+    """python-multipart callbacks; the parser calls them synchronously, so file data is
+    only collected here and written by ``receive`` between network chunks."""
+
+    def __init__(self, file_field):
+        self.file_field = file_field
+        self.fields = {}
+        self.filename = None
+        self.file_started = False
+        self.file_done = False
+        self.chunks = []
+        self.size = 0
+        self.field_too_large = False
+        self._headers = {}
+        self._header_field = b''
+        self._header_value = b''
+        self._name = None
+        self._value = None
+        self._in_file = False
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._name = None
+        self._value = None
+        self._in_file = False
+
+    def on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        name = options.get(b'name', b'').decode('utf-8', 'replace')
+        if b'filename' in options:
+            # only the first part of the expected file field is kept; other files are skipped
+            if name == self.file_field and not self.file_started:
+                self.file_started = True
+                self._in_file = True
+                self.filename = options[b'filename'].decode('utf-8', 'replace')
+            return
+        self._name = name
+        self._value = bytearray()
+
+    def on_part_data(self, data, start, end):
+        if self._in_file:
+            self.chunks.append(data[start:end])
+            self.size += end - start
+        elif self._value is not None:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_BYTES:
+                self.field_too_large = True
+
+    def on_part_end(self):
+        if self._in_file:
+            self.file_done = True
+        elif self._value is not None:
+            self.fields[self._name] = self._value.decode('utf-8', 'replace')
+        self._in_file = False
+        self._value = None
+
+    def callbacks(self):
+        names = ('on_part_begin', 'on_part_data', 'on_part_end', 'on_header_field',
+                 'on_header_value', 'on_header_end', 'on_headers_finished')
+        return {name: getattr(self, name) for name in names}
+
+
+def _open_partial():
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=PARTIAL_DIR, suffix='.part')
+    return os.fdopen(fd, 'wb'), path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive(request: Request, file_field='file', max_bytes=MAX_BYTES, before_file=None):
+    """Stream a multipart form with one image file to PARTIAL_DIR.
+
+    Returns ``(fields, upload)``: the text fields, and an Upload (None if the form had no
+    file). ``before_file(fields)`` is awaited when the file part starts, with the fields
+    sent before it, and may raise to reject the request before the file is read. Raises
+    HTTPException 400 for oversized or non-image files, with the partial file removed.
+    """
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise HTTPException(status_code=400, detail='Expected multipart/form-data')
+    length = request.headers.get('content-length')
+    if length and length.isdigit() and int(length) > max_bytes + FORM_OVERHEAD:
+        raise HTTPException(status_code=400, detail='File too large')
+
+    receiver = _Receiver(file_field)
+    parser = MultipartParser(params[b'boundary'], receiver.callbacks())
+    upload = None
+    out = None
+    head = b''
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if receiver.field_too_large:
+                raise HTTPException(status_code=400, detail='Form field too large', headers=_CLOSE)
+            if receiver.size > max_bytes:
+                raise HTTPException(status_code=400, detail='File too large', headers=_CLOSE)
+            if receiver.file_started and upload is None:
+                if before_file is not None:
+                    try:
+                        await before_file(dict(receiver.fields))
+                    except HTTPException as e:
+                        e.headers = {**(e.headers or {}), **_CLOSE}
+                        raise
+                out, path = await run_in_threadpool(_open_partial)
+                upload = Upload(path, receiver.filename)
+            if receiver.chunks:
+                data = b''.join(receiver.chunks)
+                receiver.chunks.clear()
+                if upload.content_type is None:
+                    head += data[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES or receiver.file_done:
+                        kind = sniff(head)
+                        if kind is None:
+                            raise HTTPException(status_code=400, detail='Invalid file type', headers=_CLOSE)
+                        upload.content_type, upload.ext = kind
+                await run_in_threadpool(out.write, data)
+                upload.size += len(data)
+        parser.finalize()
+        if upload is not None:
+            await run_in_threadpool(out.close)
+            out = None
+            if upload.content_type is None:
+                raise HTTPException(status_code=400, detail='Invalid file type')
+    except BaseException:
+        if out is not None:
+            await run_in_threadpool(out.close)
+        if upload is not None:
+            await run_in_threadpool(_remove, upload.path)
+        raise
+    return receiver.fields, upload
+
+
+def discard(upload):
+    """Remove a received file that won't be stored. Blocking."""
+    if upload is not None:
+        _remove(upload.path)
@@ -0,0 +1,119 @@
+"""Per-table data versions for conditional GETs (ETag / If-None-Match).
+
+Every INSERT/UPDATE/DELETE executed through the engine is noted on its connection; when
+the transaction commits the tables are marked as committed, and once the connection goes
+back to the pool (i.e. after the commit has happened) their version counters are bumped.
+A rolled-back transaction bumps nothing. This covers ORM sessions, bulk query updates
+and the raw connections used by the importer alike, so write endpoints don't need to
+remember to invalidate anything.
+
+Read endpoints compute their ETag from the versions of the tables they read *before*
+touching the database, and answer ``304 Not Modified`` without a query when the client
+already has that tag. Updates that only change columns no cached list shows (the
+``used`` flags flipped by every scan) are ignored.
+
+Versions live in process memory and include a per-process boot id, so tags change on
+restart; like the other in-process caches this assumes a single backend process.
+"""
+import threading
+import time
+from email.utils import formatdate
+
+from fastapi import Request, Response
+from sqlalchemy import event
+
+from .db import engine
+
+# updates setting only these columns don't change any cached representation
+UNTRACKED_COLUMNS = {
+    'questions': {'used'},
+    'code_words': {'used'},
+}
+
+_BOOT = format(time.time_ns() // 1000, 'x')
+_lock = threading.Lock()
+_versions = {}
+_modified = {}
+_started = time.time()
+
+
+def bump(*tables):
+    now = time.time()
+    with _lock:
+        for name in tables:
+            _versions[name] = _versions.get(name, 0) + 1
+            _modified[name] = now
+
+
+def etag(*tables):
+    with _lock:
+        parts = '.'.join(str(_versions.get(name, 0)) for name in tables)
+    return f'"{_BOOT}-{parts}"'
+
+
+def last_modified(*tables):
+    with _lock:
+        ts = max([_modified.get(name, _started) for name in tables] or [_started])
+    return formatdate(ts, usegmt=True)
+
+
+def _set_columns(stmt, params):
+    values = getattr(stmt, '_values', None)
+    if values:
+        return {getattr(k, 'key', k) for k in values}
+    if isinstance(params, (list, tuple)) and params:
+        params = params[0]
+    if isinstance(params, dict):
+        # ORM flushes bind the primary key under other names; keep real columns only
+        return {k for k in params if k in stmt.table.c}
+    return None
+
+
+@event.listens_for(engine, 'after_execute')
+def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+    if not getattr(clauseelement, 'is_dml', False):
+        return
+    table = getattr(getattr(clauseelement, 'table', None), 'name', None)
+    if table is None:
+        return
+    if getattr(clauseelement, 'is_update', False) and table in UNTRACKED_COLUMNS:
+        columns = _set_columns(clauseelement, multiparams[0] if multiparams else params)
+        if columns is not None and columns <= UNTRACKED_COLUMNS[table]:
+            return
+    conn.info.setdefault('versions_pending', set()).add(table)
+
+
+@event.listens_for(engine, 'commit')
+def _on_commit(conn):
+    pending = conn.info.pop('versions_pending', None)
+    if pending:
+        conn.info.setdefault('versions_committed', set()).update(pending)
+
+
+@event.listens_for(engine, 'rollback')
+def _on_rollback(conn):
+    conn.info.pop('versions_pending', None)
+
+
+@event.listens_for(engine, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    committed = connection_record.info.pop('versions_committed', None)
+    connection_record.info.pop('versions_pending', None)
+    if committed:
+        bump(*committed)
+
+
+def conditional(request: Request, response: Response, *tables, private=False):
+    """Set ETag/Last-Modified for ``tables`` on ``response``; return a 304 response if the
+    client's If-None-Match already matches (the caller returns it as is)."""
+    tag = etag(*tables)
+    headers = {
+        'ETag': tag,
+        'Last-Modified': last_modified(*tables),
+        'Cache-Control': 'private, no-cache' if private else 'no-cache',
+    }
+    match = request.headers.get('if-none-match')
+    if match and (match.strip() == '*' or tag in [t.strip().removeprefix('W/') for t in match.split(',')]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
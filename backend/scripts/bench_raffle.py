@@ -0,0 +1,100 @@
+"""Benchmark the raffle engine on a large synthetic population.
+
+Times the previous O(n·k) cumulative-weight loop against the heap and (if installed) NumPy
+methods of app/raffle.py, checks that a seed reproduces a draw, compares first-pick
+frequencies with the weights on a small population, and times the full /api/admin/raffle
+request against a throwaway SQLite database with that many sessions and scores rows.
+
+Usage (from the backend folder): python scripts/bench_raffle.py [participants] [winners]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('CREATE_TABLES', '1')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models, raffle  # noqa: E402
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+AUTH = ('admin', 'admin')
+
+
+def legacy(entries, k):
+    # the loop admin_raffle used before: rescan the cumulative weights for every winner
+    participants = [list(e) for e in entries]
+    winners = []
+    for _ in range(min(k, len(participants))):
+        total = sum(w for _, w in participants)
+        r = random.uniform(0, total)
+        cum = 0
+        chosen = len(participants) - 1
+        for i, (_, w) in enumerate(participants):
+            cum += w
+            if r <= cum:
+                chosen = i
+                break
+        winners.append(participants.pop(chosen)[0])
+    return winners
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    rng = random.Random(1)
+    entries = [(f'user{i:06d}', max(1, int(rng.paretovariate(1.5)))) for i in range(n)]
+    methods = [m for m in raffle.METHODS if m != 'numpy' or raffle.np is not None]
+    print(f'{n} participants, {k} winners, methods: {", ".join(methods)}')
+
+    _, ms = timed(legacy, entries, k)
+    print(f'  legacy loop      {ms:9.1f} ms')
+    for method in methods:
+        for winners in (k, min(n, 1000)):
+            result, ms = timed(raffle.draw, entries, winners, seed=42, method=method)
+            again = raffle.draw(entries, winners, seed=42, method=method)
+            same = 'reproducible' if again['winners'] == result['winners'] else 'NOT REPRODUCIBLE'
+            print(f'  {method:<6} k={winners:<5} {ms:9.1f} ms  {same}')
+
+    # P(first pick = i) must be weight_i / total
+    small = [('a', 1), ('b', 2), ('c', 3), ('d', 4)]
+    trials = 20_000
+    for method in methods:
+        counts = {name: 0 for name, _ in small}
+        for seed in range(trials):
+            counts[raffle.draw(small, 1, seed=seed, method=method)['winners'][0]] += 1
+        freqs = ' '.join(f'{name}={counts[name] / trials:.3f}/{w / 10:.1f}' for name, w in small)
+        print(f'  {method:<6} first-pick frequency/expected: {freqs}')
+
+    with TestClient(app) as client:
+        # after startup, so the scores check of the migrations doesn't see half-made rows
+        with engine.begin() as conn:
+            conn.execute(models.Score.__table__.delete())
+            conn.execute(models.UserSession.__table__.delete())
+            conn.execute(models.UserSession.__table__.insert(), [
+                {'telegram_username': name, 'session_id': f's-{name}'} for name, _ in entries])
+            conn.execute(models.Score.__table__.insert(), [
+                {'username': name, 'answers': w, 'correct_answers': w, 'awarded': 0, 'score': w}
+                for name, w in entries])
+        client.post('/api/admin/raffle', json={'winners': 1}, auth=AUTH)
+        for method in methods:
+            r, ms = timed(client.post, '/api/admin/raffle', json={'winners': k, 'method': method}, auth=AUTH)
+            body = r.json()
+            print(f'  POST /api/admin/raffle {method:<6} {ms:7.1f} ms  status {r.status_code}, '
+                  f'{body.get("entries")} entries, seed {body.get("seed")}')
+
+
+if __name__ == '__main__':
+    main()
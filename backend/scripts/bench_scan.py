@@ -0,0 +1,70 @@
+"""Measure /api/scan cost in-process: SQL statements per scan and latency percentiles.
+
+Runs the app against a throwaway SQLite database (or DATABASE_URL if set), creates a
+question bank, QR codes and sessions, then scans and reports statements/commits per scan
+and p50/p99 latency.
+
+Usage (from the backend folder): python scripts/bench_scan.py [scans]
+"""
+import os
+import sys
+import tempfile
+import time
+
+if not os.environ.get('DATABASE_URL'):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ.setdefault('CREATE_TABLES', '1')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.db import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+AUTH = ('admin', 'admin')
+QUESTIONS = 2000
+SESSIONS = 20
+
+
+def main():
+    scans = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    codes_per_session = max(1, scans // SESSIONS)
+    counts = {'statements': 0, 'commits': 0}
+
+    def on_execute(*args):
+        counts['statements'] += 1
+
+    def on_commit(conn):
+        counts['commits'] += 1
+
+    with TestClient(app) as client:
+        bank = '\n'.join(f'{{"question_text": "bench {i}", "options": ["a", "b", "c", "d"], "answer": 1}}' for i in range(QUESTIONS))
+        client.post('/api/admin/surveys/import', files={'file': ('bank.jsonl', bank.encode())}, auth=AUTH).raise_for_status()
+        for code in range(codes_per_session):
+            client.post('/api/admin/qrcode', json={'code': 700000 + code, 'quest_id': 1}, auth=AUTH)
+        client.post('/api/admin/start', auth=AUTH).raise_for_status()
+        sessions = [f'bench-{i}' for i in range(SESSIONS)]
+        for sid in sessions:
+            client.post('/api/session', json={'telegram_username': sid, 'session_id': sid}).raise_for_status()
+
+        event.listen(engine, 'before_cursor_execute', on_execute)
+        event.listen(engine, 'commit', on_commit)
+        latencies = []
+        for code in range(codes_per_session):
+            for sid in sessions:
+                started = time.perf_counter()
+                r = client.post('/api/scan', json={'session_id': sid, 'code': str(700000 + code)})
+                latencies.append(time.perf_counter() - started)
+                r.raise_for_status()
+        event.remove(engine, 'before_cursor_execute', on_execute)
+        event.remove(engine, 'commit', on_commit)
+
+    n = len(latencies)
+    latencies.sort()
+    print(f'scans={n} statements/scan={counts["statements"] / n:.2f} commits/scan={counts["commits"] / n:.2f}')
+    print(f'p50={latencies[n // 2] * 1000:.2f}ms p99={latencies[min(n - 1, int(n * 0.99))] * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
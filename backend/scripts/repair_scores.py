@@ -0,0 +1,37 @@
+"""Check the materialized leaderboard (``scores`` table) against the raw events and repair it.
+
+Recomputes every username's answers, correct answers and awarded points from
+user_sessions / user_answers / participants (the definition the leaderboard used to
+aggregate on every request) and compares them with the stored rows. Differing, missing
+and stale rows are fixed unless --check is given.
+
+Usage (from the backend folder, with the same DATABASE_URL / config.json as the server):
+    python scripts/repair_scores.py           # report and fix
+    python scripts/repair_scores.py --check   # report only; exit code 1 if anything differs
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import scores  # noqa: E402
+from app.db import engine  # noqa: E402
+
+
+def main():
+    check_only = '--check' in sys.argv[1:]
+    with engine.begin() as conn:
+        report = scores.repair(conn, apply=not check_only)
+    bad = report['mismatched'] + report['missing'] + report['extra']
+    print(f"checked={report['checked']} mismatched={len(report['mismatched'])} "
+          f"missing={len(report['missing'])} extra={len(report['extra'])}")
+    for name in ('mismatched', 'missing', 'extra'):
+        for username in report[name][:20]:
+            print(f'  {name}: {username}')
+    if bad and check_only:
+        sys.exit(1)
+    print('OK' if not bad else 'Repaired')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Concurrency stress test for /api/scan against a running backend.
+
+Creates a bank of regular (non-task) questions and QR codes, then lets N parallel
+"scanners" (one session each) scan codes until the bank is exhausted. Every regular
+question may only be served once overall, so the script fails if any question id is
+handed out twice, and reports scan throughput for each level of parallelism.
+
+WARNING: this resets the game data of the target server (all questions and QR code
+scans are affected). Only run it against a throwaway database.
+
+Usage: python scripts/stress_scan.py [base_url] [admin_user] [admin_password]
+"""
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BASE = sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:8000/api'
+AUTH = (sys.argv[2] if len(sys.argv) > 2 else 'admin', sys.argv[3] if len(sys.argv) > 3 else 'admin')
+QUEST_ID = 9001
+QUESTIONS = 400
+CODES_PER_SCANNER = 60
+LEVELS = (1, 2, 4, 8, 16)
+
+
+def setup():
+    requests.delete(BASE + '/admin/questions/all', auth=AUTH).raise_for_status()
+    bank = '\n'.join(json.dumps({'question_text': f'stress {i}', 'options': ['a', 'b', 'c', 'd'], 'answer': 1, 'quest_id': QUEST_ID})
+                     for i in range(QUESTIONS))
+    r = requests.post(BASE + '/admin/surveys/import', files={'file': ('bank.jsonl', bank.encode())}, auth=AUTH)
+    r.raise_for_status()
+    requests.post(BASE + '/admin/start', auth=AUTH).raise_for_status()
+
+
+def make_codes(n):
+    codes = []
+    base = int(time.time()) % 100000 * 1000
+    for i in range(n):
+        code = base + i
+        requests.post(BASE + '/admin/qrcode', json={'code': code, 'quest_id': QUEST_ID}, auth=AUTH)
+        codes.append(str(code))
+    return codes
+
+
+def scanner(codes):
+    session_id = f'stress-{uuid.uuid4().hex}'
+    http = requests.Session()
+    http.post(BASE + '/session', json={'telegram_username': session_id, 'session_id': session_id}).raise_for_status()
+    served = []
+    scans = 0
+    for code in codes:
+        r = http.post(BASE + '/scan', json={'session_id': session_id, 'code': code})
+        r.raise_for_status()
+        scans += 1
+        q = r.json().get('question')
+        if q:
+            served.append(q['id'])
+    return served, scans
+
+
+def run(level, codes):
+    requests.post(BASE + '/admin/questions/reset', auth=AUTH).raise_for_status()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        results = list(pool.map(scanner, [codes] * level))
+    elapsed = time.perf_counter() - started
+    served = [qid for ids, _ in results for qid in ids]
+    scans = sum(n for _, n in results)
+    duplicates = len(served) - len(set(served))
+    print(f'scanners={level:3d} scans={scans:5d} served={len(served):4d} duplicates={duplicates} '
+          f'throughput={scans / elapsed:8.1f} scans/s')
+    return duplicates
+
+
+def main():
+    setup()
+    codes = make_codes(CODES_PER_SCANNER)
+    failed = False
+    for level in LEVELS:
+        if run(level, codes):
+            failed = True
+    if failed:
+        print('FAIL: a regular question was served more than once')
+        sys.exit(1)
+    print('OK: no question was served twice')
+
+
+if __name__ == '__main__':
+    main()
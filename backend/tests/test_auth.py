@@ -0,0 +1,17 @@
+from app import auth
+
+
+def test_token_round_trip():
+    assert auth.verify_token(auth.issue_token('admin')) == 'admin'
+
+
+def test_non_ascii_token_is_rejected():
+    token = auth.issue_token('admin')
+    assert auth.verify_token('ä' + token) is None
+    assert auth.verify_token(token + 'ä') is None
+    assert auth.verify_token('päyload.sïg') is None
+
+
+def test_non_ascii_bearer_header_is_unauthorized(client):
+    r = client.get('/api/admin/questions', headers={'Authorization': 'Bearer päyload.sïg'.encode('latin-1')})
+    assert r.status_code == 401
@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import decks, models
+from app.db import SessionLocal
+
+QUEST_ID = 7001
+QUESTIONS = 60
+SCANNERS = 8
+
+
+def _questions(n):
+    dbs = SessionLocal()
+    try:
+        qs = [models.Question(question_text=f'deck question {i}', correct_answer='a', options='["a","b"]',
+                              quest_id=QUEST_ID) for i in range(n)]
+        dbs.add_all(qs)
+        dbs.commit()
+        return [q.id for q in qs]
+    finally:
+        dbs.close()
+
+
+def test_concurrent_claims_of_one_question(client):
+    (qid,) = _questions(1)
+    start = threading.Barrier(SCANNERS)
+
+    def claim(_):
+        dbs = SessionLocal()
+        try:
+            start.wait()
+            won = decks.claim(dbs, qid)
+            dbs.commit()
+            return won
+        finally:
+            dbs.close()
+
+    with ThreadPoolExecutor(SCANNERS) as pool:
+        assert sorted(pool.map(claim, range(SCANNERS))) == [False] * (SCANNERS - 1) + [True]
+
+
+def test_concurrent_scanners_never_share_a_question(client):
+    ids = set(_questions(QUESTIONS))
+    start = threading.Barrier(SCANNERS)
+
+    def scan(n):
+        session_id = f'deck-scanner-{n}'
+        served = []
+        dbs = SessionLocal()
+        try:
+            start.wait()
+            while True:
+                q = decks.next_question(dbs, session_id, QUEST_ID)
+                dbs.commit()
+                if q is None:
+                    return served
+                served.append(q.id)
+        finally:
+            dbs.close()
+
+    with ThreadPoolExecutor(SCANNERS) as pool:
+        served = [qid for ids_of_one in pool.map(scan, range(SCANNERS)) for qid in ids_of_one]
+    assert len(served) == len(set(served))
+    assert set(served) == ids
@@ -0,0 +1,70 @@
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import derivatives, storage
+
+pytestmark = pytest.mark.skipif(not derivatives.AVAILABLE, reason='Pillow is not installed')
+
+KEY = 'f' * 64 + '.jpg'
+
+
+@pytest.fixture
+def stored():
+    # an original (content doesn't matter) with no variants
+    store = storage.backend()
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    store.put(KEY, path)
+    yield store
+    for key in [KEY] + derivatives.variant_keys(KEY):
+        try:
+            os.remove(store.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+def test_pending_key_collects_callbacks(stored):
+    calls = []
+    with derivatives._metrics.lock:
+        derivatives._metrics.pending[KEY] = []
+    try:
+        assert derivatives.schedule(KEY, lambda: calls.append(1))
+        assert derivatives.schedule(KEY, lambda: calls.append(2))
+        assert len(derivatives._metrics.pending[KEY]) == 2
+    finally:
+        with derivatives._metrics.lock:
+            derivatives._metrics.pending.pop(KEY)
+    assert calls == []
+
+
+def test_existing_variants_are_not_rendered_again(stored):
+    for variant in derivatives.VARIANTS:
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        stored.put(derivatives.variant_key(KEY, variant), path)
+    calls = []
+    assert derivatives.schedule(KEY, lambda: calls.append(1))
+    assert calls == [1]
+    assert KEY not in derivatives._metrics.pending
+
+
+class _BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool('a worker died')
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_broken_pool_is_replaced(stored, monkeypatch):
+    broken = _BrokenPool()
+    monkeypatch.setattr(derivatives, '_pool', broken)
+    try:
+        assert derivatives.schedule(KEY)
+        assert derivatives._pool is not broken
+    finally:
+        with derivatives._metrics.lock:
+            derivatives._metrics.pending.pop(KEY, None)
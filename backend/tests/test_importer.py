@@ -0,0 +1,19 @@
+import io
+
+from app import importer
+
+
+def test_failed_chunk_reports_only_the_failing_lines(client, monkeypatch):
+    insert = importer._insert
+
+    def picky(table, rows, conflict_column):
+        if any(row['word'] == 'broken' for row in rows):
+            raise ValueError('bad row')
+        return insert(table, rows, conflict_column)
+
+    monkeypatch.setattr(importer, '_insert', picky)
+    data = b'import-one\nbroken\nimport-two\nimport-one\n'
+    report = importer.import_records('codewords', io.BytesIO(data))
+    assert report['created'] == 2
+    assert report['skipped'] == 1
+    assert report['errors'] == [{'line': 2, 'reason': 'bad row'}]
@@ -0,0 +1,73 @@
+import pytest
+
+from app import derivatives, models, storage
+from app.db import SessionLocal
+
+
+@pytest.fixture
+def task_id():
+    dbs = SessionLocal()
+    try:
+        q = models.Question(question_text='photo', correct_answer='', options='[]', quest_id=1, is_task=True)
+        dbs.add(q)
+        dbs.commit()
+        return q.id
+    finally:
+        dbs.close()
+
+
+def _upload(client, session_id, question_id, data):
+    r = client.post('/api/tasks/uploads', json={'session_id': session_id, 'question_id': question_id,
+                                                 'size': len(data), 'filename': 'me.jpg'})
+    upload_id = r.json()['upload_id']
+    assert client.put(f'/api/tasks/uploads/{upload_id}/chunks/0', content=data).status_code == 200
+    return upload_id
+
+
+def test_finalize_survives_a_failed_save(client, task_id, monkeypatch):
+    data = b'\xff\xd8\xff\xe0' + b'1' * 1000
+    upload_id = _upload(client, 'resumable-1', task_id, data)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('database went away')
+
+    with monkeypatch.context() as m:
+        m.setattr(storage, 'ref', broken)
+        with pytest.raises(RuntimeError):
+            client.post(f'/api/tasks/uploads/{upload_id}/finalize')
+    assert client.get(f'/api/tasks/uploads/{upload_id}').json()['complete']
+
+    r = client.post(f'/api/tasks/uploads/{upload_id}/finalize')
+    assert r.status_code == 200
+    with open(storage.backend().local_path(r.json()['filename']), 'rb') as f:
+        assert f.read() == data
+    assert client.get(f'/api/tasks/uploads/{upload_id}').status_code == 404
+
+
+def test_finalize_retry_returns_the_submission(client, task_id):
+    upload_id = _upload(client, 'resumable-2', task_id, b'\xff\xd8\xff\xe0' + b'2' * 1000)
+    first = client.post(f'/api/tasks/uploads/{upload_id}/finalize')
+    again = client.post(f'/api/tasks/uploads/{upload_id}/finalize')
+    assert first.status_code == again.status_code == 200
+    assert again.json()['filename'] == first.json()['filename']
+    assert client.post('/api/tasks/uploads/unknown/finalize').status_code == 404
+
+
+def test_finalize_refuses_a_task_submitted_otherwise(client, task_id):
+    upload_id = _upload(client, 'resumable-4', task_id, b'\xff\xd8\xff\xe0' + b'4' * 1000)
+    r = client.post('/api/tasks/submit', data={'question_id': str(task_id), 'session_id': 'resumable-4'},
+                    files={'file': ('a.jpg', b'\xff\xd8\xff\xe0' + b'5' * 1000, 'image/jpeg')})
+    assert r.status_code == 200
+    r = client.post(f'/api/tasks/uploads/{upload_id}/finalize')
+    assert r.status_code == 400
+    assert r.json()['detail'] == 'Task already submitted'
+
+
+def test_submission_survives_a_scheduling_error(client, task_id, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError('pool is gone')
+
+    monkeypatch.setattr(derivatives, 'schedule', broken)
+    r = client.post('/api/tasks/submit', data={'question_id': str(task_id), 'session_id': 'resumable-3'},
+                    files={'file': ('a.jpg', b'\xff\xd8\xff\xe0' + b'3' * 1000, 'image/jpeg')})
+    assert r.status_code == 200
@@ -0,0 +1,20 @@
+import os
+
+from app import uploads
+
+
+def test_upload_directory_is_not_found(client):
+    # 'ab' is a legacy-style name, but on disk it's the first level of the store's fan-out
+    path = os.path.join(uploads.UPLOAD_DIR, 'ab')
+    created = not os.path.exists(path)
+    os.makedirs(path, exist_ok=True)
+    try:
+        assert client.get('/uploads/ab').status_code == 404
+        assert client.head('/uploads/ab').status_code == 404
+    finally:
+        if created:
+            os.rmdir(path)
+
+
+def test_missing_upload_is_not_found(client):
+    assert client.get('/uploads/missing.jpg').status_code == 404
@@ -1,8 +1,63 @@
-import React, {useState, useEffect} from 'react'
+import React, {useState, useEffect, useRef} from 'react'
 import axios from 'axios'
 import AdminLogin from './AdminLogin'
 import { t } from './i18n'
 
+const ITEMS_PER_PAGE = 10
+
+const SEARCH_DELAY_MS = 300
+// admin calls where a 401 means the password typed in was wrong, not that the session ended
+const CREDENTIAL_CHECKS = ['/api/admin/login', '/api/admin/settings/change_password']
+
+// one server-side page of an admin list (see backend/app/listing.py); keeps the cursor of
+// every page visited so far, the search text and the total count. Typing in the search
+// box loads after a pause, and only the response to the latest request is shown.
+function usePagedList(url, pageSize){
+  const [items, setItems] = useState([])
+  const [total, setTotal] = useState(0)
+  const [page, setPage] = useState(1)
+  const [cursors, setCursors] = useState([null])
+  const [search, setSearch] = useState('')
+  const latest = useRef(0)
+  const timer = useRef(null)
+
+  useEffect(()=>()=>clearTimeout(timer.current), [])
+
+  function load(p, q = search, known = cursors){
+    const params = { limit: pageSize }
+    if(known[p-1]) params.cursor = known[p-1]
+    if(q.trim()) params.q = q.trim()
+    const request = ++latest.current
+    return axios.get(url, { params }).then(r=>{
+      if(request !== latest.current) return
+      const next = r.headers['x-next-cursor']
+      setItems(r.data || [])
+      setTotal(parseInt(r.headers['x-total-count'] || '0', 10))
+      setCursors(next ? [...known.slice(0, p), next] : known.slice(0, p))
+      setPage(p)
+    }).catch(()=>{
+      if(request !== latest.current) return
+      setItems([]); setTotal(0)
+    })
+  }
+
+  function find(q){
+    setSearch(q)
+    clearTimeout(timer.current)
+    timer.current = setTimeout(()=>load(1, q, [null]), SEARCH_DELAY_MS)
+  }
+
+  return {
+    items, total, page, search,
+    pages: Math.max(1, Math.ceil(total / pageSize)),
+    hasNext: cursors.length > page,
+    reload: ()=>load(page),
+    prev: ()=>load(page-1),
+    next: ()=>load(page+1),
+    find,
+  }
+}
+
 export default function Admin({onLogout, defaultLang}){
   const [status, setStatus] = useState('')
   const [winners, setWinners] = useState([])
@@ -15,9 +70,11 @@ export default function Admin({onLogout, defaultLang}){
   const [showWinnerReveal, setShowWinnerReveal] = useState(false)
   const [currentWinnerIndex, setCurrentWinnerIndex] = useState(0)
   const [showAddQuestion, setShowAddQuestion] = useState(false)
-  const [questions, setQuestions] = useState([])
+  const questionsList = usePagedList('/api/admin/questions', ITEMS_PER_PAGE)
+  const questions = questionsList.items
   const [newQ, setNewQ] = useState({question_text:'', options:['','','',''], correct_index:3})
-  const [codeWords, setCodeWords] = useState([])
+  const wordsList = usePagedList('/api/admin/codewords', ITEMS_PER_PAGE)
+  const codeWords = wordsList.items
   const [newWord, setNewWord] = useState('')
   const [boxes, setBoxes] = useState([])
   const [showBoxesModal, setShowBoxesModal] = useState(false)
@@ -35,15 +92,32 @@ export default function Admin({onLogout, defaultLang}){
   // load stored admin credentials (set by AdminLogin on successful auth)
   useEffect(()=>{
     try{
+      const token = localStorage.getItem('admin_token')
       const username = localStorage.getItem('admin_username')
       const password = localStorage.getItem('admin_password')
-      if(username && password){
-        // ensure axios uses these credentials for admin API calls
+      if(token){
+        // ensure axios uses the admin token for admin API calls
+        axios.defaults.headers.common['Authorization'] = `Bearer ${token}`
+      }else if(username && password){
+        // credentials stored by older versions of the login page
         axios.defaults.auth = { username, password }
       }
     }catch(e){}
   }, [])
 
+  // tokens expire (and die with a server restart unless the secret is configured): on a
+  // 401 from the admin API go back to the login page instead of showing empty lists
+  useEffect(()=>{
+    const id = axios.interceptors.response.use(r=>r, err=>{
+      const url = (err.config && err.config.url) || ''
+      if(err.response && err.response.status === 401 && url.startsWith('/api/admin/') && !CREDENTIAL_CHECKS.includes(url)){
+        logout()
+      }
+      return Promise.reject(err)
+    })
+    return ()=> axios.interceptors.response.eject(id)
+  }, [])
+
   function doAction(path){
   axios.post(path, {}, {}).then(()=>{
       // avoid showing raw OK/Err in the UI; update gameActive based on path
@@ -113,15 +187,11 @@ export default function Admin({onLogout, defaultLang}){
 
   // load questions
   function loadQuestions(){
-  axios.get('/api/admin/questions').then(r=>{
-      setQuestions(r.data || [])
-    }).catch(()=>setQuestions([]))
+    questionsList.reload()
   }
 
   function loadCodeWords(){
-  axios.get('/api/admin/codewords').then(r=>{
-      setCodeWords(r.data || [])
-    }).catch(()=>setCodeWords([]))
+    wordsList.reload()
   }
 
   function loadBoxes(){
@@ -149,7 +219,7 @@ export default function Admin({onLogout, defaultLang}){
     fd.append('file', file, file.name)
     setUploadingBoxIndex(index)
     axios.post(`/api/admin/boxes/${index}/hint`, fd, { headers: { 'Content-Type': 'multipart/form-data' } }).then(r=>{
-      const updated = boxes.map(b => b.box_index === index ? { ...b, hint_filename: r.data.hint_filename } : b)
+      const updated = boxes.map(b => b.box_index === index ? { ...b, hint_filename: r.data.hint_filename, hint_thumb_url: null } : b)
       setBoxes(updated)
       setUploadingBoxIndex(null)
     }).catch(e=>{ setUploadingBoxIndex(null); alert(t('failed', defaultLang)) })
@@ -271,7 +341,9 @@ export default function Admin({onLogout, defaultLang}){
       localStorage.removeItem('is_admin')
       localStorage.removeItem('admin_username')
       localStorage.removeItem('admin_password')
+      localStorage.removeItem('admin_token')
       try{ axios.defaults.auth = null }catch(e){}
+      try{ delete axios.defaults.headers.common['Authorization'] }catch(e){}
     }catch(e){}
     try{ if(onLogout) onLogout() }catch(e){}
   }
@@ -285,12 +357,10 @@ export default function Admin({onLogout, defaultLang}){
   const [cpNew, setCpNew] = useState('')
   const [cpConfirm, setCpConfirm] = useState('')
   // pagination states
-  const ITEMS_PER_PAGE = 10
-  const [questionsPage, setQuestionsPage] = useState(1)
-  const [wordsPage, setWordsPage] = useState(1)
+  const SUBS_PAGE_SIZE = 50
   const [tasksPage, setTasksPage] = useState(1)
-  const [membersPage, setMembersPage] = useState(1)
-  const [members, setMembers] = useState([])
+  const membersList = usePagedList('/api/admin/participants', ITEMS_PER_PAGE)
+  const members = membersList.items
   const [newMember, setNewMember] = useState({username:'', password:''})
   const [showCreateMemberModal, setShowCreateMemberModal] = useState(false)
   const [importFile, setImportFile] = useState(null)
@@ -305,13 +375,16 @@ export default function Admin({onLogout, defaultLang}){
   const [importResultTarget, setImportResultTarget] = useState(null)
 
   function loadMembers(){
-  axios.get('/api/admin/participants').then(r=>setMembers(r.data||[])).catch(()=>setMembers([]))
+    membersList.reload()
   }
 
   const [tasks, setTasks] = useState([])
   const [tasksSummary, setTasksSummary] = useState([])
   const [taskFilter, setTaskFilter] = useState('all') // 'all'|'assessed'|'not_rated'|'no_answer'
   const [taskSubs, setTaskSubs] = useState([])
+  // submissions modal: rated filter ('all'|'assessed'|'not_rated') and cursor of the next page
+  const [subsFilter, setSubsFilter] = useState('all')
+  const [subsNext, setSubsNext] = useState(null)
   const [newTaskText, setNewTaskText] = useState('')
   const [showImageModal, setShowImageModal] = useState(false)
   const [imageSrc, setImageSrc] = useState('')
@@ -328,8 +401,16 @@ export default function Admin({onLogout, defaultLang}){
   axios.get('/api/admin/tasks/summary').then(r=>setTasksSummary(r.data||[])).catch(()=>setTasksSummary([]))
   }
 
-  function loadTaskSubs(qid){
-  axios.get(`/api/admin/tasks/submissions/${qid}`).then(r=>setTaskSubs(r.data||[])).catch(()=>setTaskSubs([]))
+  function loadTaskSubs(qid, filter = subsFilter, after = null){
+    const params = { limit: SUBS_PAGE_SIZE }
+    if(after) params.after = after
+    if(filter === 'assessed') params.rated = true
+    if(filter === 'not_rated') params.rated = false
+    axios.get(`/api/admin/tasks/submissions/${qid}`, { params }).then(r=>{
+      const page = r.data || []
+      setTaskSubs(prev => after ? [...prev, ...page] : page)
+      setSubsNext(r.headers['x-next-after'] || null)
+    }).catch(()=>{ if(!after){ setTaskSubs([]); setSubsNext(null) } })
   }
 
   function createTask(){
@@ -598,7 +679,7 @@ export default function Admin({onLogout, defaultLang}){
                   <div key={b.box_index} style={{width:140,display:'flex',flexDirection:'column',alignItems:'center',gap:8}}>
                     <div style={{width:120,height:120,background:'#061221',borderRadius:8,display:'flex',alignItems:'center',justifyContent:'center',overflow:'hidden',border:'1px solid #243142'}}>
                       {b.hint_filename ? (
-                        <img src={b.hint_filename.startsWith('/uploads') ? b.hint_filename : ('/uploads/' + b.hint_filename)} style={{width:'100%',height:'100%',objectFit:'cover'}} alt={`box-${b.box_index}`} />
+                        <img src={b.hint_thumb_url || (b.hint_filename.startsWith('/uploads') ? b.hint_filename : ('/uploads/' + b.hint_filename))} style={{width:'100%',height:'100%',objectFit:'cover'}} alt={`box-${b.box_index}`} />
                       ) : (
                         <div style={{color:'#94a3b8',fontSize:12}}>{t('boxes_box_label', defaultLang)} {b.box_index}</div>
                       )}
@@ -636,8 +717,11 @@ export default function Admin({onLogout, defaultLang}){
                     if(np !== cpv) return alert(t('password_mismatch', defaultLang))
                     const username = localStorage.getItem('admin_username') || 'admin'
                     axios.post('/api/admin/settings/change_password', {username: username, new_password: np}, { auth: { username: username, password: current } }).then(r=>{
-                      try{ localStorage.setItem('admin_password', np) }catch(e){}
-                      try{ axios.defaults.auth = { username: username, password: np } }catch(e){}
+                      // changing the password revokes existing tokens; log in again with the new one
+                      return axios.post('/api/admin/login', {}, { auth: { username: username, password: np } })
+                    }).then(r=>{
+                      try{ localStorage.setItem('admin_token', r.data.token) }catch(e){}
+                      try{ axios.defaults.headers.common['Authorization'] = `Bearer ${r.data.token}` }catch(e){}
                       alert(t('password_changed', defaultLang))
                       setCpCurrent('')
                       setCpNew('')
@@ -696,14 +780,12 @@ export default function Admin({onLogout, defaultLang}){
                 <button className="btn" onClick={()=>{ setImportMode('surveys'); setShowImportModal(true) }}>{t('import_from_txt', defaultLang)}</button>
               </div>
               <button className="btn ghost" onClick={()=>{ setMassDeleteTarget('questions'); setShowMassDeleteModal(true) }}>{t('mass_delete', defaultLang)}</button>
+              <input className="input" value={questionsList.search} onChange={e=>questionsList.find(e.target.value)} placeholder={t('search', defaultLang)} style={isMobile?{flex:'1 1 100%',background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}:{minWidth:200,background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}} />
             </div>
 
             {!isMobile ? (
               (()=>{
-                const total = questions.length
-                const pages = Math.max(1, Math.ceil(total / ITEMS_PER_PAGE))
-                const start = (questionsPage-1)*ITEMS_PER_PAGE
-                const pageSlice = questions.slice(start, start+ITEMS_PER_PAGE)
+                const pageSlice = questions
                 return (
                   <div>
                     <table className="results" style={{width:'100%'}}>
@@ -715,19 +797,16 @@ export default function Admin({onLogout, defaultLang}){
                       </tbody>
                     </table>
                       <div style={{display:'flex',justifyContent:'center',gap:8,marginTop:8}}>
-                      <button className="btn small" disabled={questionsPage<=1} onClick={()=>setQuestionsPage(p=>Math.max(1,p-1))}>{t('prev', defaultLang)}</button>
-                      <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {questionsPage} / {pages}</div>
-                      <button className="btn small" disabled={questionsPage>=pages} onClick={()=>setQuestionsPage(p=>Math.min(pages,p+1))}>{t('next', defaultLang)}</button>
+                      <button className="btn small" disabled={questionsList.page<=1} onClick={questionsList.prev}>{t('prev', defaultLang)}</button>
+                      <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {questionsList.page} / {questionsList.pages}</div>
+                      <button className="btn small" disabled={!questionsList.hasNext} onClick={questionsList.next}>{t('next', defaultLang)}</button>
                     </div>
                   </div>
                 )
               })()
             ) : (
               (()=>{
-                const total = questions.length
-                const pages = Math.max(1, Math.ceil(total / ITEMS_PER_PAGE))
-                const start = (questionsPage-1)*ITEMS_PER_PAGE
-                const pageSlice = questions.slice(start, start+ITEMS_PER_PAGE)
+                const pageSlice = questions
                 return (
                   <div style={{display:'flex',flexDirection:'column',gap:10}}>
                         {pageSlice.map(q=> (
@@ -745,9 +824,9 @@ export default function Admin({onLogout, defaultLang}){
                       </div>
                     ))}
                     <div style={{display:'flex',justifyContent:'center',gap:8}}>
-                      <button className="btn small" disabled={questionsPage<=1} onClick={()=>setQuestionsPage(p=>Math.max(1,p-1))}>{t('prev', defaultLang)}</button>
-                      <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {questionsPage} / {pages}</div>
-                      <button className="btn small" disabled={questionsPage>=pages} onClick={()=>setQuestionsPage(p=>Math.min(pages,p+1))}>{t('next', defaultLang)}</button>
+                      <button className="btn small" disabled={questionsList.page<=1} onClick={questionsList.prev}>{t('prev', defaultLang)}</button>
+                      <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {questionsList.page} / {questionsList.pages}</div>
+                      <button className="btn small" disabled={!questionsList.hasNext} onClick={questionsList.next}>{t('next', defaultLang)}</button>
                     </div>
                   </div>
                 )
@@ -808,7 +887,7 @@ export default function Admin({onLogout, defaultLang}){
                         {pageSlice.map(task=> <li key={task.id} style={{marginBottom:8}}>
                           <div style={{display:'flex',justifyContent:'space-between',alignItems:'center'}}>
                             <div>{task.question_text} <small style={{color:'#94a3b8'}}>#{task.id}</small> <small style={{color:'#94a3b8',marginLeft:8}}>{task._totalSubs ? (task._totalSubs + ' subs') : ''} {task._rated ? ('rated ' + task._rated) : ''}</small></div>
-                            <div style={{display:'flex',gap:8}}><button className="btn small" onClick={()=>{ setSelectedTask(task); loadTaskSubs(task.id); setShowSubsModal(true) }}>{t('view_submissions', defaultLang)}</button><button className="btn small ghost" onClick={()=>deleteTask(task.id)}>{t('delete', defaultLang)}</button></div>
+                            <div style={{display:'flex',gap:8}}><button className="btn small" onClick={()=>{ setSelectedTask(task); setSubsFilter('all'); loadTaskSubs(task.id, 'all'); setShowSubsModal(true) }}>{t('view_submissions', defaultLang)}</button><button className="btn small ghost" onClick={()=>deleteTask(task.id)}>{t('delete', defaultLang)}</button></div>
                           </div>
                         </li>)}
                       </ul>
@@ -832,18 +911,28 @@ export default function Admin({onLogout, defaultLang}){
               <div style={{display:'flex',justifyContent:'space-between',alignItems:'center'}}>
                 <div style={{fontWeight:700}}>{t('submissions_for_task', defaultLang)} #{selectedTask?.id}</div>
                 <div>
-                  <button className="btn" onClick={()=>{ setShowSubsModal(false); setTaskSubs([]); setSelectedTask(null) }}>{t('close', defaultLang)}</button>
+                  <button className="btn" onClick={()=>{ setShowSubsModal(false); setTaskSubs([]); setSubsNext(null); setSelectedTask(null) }}>{t('close', defaultLang)}</button>
                 </div>
               </div>
+              <div style={{display:'flex',gap:8,alignItems:'center',marginTop:8}}>
+                {['all','assessed','not_rated'].map(f => (
+                  <button key={f} className={"btn small " + (subsFilter===f ? '' : 'ghost')} onClick={()=>{ setSubsFilter(f); loadTaskSubs(selectedTask.id, f) }}>{t('filter_' + f, defaultLang)}</button>
+                ))}
+              </div>
               <div style={{marginTop:12}}>
                 <table className="results" style={{width:'100%'}}>
                   <thead><tr><th>{t('id', defaultLang)}</th><th>{t('username', defaultLang)}</th><th>{t('file', defaultLang)}</th><th>{t('created', defaultLang)}</th></tr></thead>
                   <tbody>
                     {taskSubs.map(s=>(
-                      <tr key={s.id}><td>{s.id}</td><td>{s.username || s.session_id}</td><td><button className="btn small" onClick={()=>{ setImageSrc(`/uploads/${s.filename}`); setShowImageModal(true); setCurrentViewingSubmission(s); setShowRatingPanel(false) }}>{s.filename}</button></td><td>{s.created_at}</td></tr>
+                      <tr key={s.id}><td>{s.id}</td><td>{s.username || s.session_id}</td><td><button className="btn small" onClick={()=>{ setImageSrc(s.preview_url || `/uploads/${s.filename}`); setShowImageModal(true); setCurrentViewingSubmission(s); setShowRatingPanel(false) }}>{s.thumb_url ? <img src={s.thumb_url} alt="" loading="lazy" style={{height:40,verticalAlign:'middle',marginRight:6,borderRadius:4}} /> : null}{s.filename}</button></td><td>{s.created_at}</td></tr>
                     ))}
                   </tbody>
                 </table>
+                {subsNext && (
+                  <div style={{display:'flex',justifyContent:'center',marginTop:8}}>
+                    <button className="btn small" onClick={()=>loadTaskSubs(selectedTask.id, subsFilter, subsNext)}>{t('load_more', defaultLang)}</button>
+                  </div>
+                )}
               </div>
             </div>
           </div>
@@ -859,24 +948,19 @@ export default function Admin({onLogout, defaultLang}){
                 <button className="btn" onClick={()=>{ setImportMode('members'); setShowImportModal(true) }}>{t('import_from_txt', defaultLang)}</button>
               </div>
               <div style={{marginLeft:8}}><button className="btn ghost" onClick={()=>{ setMassDeleteTarget('members'); setShowMassDeleteModal(true) }}>{t('mass_delete', defaultLang)}</button></div>
+              <input className="input" value={membersList.search} onChange={e=>membersList.find(e.target.value)} placeholder={t('search', defaultLang)} style={isMobile?{flex:'1 1 100%',background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}:{minWidth:200,background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}} />
             </div>
 
             <table className="results" style={{width:'100%'}}>
               <thead><tr><th>{t('id', defaultLang)}</th><th>{t('username', defaultLang)}</th><th>{t('created', defaultLang)}</th></tr></thead>
               <tbody>
-                {(() => {
-                  const total = members.length
-                  const pages = Math.max(1, Math.ceil(total / ITEMS_PER_PAGE))
-                  const start = (membersPage-1)*ITEMS_PER_PAGE
-                  const pageSlice = members.slice(start, start+ITEMS_PER_PAGE)
-      return pageSlice.map(m=> <tr key={m.id}><td>{m.id}</td><td>{m.username}</td><td>{m.created_at}</td><td style={{textAlign:'right'}}><button className="btn small ghost" onClick={()=>deleteMember(m.id)}>{t('delete', defaultLang)}</button></td></tr>)
-                })()}
+                {members.map(m=> <tr key={m.id}><td>{m.id}</td><td>{m.username}</td><td>{m.created_at}</td><td style={{textAlign:'right'}}><button className="btn small ghost" onClick={()=>deleteMember(m.id)}>{t('delete', defaultLang)}</button></td></tr>)}
               </tbody>
             </table>
     <div style={{display:'flex',justifyContent:'center',gap:8,marginTop:8}}>
-              <button className="btn small" disabled={membersPage<=1} onClick={()=>setMembersPage(p=>Math.max(1,p-1))}>{t('prev', defaultLang)}</button>
-              <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {membersPage} / {Math.max(1, Math.ceil(members.length/ITEMS_PER_PAGE))}</div>
-              <button className="btn small" disabled={membersPage>=Math.max(1, Math.ceil(members.length/ITEMS_PER_PAGE))} onClick={()=>setMembersPage(p=>Math.min(Math.max(1, Math.ceil(members.length/ITEMS_PER_PAGE)),p+1))}>{t('next', defaultLang)}</button>
+              <button className="btn small" disabled={membersList.page<=1} onClick={membersList.prev}>{t('prev', defaultLang)}</button>
+              <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {membersList.page} / {membersList.pages}</div>
+              <button className="btn small" disabled={!membersList.hasNext} onClick={membersList.next}>{t('next', defaultLang)}</button>
             </div>
   {/* mass-delete button moved to the top controls */}
           </section>
@@ -893,25 +977,20 @@ export default function Admin({onLogout, defaultLang}){
                 <button className="btn" onClick={()=>{ setImportMode('words'); setShowImportModal(true) }} style={{background:'#0b2440',border:'1px solid #143049'}}>{t('import_words', defaultLang)}</button>
               </div>
               <div style={{marginLeft:8}}><button className="btn ghost" onClick={()=>{ setMassDeleteTarget('words'); setShowMassDeleteModal(true) }}>{t('mass_delete', defaultLang)}</button></div>
+              <input className="input" value={wordsList.search} onChange={e=>wordsList.find(e.target.value)} placeholder={t('search', defaultLang)} style={isMobile?{flex:'1 1 100%',background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}:{minWidth:200,background:'#071124',border:'1px solid #1f2937',padding:8,color:'#e6eef8',borderRadius:6}} />
             </div>
             <ul style={{marginTop:8}}>
-              {(() => {
-                const total = codeWords.length
-                const pages = Math.max(1, Math.ceil(total / ITEMS_PER_PAGE))
-                const start = (wordsPage-1)*ITEMS_PER_PAGE
-                const pageSlice = codeWords.slice(start, start+ITEMS_PER_PAGE)
-                return pageSlice.map(w=>(
-                  <li key={w.id} style={{marginBottom:6}}>
-                    <span style={{marginRight:8}}>{w.word}</span>
-                    <button className="btn ghost" onClick={()=>deleteWord(w.id)}>Delete</button>
-                  </li>
-                ))
-              })()}
+              {codeWords.map(w=>(
+                <li key={w.id} style={{marginBottom:6}}>
+                  <span style={{marginRight:8}}>{w.word}</span>
+                  <button className="btn ghost" onClick={()=>deleteWord(w.id)}>Delete</button>
+                </li>
+              ))}
             </ul>
               <div style={{display:'flex',justifyContent:'center',gap:8,marginTop:8}}>
-              <button className="btn small" disabled={wordsPage<=1} onClick={()=>setWordsPage(p=>Math.max(1,p-1))}>{t('prev', defaultLang)}</button>
-              <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {wordsPage} / {Math.max(1, Math.ceil(codeWords.length/ITEMS_PER_PAGE))}</div>
-              <button className="btn small" disabled={wordsPage>=Math.max(1, Math.ceil(codeWords.length/ITEMS_PER_PAGE))} onClick={()=>setWordsPage(p=>Math.min(Math.max(1, Math.ceil(codeWords.length/ITEMS_PER_PAGE)),p+1))}>{t('next', defaultLang)}</button>
+              <button className="btn small" disabled={wordsList.page<=1} onClick={wordsList.prev}>{t('prev', defaultLang)}</button>
+              <div style={{alignSelf:'center'}}>{t('page_label', defaultLang)} {wordsList.page} / {wordsList.pages}</div>
+              <button className="btn small" disabled={!wordsList.hasNext} onClick={wordsList.next}>{t('next', defaultLang)}</button>
             </div>
           </section>
         )}
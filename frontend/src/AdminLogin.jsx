@@ -11,13 +11,16 @@ export default function AdminLogin({onLogin, defaultLang}){
     const lang = defaultLang || localStorage.getItem('default_language') || 'en'
     if(!username) { setStatus(t('enter_username', lang)); return }
     if(!password) { setStatus(t('enter_password', lang)); return }
-    // attempt to authenticate against backend by calling a protected admin endpoint
-    axios.get('/api/admin/game', { auth: { username, password } }).then(()=>{
+    // log in once with username/password and use the returned bearer token afterwards
+    axios.post('/api/admin/login', {}, { auth: { username, password } }).then(r=>{
+      const token = r.data && r.data.token
       localStorage.setItem('is_admin','1')
       localStorage.setItem('admin_username', username)
-      localStorage.setItem('admin_password', password)
-      // set axios default auth so Admin component requests authenticate automatically
-      axios.defaults.auth = { username, password }
+      localStorage.setItem('admin_token', token)
+      localStorage.removeItem('admin_password')
+      // set axios default Authorization header so Admin component requests authenticate automatically
+      axios.defaults.auth = null
+      axios.defaults.headers.common['Authorization'] = `Bearer ${token}`
       setStatus(t('login_successful', lang))
       if(onLogin) onLogin()
     }).catch(()=>{
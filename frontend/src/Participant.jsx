@@ -4,6 +4,42 @@ import Scanner from './Scanner'
 import Quest from './Quest'
 import { t } from './i18n'
 
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms))
+
+// resumable upload: send the file in chunks, and after a failed chunk ask the server
+// how much it has and continue from there instead of starting over
+async function uploadTaskFile(file, questionId, sessionId){
+  const { data: upload } = await axios.post('/api/tasks/uploads', { session_id: sessionId, question_id: questionId, size: file.size, filename: file.name })
+  const base = `/api/tasks/uploads/${upload.upload_id}`
+  let offset = upload.offset
+  let failures = 0
+  while(offset < upload.size){
+    const index = Math.floor(offset / upload.chunk_size)
+    const chunk = file.slice(index * upload.chunk_size, Math.min(upload.size, (index + 1) * upload.chunk_size))
+    try{
+      const r = await axios.put(`${base}/chunks/${index}`, chunk, { headers: {'Content-Type':'application/octet-stream'} })
+      offset = r.data.offset
+      failures = 0
+    }catch(err){
+      const status = err.response && err.response.status
+      if((status && status < 500 && status !== 409) || ++failures > 5) throw err
+      await sleep(1000 * failures)
+      try{ offset = (await axios.get(base)).data.offset }catch(e){ /* still offline: retry the same chunk */ }
+    }
+  }
+  // finalize is safe to repeat: after a lost response the server finds the submission
+  // made from this upload
+  for(failures = 0;; ){
+    try{
+      return await axios.post(`${base}/finalize`)
+    }catch(err){
+      const status = err.response && err.response.status
+      if((status && status < 500) || ++failures > 5) throw err
+      await sleep(1000 * failures)
+    }
+  }
+}
+
 function TaskUploader({question, sessionId, onDone, lang}){
   const [file, setFile] = useState(null)
   const [preview, setPreview] = useState(null)
@@ -21,11 +57,7 @@ function TaskUploader({question, sessionId, onDone, lang}){
     if(!file) return alert(t('select_file', lang))
     setLoading(true)
     try{
-      const fd = new FormData()
-      fd.append('file', file)
-      fd.append('question_id', question.id)
-      fd.append('session_id', sessionId)
-      const res = await axios.post('/api/tasks/submit', fd, { headers: {'Content-Type':'multipart/form-data'} })
+      await uploadTaskFile(file, question.id, sessionId)
     onDone && onDone(t('submitted', lang))
     }catch(err){
   onDone && onDone(t('upload_failed', lang))
@@ -51,6 +83,9 @@ function TaskUploader({question, sessionId, onDone, lang}){
   )
 }
 
+// number of leaderboard rows shown; the participant's own row is added below if further down
+const LEADERBOARD_TOP = 50
+
 export default function Participant({onLogout, defaultLang}){
   const [username, setUsername] = useState(localStorage.getItem('telegram_username') || '')
   const [password, setPassword] = useState(localStorage.getItem('participant_password') || '')
@@ -72,9 +107,37 @@ export default function Participant({onLogout, defaultLang}){
   const [timerLeft, setTimerLeft] = useState(0)
   const timerRef = useRef(null)
   const [leaderboard, setLeaderboard] = useState([])
+  const [myRank, setMyRank] = useState(null)
 
   useEffect(()=>{
-    if(mode === 'tabs') fetchLeaderboard()
+    if(mode !== 'tabs') return
+    fetchLeaderboard()
+    // live updates: a snapshot on connect, then changed rows and game state transitions
+    if(typeof EventSource === 'undefined') return
+    const es = new EventSource('/api/stream')
+    const byScore = (a, b) => (b.correct_count - a.correct_count) || a.telegram_username.localeCompare(b.telegram_username)
+    const applyState = (state) => {
+      if(!state || !state.default_language) return
+      if(localStorage.getItem('default_language') === state.default_language) return
+      try{ localStorage.setItem('default_language', state.default_language) }catch(e){}
+      window.dispatchEvent(new CustomEvent('language-changed', {detail: state.default_language}))
+    }
+    es.addEventListener('snapshot', (e)=>{
+      const data = JSON.parse(e.data)
+      setLeaderboard(data.leaderboard || [])
+      applyState(data.state)
+    })
+    es.addEventListener('leaderboard', (e)=>{
+      const data = JSON.parse(e.data)
+      setLeaderboard(prev => {
+        const rows = new Map(prev.map(r => [r.telegram_username, r]))
+        ;(data.removed || []).forEach(name => rows.delete(name))
+        ;(data.changed || []).forEach(r => rows.set(r.telegram_username, r))
+        return Array.from(rows.values()).sort(byScore)
+      })
+    })
+    es.addEventListener('state', (e)=> applyState(JSON.parse(e.data)))
+    return ()=> es.close()
   }, [mode])
 
   function saveSession(){
@@ -220,9 +283,16 @@ export default function Participant({onLogout, defaultLang}){
   }, [tab])
 
   function fetchLeaderboard(){
-    axios.get('/api/leaderboard').then(r=>setLeaderboard(r.data)).catch(()=>setLeaderboard([]))
+    axios.get('/api/leaderboard', {params: {limit: LEADERBOARD_TOP}}).then(r=>setLeaderboard(r.data)).catch(()=>setLeaderboard([]))
+    if(sessionId) axios.get('/api/leaderboard/me', {params: {session_id: sessionId}}).then(r=>setMyRank(r.data)).catch(()=>setMyRank(null))
   }
 
+  // top entries plus the participant's own row (with its rank) if it is further down
+  const topRows = leaderboard.slice(0, LEADERBOARD_TOP).map((r,i)=>({...r, rank: i+1}))
+  const myIndex = leaderboard.findIndex(r => r.telegram_username === username)
+  const ownRow = myIndex >= LEADERBOARD_TOP ? {...leaderboard[myIndex], rank: myIndex+1}
+    : (myIndex < 0 && myRank && myRank.rank ? myRank : null)
+
   function logout(){
     localStorage.removeItem('session_id')
     localStorage.removeItem('telegram_username')
@@ -286,9 +356,9 @@ export default function Participant({onLogout, defaultLang}){
               <table className="results">
                 <thead><tr><th>{t('rank', lang)}</th><th>{t('participant_label', lang)}</th><th>{t('correct_label', lang)}</th></tr></thead>
                 <tbody>
-                  {leaderboard.map((r,i)=>(
+                  {(ownRow ? [...topRows, ownRow] : topRows).map(r=>(
                     <tr key={r.telegram_username} className={r.telegram_username === username ? 'highlight' : ''}>
-                      <td>{i+1}</td>
+                      <td>{r.rank}</td>
                       <td>{r.telegram_username}</td>
                       <td>{r.correct_count}</td>
                     </tr>
@@ -117,6 +117,8 @@ const translations = {
   filter_assessed: 'Assessed',
   filter_not_rated: 'Not rated',
   filter_no_answer: 'No answer',
+  load_more: 'Load more',
+  search: 'Search',
   time_left: 'Time left',
   time_expired: 'Time expired',
   task_time_up: 'Task time is up',
@@ -307,6 +309,8 @@ const translations = {
   filter_assessed: 'Оценены',
   filter_not_rated: 'Не оценены',
   filter_no_answer: 'Нет ответов',
+  load_more: 'Загрузить ещё',
+  search: 'Поиск',
   settings_save: 'Сохранить',
   settings_timeouts_title: 'Тайм-ауты вопросов и задач (секунд)',
   settings_question_timeout_label: 'Тайм-аут вопроса (сек)',
@@ -496,6 +500,8 @@ const translations = {
   filter_assessed: '已评估',
   filter_not_rated: '未评分',
   filter_no_answer: '无回复',
+  load_more: '加载更多',
+  search: '搜索',
   settings_save: '保存',
   settings_timeouts_title: '问题和任务超时（秒）',
   settings_question_timeout_label: '问题超时（秒）',
@@ -686,6 +692,8 @@ const translations = {
   filter_assessed: 'Оцінено',
   filter_not_rated: 'Не оцінено',
   filter_no_answer: 'Немає відповідей',
+  load_more: 'Завантажити ще',
+  search: 'Пошук',
   settings_save: 'Зберегти',
   settings_timeouts_title: 'Таймаути питань і завдань (секунди)',
   settings_question_timeout_label: 'Таймаут питання (сек)',